@@ -1,60 +1,144 @@
+import hashlib
 import json
-import os
+import random
+import threading
+from typing import Callable, Hashable, Optional
 
 from flask import Flask, redirect, url_for, request, jsonify, Response
-from jsonschema import validate, ValidationError
+from jsonschema import ValidationError
+
+from api_server import PooledWSGIServer, DEFAULT_WORKER_COUNT, get_max_stream_count
+from json_validator import Validator, SchemaDoesNotExistException
 
 # https://pythonbasics.org/flask-http-methods/
 
 __new_request_received = 1
-__schema_data = {}
 
+# Seconds after which an idle event stream sends a comment, to detect consumers that disconnected
+_stream_keep_alive_interval = 15
 
-def load_schemas() -> dict:
-    schema_data = {}
-    for f_name in os.listdir('json_schemas'):
-        if f_name.endswith('.json'):
-            with open(os.path.join("json_schemas", f_name), 'r') as file:
-                buf_schema_data = json.load(file)
-                schema_data[f_name] = buf_schema_data
-    return schema_data
+# Fraction of the outgoing responses validated against their schemas. Validating big responses costs more than
+# creating them, so only a sample is validated when python runs optimized ('-O').
+_default_response_validation_rate = 1.0 if __debug__ else 0.01
+__response_validation_rate = _default_response_validation_rate
 
 
-def generate_valid_response(json_body: dict, json_schema_name: str, status_code: int = 200) -> Response:
-    global __schema_data
+class CachedResponse:
+    """Encoded and validated response body, valid as long as the state it was created from has the same version"""
 
-    try:
-        json_schema = __schema_data[json_schema_name]
-        validate(json_body, json_schema)
-        response = jsonify(json_body)
+    version: Hashable
+    body: bytes
+    etag: str
 
-        response.status_code = status_code
+    def __init__(self, version: Hashable, body: bytes):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
 
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        return response
 
-    except KeyError:
+# Cached responses stored by the path they are sent for
+__response_cache: dict[str, CachedResponse] = {}
+
+
+def validate_json(json_body: dict, json_schema_name: str):
+    """
+    Validates json data against a schema from the schema folder.
+
+    :param json_body: Data to validate
+    :param json_schema_name: File name of the schema
+    :raises ValidationError: If the data does not match the schema
+    :raises SchemaDoesNotExistException: If there is no schema with the given name
+    """
+    Validator.validate(json_body, json_schema_name[:-len(".json")])
+
+
+def set_response_validation_rate(rate: float):
+    """Sets the fraction of outgoing responses that are validated against their schemas, 1 validates all of them"""
+    global __response_validation_rate
+    __response_validation_rate = rate
+
+
+def _create_validation_error_body(json_body: dict, json_schema_name: str) -> Optional[dict]:
+    """Validates a response body if it is part of the sample, returns the body of an error response if it is invalid"""
+    if __response_validation_rate < 1 and random.random() >= __response_validation_rate:
+        return None
+    try:
+        validate_json(json_body, json_schema_name)
+        return None
+
+    except SchemaDoesNotExistException:
         print(f"Json Schema '{json_schema_name}' was not found")
-        response = {"status": f"Internal Server Error while validating response: "
-                              f"Validation failed. Please file a bug report."}
+        return {"status": f"Internal Server Error while validating response: Validation schema not found. "
+                          f"Please file a bug report."}
 
     except ValidationError:
         print(f"Validating response with '{json_schema_name}' failed.")
-        response = {"status": f"Internal Server Error while validating response: Validation schema not found. "
-                              f"Please file a bug report."}
+        return {"status": f"Internal Server Error while validating response: "
+                          f"Validation failed. Please file a bug report."}
 
-    return generate_valid_response(response, 'default_message.json', status_code=500)
 
-
-def run_api(bridge, port: int):
-    """Methods that launches the rest api to read, write and update gadgets via HTTP"""
-    global __schema_data
-
-    __schema_data = load_schemas()
-    print(f"Loaded {len(__schema_data)} schemas.")
+def generate_valid_response(json_body: dict, json_schema_name: str, status_code: int = 200) -> Response:
+    error_body = _create_validation_error_body(json_body, json_schema_name)
+    if error_body is not None:
+        return generate_valid_response(error_body, 'default_message.json', status_code=500)
+
+    response = jsonify(json_body)
+    response.status_code = status_code
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response
+
+
+def generate_cached_response(cache_key: str, version: Hashable, create_body: Callable[[], dict],
+                             json_schema_name: str) -> Response:
+    """
+    Sends the cached response for the key if it was created for the current version, creates it otherwise.
+
+    Responses carry an ETag, requests whose 'If-None-Match' header contains it are answered with '304 Not Modified'.
+
+    :param cache_key: Key to store the response with
+    :param version: Version of the state the response body is created from
+    :param create_body: Method creating the response body, only called if the cached response is outdated
+    :param json_schema_name: Schema to validate newly created response bodies with
+    :return: The response to the request
+    """
+    global __response_cache
+
+    cached_response = __response_cache.get(cache_key)
+    if cached_response is None or cached_response.version != version:
+        json_body = create_body()
+        error_body = _create_validation_error_body(json_body, json_schema_name)
+        if error_body is not None:
+            return generate_valid_response(error_body, 'default_message.json', status_code=500)
+        cached_response = CachedResponse(version, json.dumps(json_body).encode())
+        __response_cache[cache_key] = cached_response
+
+    response = Response(cached_response.body, mimetype="application/json")
+    response.set_etag(cached_response.etag)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response.make_conditional(request)
+
+
+def create_app(bridge, response_validation_rate: float = _default_response_validation_rate,
+               max_stream_count: Optional[int] = None) -> Flask:
+    """
+    Creates the flask app serving the rest api for the bridge
+
+    :param bridge: Bridge to serve the api for
+    :param response_validation_rate: Fraction of the outgoing responses that are validated against their schemas
+    :param max_stream_count: Maximum number of event streams open at the same time, unlimited if None
+    :return: The flask app
+    """
+    # Loads the schemas if they were not loaded yet
+    Validator()
+    set_response_validation_rate(response_validation_rate)
+    __response_cache.clear()
 
     app = Flask(__name__)
 
+    # Number of event streams currently open
+    open_stream_count = 0
+    stream_count_lock = threading.Lock()
+
     @app.route('/')
     def root():
         """
@@ -84,17 +168,66 @@ def run_api(bridge, port: int):
         :return: Response to the request
         """
         bridge.add_streaming_message("API", __new_request_received, "/gadgets")
-        gadget_list = bridge.get_all_gadgets()
 
-        out_gadget_list: [dict] = []
-        for gadget in gadget_list:
-            json_gadget = gadget.serialized()
-            out_gadget_list.append(json_gadget)
+        def create_body() -> dict:
+            out_gadget_list = [gadget.serialized() for gadget in bridge.get_all_gadgets()]
+            return {"gadgets": out_gadget_list,
+                    "gadget_count": len(out_gadget_list)}
 
-        buf_res = {"gadgets": out_gadget_list,
-                   "gadget_count": len(out_gadget_list)}
+        return generate_cached_response("/gadgets", bridge.get_registry_version(), create_body,
+                                        'api_get_all_gadgets_response.json')
 
-        return generate_valid_response(buf_res, 'api_get_all_gadgets_response.json')
+    @app.route('/gadgets/stream', methods=['GET'])
+    def stream_gadget_changes():
+        """
+        Flask API response method
+        Category: Gadgets
+        Title: Stream Characteristic Changes
+        Description: Pushes changes of characteristics as server-sent events. 'characteristic' events contain a list
+        of changed characteristics with their latest values. 'resync' events ask the consumer to reload '/gadgets',
+        because gadgets were added or removed or the consumer could not keep up with the changes. Every stream
+        occupies a worker of the server while it is open, so the number of open streams is limited to keep workers
+        for the other requests. Streams exceeding the limit are answered with 503.
+        Input Schema: None
+        Output Schema: 'default_message.json' if the stream is refused
+        :return: Response to the request
+        """
+        nonlocal open_stream_count
+        bridge.add_streaming_message("API", __new_request_received, "/gadgets/stream")
+        with stream_count_lock:
+            if max_stream_count is not None and open_stream_count >= max_stream_count:
+                response = generate_valid_response({"status": "Too many open streams, poll '/gadgets' instead"},
+                                                   "default_message.json", status_code=503)
+                response.headers.add('Retry-After', str(_stream_keep_alive_interval))
+                return response
+            open_stream_count += 1
+
+        def close_stream():
+            nonlocal open_stream_count
+            stream.unsubscribe(subscription)
+            with stream_count_lock:
+                open_stream_count -= 1
+
+        stream = bridge.get_characteristic_stream()
+        subscription = stream.subscribe()
+
+        def generate_events():
+            # Sends the headers right away and makes consumers reconnect quickly if the stream breaks
+            yield "retry: 1000\n\n"
+            while not subscription.is_closed():
+                changes = subscription.get_changes(_stream_keep_alive_interval)
+                if changes is None:
+                    yield "event: resync\ndata: {}\n\n"
+                elif changes:
+                    yield f"event: characteristic\ndata: {json.dumps([x.serialized() for x in changes])}\n\n"
+                else:
+                    yield ": keep-alive\n\n"
+
+        response = Response(generate_events(), mimetype="text/event-stream")
+        response.call_on_close(close_stream)
+        response.headers.add('Cache-Control', 'no-cache')
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
 
     @app.route('/clients', methods=['GET'])
     def get_all_clients():
@@ -108,17 +241,18 @@ def run_api(bridge, port: int):
         :return: Response to the request
         """
         bridge.add_streaming_message("API", __new_request_received, "/clients")
+        version = bridge.get_registry_version()
         client_list = bridge.get_all_clients()
 
-        out_client_list: [dict] = []
-        for client in client_list:
-            json_client = client.serialized()
-            out_client_list.append(json_client)
+        def create_body() -> dict:
+            out_client_list = [client.serialized() for client in client_list]
+            return {"clients": out_client_list,
+                    "client_count": len(out_client_list)}
 
-        buf_res = {"clients": out_client_list,
-                   "client_count": len(out_client_list)}
-
-        return generate_valid_response(buf_res, 'api_get_all_clients_response.json')
+        # Clients become inactive over time without being changed
+        active_states = tuple(client.is_active() for client in client_list)
+        return generate_cached_response("/clients", (version, active_states), create_body,
+                                        'api_get_all_clients_response.json')
 
     @app.route('/info', methods=['GET'])
     def get_info():
@@ -132,24 +266,24 @@ def run_api(bridge, port: int):
         :return: Response to the request
         """
         bridge.add_streaming_message("API", __new_request_received, "/info")
-        bridge_name = bridge.get_bridge_name()
-        gadget_list = bridge.get_all_gadgets()
+        version = bridge.get_registry_version()
         connector_list = bridge.get_all_connectors()
-        client_list = bridge.get_all_clients()
 
-        buf_res = {"bridge_name": bridge_name,
-                   "software_commit": bridge.get_sw_commit(),
-                   "software_branch": bridge.get_sw_branch(),
-                   "running_since": bridge.get_time_launched().strftime("%Y-%m-%d %H:%M:%S"),
-                   "gadget_count": len(gadget_list),
-                   "connector_count": len(connector_list),
-                   "client_count": len(client_list),
-                   "platformio_version": bridge.get_host_pio_version(),
-                   "python_version": bridge.get_host_python_version(),
-                   "pipenv_version": bridge.get_host_pipenv_version(),
-                   "git_version": bridge.get_host_git_version()}
-
-        return generate_valid_response(buf_res, 'api_get_info_response.json')
+        def create_body() -> dict:
+            return {"bridge_name": bridge.get_bridge_name(),
+                    "software_commit": bridge.get_sw_commit(),
+                    "software_branch": bridge.get_sw_branch(),
+                    "running_since": bridge.get_time_launched().strftime("%Y-%m-%d %H:%M:%S"),
+                    "gadget_count": len(bridge.get_all_gadgets()),
+                    "connector_count": len(connector_list),
+                    "client_count": len(bridge.get_all_clients()),
+                    "platformio_version": bridge.get_host_pio_version(),
+                    "python_version": bridge.get_host_python_version(),
+                    "pipenv_version": bridge.get_host_pipenv_version(),
+                    "git_version": bridge.get_host_git_version()}
+
+        return generate_cached_response("/info", (version, len(connector_list)), create_body,
+                                        'api_get_info_response.json')
 
     @app.route('/connectors', methods=['GET'])
     def get_all_connectors():
@@ -289,12 +423,12 @@ def run_api(bridge, port: int):
 
         if config:
             try:
-                validate(config, __schema_data['client_config.json'])
+                validate_json(config, 'client_config.json')
                 success, status = bridge.write_config_to_network_chip(config, client_name)
             except ValidationError:
                 success = False
                 status = "Config schema validation failed."
-            except KeyError:
+            except SchemaDoesNotExistException:
                 return generate_valid_response({"status": "Encountered error while trying to validate: missing scheme"},
                                                'client_config.json',
                                                status_code=500)
@@ -332,12 +466,12 @@ def run_api(bridge, port: int):
 
         if config:
             try:
-                validate(config, __schema_data['client_config.json'])
+                validate_json(config, 'client_config.json')
                 success, status = bridge.write_config_to_chip(config, serial_port)
             except ValidationError:
                 success = False
                 status = "Config schema validation failed."
-            except KeyError:
+            except SchemaDoesNotExistException:
                 return generate_valid_response({"status": "Encountered error while trying to validate: missing scheme"},
                                                'client_config.json',
                                                status_code=500)
@@ -366,4 +500,25 @@ def run_api(bridge, port: int):
     #         user = request.args.get('nm')
     #         return redirect(url_for('success', name=user))
 
+    return app
+
+
+def run_api(bridge, port: int, response_validation_rate: float = _default_response_validation_rate):
+    """Methods that launches the rest api to read, write and update gadgets via HTTP using the development server"""
+    app = create_app(bridge, response_validation_rate)
     app.run(host='0.0.0.0', port=port)
+
+
+def create_server(bridge, port: int, worker_count: int = DEFAULT_WORKER_COUNT,
+                  response_validation_rate: float = _default_response_validation_rate) -> PooledWSGIServer:
+    """
+    Creates a production server for the rest api, which is started by calling its serve_forever() method
+
+    :param bridge: Bridge to serve the api for
+    :param port: Port to listen on
+    :param worker_count: Number of connections served at the same time, only part of them may be event streams
+    :param response_validation_rate: Fraction of the outgoing responses that are validated against their schemas
+    :return: The server
+    """
+    app = create_app(bridge, response_validation_rate, max_stream_count=get_max_stream_count(worker_count))
+    return PooledWSGIServer('0.0.0.0', port, app, worker_count=worker_count)
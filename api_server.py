@@ -0,0 +1,93 @@
+"""Module for the production server hosting the rest api"""
+import enum
+import logging
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# Number of threads handling connections if nothing else is configured
+DEFAULT_WORKER_COUNT = 8
+
+# Seconds an idle keep-alive connection is kept open, while it is open it occupies a worker
+_default_keep_alive_timeout = 2
+
+# Share of the workers that may be occupied by event streams, the others are kept for regular requests
+_max_stream_worker_share = 0.5
+
+
+def get_max_stream_count(worker_count: int) -> int:
+    """Returns the number of event streams a server with the given number of workers can keep open"""
+    return int(worker_count * _max_stream_worker_share)
+
+
+class ApiServerMode(enum.Enum):
+    """Servers the rest api can be hosted with"""
+    development = "development"
+    production = "production"
+
+
+class _KeepAliveRequestHandler(WSGIRequestHandler):
+    """Request handler serving several requests over the same connection"""
+    protocol_version = "HTTP/1.1"
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """
+    WSGI server handling connections with a fixed pool of worker threads.
+
+    Connections are kept alive between requests until they are idle for the keep-alive timeout. Stopping the server
+    stops accepting new connections and waits for the accepted ones to be served.
+    """
+
+    multithread = True
+
+    _executor: ThreadPoolExecutor
+    _keep_alive_timeout: float
+    _is_serving: threading.Event
+    _logger: logging.Logger
+
+    def __init__(self, host: str, port: int, app, worker_count: int = DEFAULT_WORKER_COUNT,
+                 keep_alive_timeout: float = _default_keep_alive_timeout):
+        """
+        Constructor for the PooledWSGIServer
+
+        :param host: Address to listen on
+        :param port: Port to listen on, 0 selects a free port
+        :param app: WSGI app to serve
+        :param worker_count: Number of connections served at the same time
+        :param keep_alive_timeout: Seconds idle connections are kept open
+        """
+        super().__init__(host, port, app, handler=_KeepAliveRequestHandler)
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._executor = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="api_worker")
+        self._keep_alive_timeout = keep_alive_timeout
+        self._is_serving = threading.Event()
+
+    def serve_forever(self, poll_interval: float = 0.5):
+        self._is_serving.set()
+        super().serve_forever(poll_interval)
+
+    def process_request(self, request: socket.socket, client_address):
+        self._executor.submit(self._process_request_in_worker, request, client_address)
+
+    def _process_request_in_worker(self, request: socket.socket, client_address):
+        try:
+            request.settimeout(self._keep_alive_timeout)
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def get_port(self) -> int:
+        return self.server_address[1]
+
+    def stop(self):
+        """Stops accepting connections and returns after all accepted connections were served"""
+        self._logger.info("Shutting down api server")
+        if self._is_serving.is_set():
+            self.shutdown()
+        self._executor.shutdown(wait=True)
+        self.server_close()
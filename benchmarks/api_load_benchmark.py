@@ -0,0 +1,79 @@
+"""Load test for the '/gadgets' endpoint of the rest api, served by the flask test client.
+Run from the repository root: 'python -m benchmarks.api_load_benchmark'"""
+import argparse
+import time
+
+import api
+from bridge_registry import BridgeRegistry
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+
+
+class BenchmarkBridge:
+    """Provides the methods of the bridge needed to serve '/gadgets'"""
+
+    registry: BridgeRegistry
+
+    def __init__(self, gadget_count: int):
+        self.registry = BridgeRegistry()
+        for i in range(gadget_count):
+            self.registry.add_gadget(Gadget(f"gadget_{i}",
+                                            GadgetIdentifier(1),
+                                            f"client_{i % 32}",
+                                            0,
+                                            [Characteristic(CharacteristicIdentifier.status, 0, 1, 1, 0),
+                                             Characteristic(CharacteristicIdentifier.brightness, 0, 100, 1, 50)]))
+
+    def add_streaming_message(self, sender: str, code: int, msg: str):
+        pass
+
+    def get_registry_version(self) -> int:
+        return self.registry.get_version()
+
+    def get_all_gadgets(self) -> [Gadget]:
+        return self.registry.get_all_gadgets()
+
+    def change_gadget(self):
+        """Toggles the status of a gadget, so the next request cannot be served from the cache"""
+        gadget = self.registry.get_gadget("gadget_0")
+        gadget.update_characteristic(CharacteristicIdentifier.status,
+                                     1 - gadget.get_characteristic_value(CharacteristicIdentifier.status))
+        self.registry.mark_gadget_changed("gadget_0")
+
+
+def measure_requests_per_second(send_request, duration: float) -> float:
+    request_count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        send_request()
+        request_count += 1
+    return request_count / (time.perf_counter() - start)
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Load test for the rest api')
+    parser.add_argument('--gadgets', help='number of gadgets on the bridge', type=int, default=5000)
+    parser.add_argument('--duration', help='seconds every scenario is measured', type=float, default=3)
+    args = parser.parse_args()
+
+    bridge = BenchmarkBridge(args.gadgets)
+
+    for validation_rate in [1.0, 0.01, 0.0]:
+        client = api.create_app(bridge, response_validation_rate=validation_rate).test_client()
+
+        def send_changed():
+            bridge.change_gadget()
+            assert client.get("/gadgets").status_code == 200
+
+        rps = measure_requests_per_second(send_changed, args.duration)
+        print(f"Changed gadgets, {validation_rate * 100:>5.1f}% validated: {rps:>8.1f} requests/s")
+
+    etag = client.get("/gadgets").headers["ETag"]
+    rps = measure_requests_per_second(lambda: client.get("/gadgets"), args.duration)
+    print(f"Unchanged gadgets, cached body:       {rps:>8.1f} requests/s")
+    rps = measure_requests_per_second(lambda: client.get("/gadgets", headers={"If-None-Match": etag}), args.duration)
+    print(f"Unchanged gadgets, 304 Not Modified:  {rps:>8.1f} requests/s")
+
+
+if __name__ == '__main__':
+    module_main()
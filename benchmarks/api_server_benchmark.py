@@ -0,0 +1,81 @@
+"""Benchmark comparing throughput and latency of the servers hosting the rest api.
+Run from the repository root: 'python -m benchmarks.api_server_benchmark'"""
+import argparse
+import http.client
+import statistics
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import api
+from api_server import PooledWSGIServer, DEFAULT_WORKER_COUNT
+from benchmarks.api_load_benchmark import BenchmarkBridge
+
+
+def run_clients(port: int, client_count: int, duration: float) -> list[float]:
+    """Sends requests to '/gadgets' from several threads, returns the latencies of all requests in seconds"""
+    latencies = []
+    latency_lock = threading.Lock()
+    end_time = time.perf_counter() + duration
+
+    def send_requests():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        client_latencies = []
+        while time.perf_counter() < end_time:
+            start = time.perf_counter()
+            connection.request("GET", "/gadgets")
+            response = connection.getresponse()
+            response.read()
+            if response.getheader("Connection", "").lower() == "close" or response.version == 10:
+                connection.close()
+            client_latencies.append(time.perf_counter() - start)
+        connection.close()
+        with latency_lock:
+            latencies.extend(client_latencies)
+
+    client_threads = [threading.Thread(target=send_requests) for _ in range(client_count)]
+    for thread in client_threads:
+        thread.start()
+    for thread in client_threads:
+        thread.join()
+    return latencies
+
+
+def benchmark_server(name: str, server, client_count: int, duration: float, stop):
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+    try:
+        latencies = run_clients(server.server_address[1], client_count, duration)
+    finally:
+        stop()
+        server_thread.join()
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(f"{name:<36} {len(latencies) / duration:>8.1f} requests/s  "
+          f"p50 {statistics.median(latencies) * 1000:>6.2f}ms  p99 {p99 * 1000:>7.2f}ms")
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the rest api servers')
+    parser.add_argument('--gadgets', help='number of gadgets on the bridge', type=int, default=500)
+    parser.add_argument('--clients', help='number of clients sending requests in parallel', type=int, default=16)
+    parser.add_argument('--duration', help='seconds every server is measured', type=float, default=3)
+    parser.add_argument('--workers', help='worker count of the production server', type=int,
+                        default=DEFAULT_WORKER_COUNT)
+    args = parser.parse_args()
+
+    bridge = BenchmarkBridge(args.gadgets)
+    app = api.create_app(bridge)
+
+    # The development server as launched by app.run()
+    development_server = make_server("127.0.0.1", 0, app, threaded=True)
+    benchmark_server("development (thread per connection)", development_server, args.clients, args.duration,
+                     development_server.shutdown)
+
+    production_server = PooledWSGIServer("127.0.0.1", 0, app, worker_count=args.workers)
+    benchmark_server(f"production ({args.workers} workers, keep-alive)", production_server, args.clients,
+                     args.duration, production_server.stop)
+
+
+if __name__ == '__main__':
+    module_main()
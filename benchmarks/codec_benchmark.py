@@ -0,0 +1,73 @@
+"""Benchmark comparing the size and speed of the request codecs for typical requests.
+Run from the repository root: 'python -m benchmarks.codec_benchmark'"""
+import argparse
+import time
+
+from network.request import Request
+from network.request_codec import RequestCodec, JSON_CODEC, MSGPACK_CODEC, decode_binary_message
+from network.socket_server_client import encode_socket_request
+from network.socket_message_buffer import SocketMessageBuffer
+
+# Bits needed to send a byte over a serial connection with one start and one stop bit
+_serial_bits_per_byte = 10
+
+
+def create_sample_requests() -> dict[str, Request]:
+    characteristic_update = Request("smarthome/remotes/gadget/update", 123456, "esp32_livingroom", "bridge",
+                                    {"name": "ceiling_lamp",
+                                     "characteristics": [{"type": 1, "min": 0, "max": 1, "step": 1, "value": 1},
+                                                         {"type": 2, "min": 0, "max": 100, "step": 1, "value": 75}]})
+    heartbeat = Request("smarthome/heartbeat", 654321, "esp32_livingroom", None, {"runtime_id": 42})
+    sync = Request("smarthome/sync", 111111, "esp32_livingroom", "bridge",
+                   {"runtime_id": 42,
+                    "port_mapping": {str(i): i * 3 for i in range(16)},
+                    "boot_mode": 2,
+                    "sw_uploaded": "2021-07-01 12:00:00",
+                    "sw_commit": "6bd1a05e63a1b8e65baa5c94b0d7b3e3ae5bff66",
+                    "sw_branch": "master",
+                    "gadgets": [{"name": f"gadget_{i}",
+                                 "type": 1,
+                                 "characteristics": [{"type": 1, "min": 0, "max": 1, "step": 1, "value": 0}]}
+                                for i in range(8)]})
+    return {"characteristic_update": characteristic_update, "heartbeat": heartbeat, "sync": sync}
+
+
+def measure(func, samples: int) -> float:
+    """Returns the mean time in microseconds needed to call func"""
+    start = time.perf_counter()
+    for _ in range(samples):
+        func()
+    return (time.perf_counter() - start) / samples * 1000000
+
+
+def benchmark_codec(name: str, req: Request, codec: RequestCodec, samples: int):
+    encoded = encode_socket_request(req, codec)
+    buffer = SocketMessageBuffer()
+
+    def decode():
+        message = buffer.add_data(encoded)[0]
+        if isinstance(message, bytes):
+            decode_binary_message(message)
+        else:
+            JSON_CODEC.decode(message.encode())
+
+    encode_time = measure(lambda: encode_socket_request(req, codec), samples)
+    decode_time = measure(decode, samples)
+    serial_time = len(encoded) * _serial_bits_per_byte / 115200 * 1000
+    print(f"{name:<22} {codec.get_name():<8} {len(encoded):>6} bytes  {serial_time:>6.2f}ms @115200  "
+          f"encode {encode_time:>6.1f}µs  decode {decode_time:>6.1f}µs")
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the request codecs')
+    parser.add_argument('--samples', help='number of times every request is encoded and decoded', type=int,
+                        default=20000)
+    args = parser.parse_args()
+
+    for name, req in create_sample_requests().items():
+        for codec in [JSON_CODEC, MSGPACK_CODEC]:
+            benchmark_codec(name, req, codec, args.samples)
+
+
+if __name__ == '__main__':
+    module_main()
@@ -0,0 +1,84 @@
+"""Benchmark for forwarding characteristic updates to the connectors of the bridge, comparing updating the connectors
+one after another to handing the updates to the connector dispatcher, with one of the connectors being slow.
+Run from the repository root: 'python -m benchmarks.connector_fanout_benchmark'"""
+import argparse
+import time
+
+from connector_dispatcher import ConnectorDispatcher
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+
+
+class BenchmarkConnector:
+    """Takes the configured time for every update"""
+
+    def __init__(self, name: str, update_time: float):
+        self.name = name
+        self.updated = 0
+        self._update_time = update_time
+
+    def get_name(self) -> str:
+        return self.name
+
+    def update_characteristic(self, gadget_name: str, g_type: GadgetIdentifier,
+                              characteristic: CharacteristicIdentifier, value: int):
+        if self._update_time:
+            time.sleep(self._update_time)
+        self.updated += 1
+
+
+def create_connectors(connector_count: int, slow_update_time: float) -> list[BenchmarkConnector]:
+    return [BenchmarkConnector("slow_connector", slow_update_time)] + \
+           [BenchmarkConnector(f"connector_{index}", 0) for index in range(1, connector_count)]
+
+
+def measure_sequential(updates: int, connectors: list[BenchmarkConnector]) -> tuple[float, float]:
+    """
+    Updates the connectors one after another, like the bridge did before.
+
+    :return: Time in microseconds a single update blocks the caller and the time in seconds until the fast connectors
+             got every update
+    """
+    start = time.perf_counter()
+    for index in range(updates):
+        for connector in connectors:
+            connector.update_characteristic(f"gadget_{index}", GadgetIdentifier(1), CharacteristicIdentifier(3), index)
+    total_time = time.perf_counter() - start
+    return total_time / updates * 1000000, total_time
+
+
+def measure_dispatched(updates: int, connectors: list[BenchmarkConnector], worker_count: int) -> tuple[float, float]:
+    """Same as measure_sequential(), but hands the updates to the connector dispatcher"""
+    dispatcher = ConnectorDispatcher(worker_count=worker_count, max_pending=updates)
+
+    start = time.perf_counter()
+    for index in range(updates):
+        for connector in connectors:
+            dispatcher.dispatch(connector, f"gadget_{index}", GadgetIdentifier(1), CharacteristicIdentifier(3), index)
+    queue_time = time.perf_counter() - start
+    while any(connector.updated < updates for connector in connectors[1:]):
+        time.sleep(0.0005)
+    total_time = time.perf_counter() - start
+
+    dispatcher.shutdown()
+    return queue_time / updates * 1000000, total_time
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for forwarding characteristic updates to the connectors')
+    parser.add_argument('--updates', help='number of updates to forward', type=int, default=200)
+    parser.add_argument('--connectors', help='number of connectors', type=int, default=4)
+    parser.add_argument('--slow', help='time the slow connector needs for an update in milliseconds', type=float,
+                        default=5)
+    parser.add_argument('--workers', help='number of workers of the dispatcher', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} | {'blocks caller [us]':>18} | {'fast connectors done [s]':>24}")
+    block_us, seconds = measure_sequential(args.updates, create_connectors(args.connectors, args.slow / 1000))
+    print(f"{'sequential':>10} | {block_us:>18.1f} | {seconds:>24.3f}")
+    block_us, seconds = measure_dispatched(args.updates, create_connectors(args.connectors, args.slow / 1000),
+                                           args.workers)
+    print(f"{'dispatched':>10} | {block_us:>18.1f} | {seconds:>24.3f}")
+
+
+if __name__ == '__main__':
+    module_main()
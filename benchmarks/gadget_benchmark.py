@@ -0,0 +1,49 @@
+"""Benchmark for characteristic lookups and info updates on gadgets with many characteristics.
+Run from the repository root: 'python -m benchmarks.gadget_benchmark'"""
+import argparse
+import time
+
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier
+
+# Characteristic counts to measure. There are only a few CharacteristicIdentifiers, plain ints are used as types to
+# simulate bigger gadgets.
+_characteristic_counts = [8, 64, 512]
+
+
+def create_characteristics(count: int, value: int) -> list[Characteristic]:
+    return [Characteristic(c_type, 0, 100, 1, value) for c_type in range(count)]
+
+
+def measure(func, samples: int) -> float:
+    """Returns the mean time in microseconds needed to call func"""
+    start = time.perf_counter()
+    for _ in range(samples):
+        func()
+    return (time.perf_counter() - start) / samples * 1000000
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the gadget characteristic handling')
+    parser.add_argument('--samples', help='number of operations per measurement', type=int, default=2000)
+    args = parser.parse_args()
+
+    for count in _characteristic_counts:
+        gadget = Gadget("benchmark_gadget", GadgetIdentifier(1), "benchmark_client", 0,
+                        create_characteristics(count, 0))
+        last_type = count - 1
+        value_updates = [create_characteristics(count, 0), create_characteristics(count, 1)]
+        update_index = [0]
+
+        def update_info():
+            update_index[0] ^= 1
+            gadget.update_gadget_info(GadgetIdentifier(1), "benchmark_client", 0, value_updates[update_index[0]])
+
+        update_time = measure(lambda: gadget.update_characteristic(last_type, 50), args.samples)
+        merge_time = measure(update_info, args.samples)
+        print(f"{count:>4} characteristics  update_characteristic: {update_time:>6.2f}µs  "
+              f"update_gadget_info: {merge_time:>8.1f}µs ({merge_time / count:.3f}µs per characteristic)")
+
+
+if __name__ == '__main__':
+    module_main()
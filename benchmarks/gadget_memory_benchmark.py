@@ -0,0 +1,46 @@
+"""Benchmark for the memory footprint and serialization time of large installations.
+Run from the repository root: 'python -m benchmarks.gadget_memory_benchmark'"""
+import argparse
+import time
+import tracemalloc
+
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+
+_characteristics_per_gadget = len(CharacteristicIdentifier) - 1
+
+
+def create_gadgets(characteristic_count: int) -> list[Gadget]:
+    return [Gadget(f"gadget_{i}",
+                   GadgetIdentifier(1),
+                   f"client_{i % 32}",
+                   0,
+                   [Characteristic(CharacteristicIdentifier(c_type), 0, 100, 1, 50)
+                    for c_type in range(1, _characteristics_per_gadget + 1)])
+            for i in range(characteristic_count // _characteristics_per_gadget)]
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the memory footprint of gadgets')
+    parser.add_argument('--characteristics', help='number of characteristics to create', type=int, default=70000)
+    parser.add_argument('--samples', help='number of times all gadgets are serialized', type=int, default=5)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    gadgets = create_gadgets(args.characteristics)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    characteristic_count = len(gadgets) * _characteristics_per_gadget
+    print(f"{len(gadgets)} gadgets with {characteristic_count} characteristics: {allocated / 1024 / 1024:.2f}MiB, "
+          f"{allocated / characteristic_count:.0f} bytes per characteristic including the gadgets")
+
+    start = time.perf_counter()
+    for _ in range(args.samples):
+        [gadget.serialized() for gadget in gadgets]
+    serialization_time = (time.perf_counter() - start) / args.samples
+    print(f"Serializing all gadgets: {serialization_time * 1000:.1f}ms, "
+          f"{serialization_time / characteristic_count * 1000000000:.0f}ns per characteristic")
+
+
+if __name__ == '__main__':
+    module_main()
@@ -0,0 +1,122 @@
+"""Benchmark for the characteristic updates sent to homebridge, comparing different numbers of updates in flight,
+and for the gadget registrations sent after a restart of the bridge.
+Run from the repository root: 'python -m benchmarks.homekit_update_benchmark'"""
+import argparse
+import json
+import threading
+import time
+from queue import Queue
+from typing import Optional
+
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+from homekit_connector import HomeKitConnector
+
+
+class BenchmarkMessage:
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+class BenchmarkHomebridge:
+    """Stands in for the mqtt client and homebridge, acknowledges every update after the round trip time"""
+
+    def __init__(self, round_trip_time: float, gadget_list: Optional[dict] = None):
+        self.on_message = None
+        self.published = 0
+        self._round_trip_time = round_trip_time
+        self._gadget_list = gadget_list
+        self._acks = Queue()
+        self._ack_thread = threading.Thread(target=self._send_acks, daemon=True)
+        self._ack_thread.start()
+
+    def publish(self, topic: str, payload: str):
+        message = json.loads(payload)
+        if topic == "homebridge/to/get":
+            gadget_list = dict(self._gadget_list or {}, request_id=message["request_id"])
+            self.on_message(self, None, BenchmarkMessage("homebridge/from/response", json.dumps(gadget_list).encode()))
+            return
+        self.published += 1
+        self._acks.put((time.perf_counter() + self._round_trip_time, message["request_id"]))
+
+    def disconnect(self):
+        self._acks.put(None)
+
+    def _send_acks(self):
+        while True:
+            ack = self._acks.get()
+            if ack is None:
+                return
+            due_time, request_id = ack
+            time.sleep(max(due_time - time.perf_counter(), 0))
+            ack_payload = json.dumps({"ack": True, "request_id": request_id}).encode()
+            self.on_message(self, None, BenchmarkMessage("homebridge/from/response", ack_payload))
+
+
+def measure(updates: int, max_in_flight: int, round_trip_time: float) -> tuple[float, float]:
+    """Returns the time in microseconds needed to queue an update and the number of updates acknowledged per second"""
+    homebridge = BenchmarkHomebridge(round_trip_time)
+    connector = HomeKitConnector(None, "benchmark_homekit", "localhost", 1883, max_in_flight=max_in_flight,
+                                 mqtt_client=homebridge)
+
+    start = time.perf_counter()
+    for index in range(updates):
+        # Every update changes a different characteristic, so none of them is replaced by a later one
+        connector.update_characteristic(f"gadget_{index}", GadgetIdentifier(1), CharacteristicIdentifier(3), index)
+    queue_time = time.perf_counter() - start
+    while connector.get_update_metrics()["acknowledged"] < updates:
+        time.sleep(0.001)
+    total_time = time.perf_counter() - start
+
+    connector.__del__()
+    return queue_time / updates * 1000000, updates / total_time
+
+
+def measure_restart(gadget_count: int, changed_count: int, round_trip_time: float) -> tuple[int, float]:
+    """
+    Reconciles the gadgets of the bridge with homebridge still hosting them from the last run. As on a restart of the
+    bridge, the connector is added before the clients sync their gadgets.
+
+    :return: Number of messages sent and the time in seconds until all of them were acknowledged
+    """
+    gadgets = [Gadget(f"gadget_{index}", GadgetIdentifier(1 if index >= changed_count else 2), "benchmark_client", 1,
+                      [Characteristic(CharacteristicIdentifier(3), 0, 100, 1, 50)])
+               for index in range(gadget_count)]
+    gadget_list = {f"gadget_{index}": {"services": {"light": "Lightbulb"}} for index in range(gadget_count)}
+    homebridge = BenchmarkHomebridge(round_trip_time, gadget_list)
+    connector = HomeKitConnector(None, "benchmark_homekit", "localhost", 1883, mqtt_client=homebridge)
+
+    start = time.perf_counter()
+    connector.reconcile_gadgets([])
+    for gadget in gadgets:
+        connector.register_gadget(gadget)
+    while connector.get_update_metrics()["pending_registrations"] or connector.get_update_metrics()["in_flight"]:
+        time.sleep(0.001)
+    total_time = time.perf_counter() - start
+
+    connector.__del__()
+    return homebridge.published, total_time
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the characteristic updates sent to homebridge')
+    parser.add_argument('--updates', help='number of updates to send', type=int, default=500)
+    parser.add_argument('--rtt', help='round trip time to homebridge in milliseconds', type=float, default=5)
+    parser.add_argument('--gadgets', help='number of gadgets hosted by homebridge on restart', type=int, default=300)
+    parser.add_argument('--changed', help='number of gadgets changed since the last run', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'in flight':>9} | {'queue update [us]':>17} | {'acknowledged/s':>16}")
+    for max_in_flight in [1, 8, 32]:
+        queue_us, rate = measure(args.updates, max_in_flight, args.rtt / 1000)
+        print(f"{max_in_flight:>9} | {queue_us:>17.2f} | {rate:>16.0f}")
+
+    # Registering every gadget one by one sends one add per gadget, each of them failing for unchanged gadgets
+    messages, seconds = measure_restart(args.gadgets, args.changed, args.rtt / 1000)
+    print(f"\nRestart with {args.gadgets} gadgets, {args.changed} of them changed:")
+    print(f"registering all: {args.gadgets} messages, reconciling: {messages} messages in {seconds:.2f}s")
+
+
+if __name__ == '__main__':
+    module_main()
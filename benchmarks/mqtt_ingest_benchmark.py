@@ -0,0 +1,172 @@
+"""Benchmark for the ingest of mqtt messages, comparing the batched ingest with decoding in the mqtt network loop,
+and with dropping messages meant for other hosts before decoding them.
+Run from the repository root: 'python -m benchmarks.mqtt_ingest_benchmark'"""
+import argparse
+import json
+import threading
+import time
+from queue import Queue
+from typing import Optional
+
+from jsonschema import ValidationError
+
+from network.mqtt_message_filter import MQTTMessageFilter
+from network.mqtt_server_client import MQTTServerClient
+from network.network_connector import req_validation_scheme_name
+from network.request import Request
+from pubsub import Subscriber
+
+_host_name = "benchmark_host"
+
+
+class BenchmarkMessage:
+    topic: str
+    payload: bytes
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+class BenchmarkMQTTClient:
+    """Stands in for a connected paho client, messages are delivered by calling on_message"""
+
+    def __init__(self):
+        self.on_message = None
+        self.on_connect = None
+        self.on_disconnect = None
+
+    def publish(self, topic: str, payload: str):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+
+class LegacyMQTTServerClient(MQTTServerClient):
+    """Decodes every message in the mqtt network loop after rewriting quotes, like the client did before"""
+
+    _legacy_queue: Queue
+
+    def __init__(self, host_name: str, address: str, mqtt_client, max_pending_messages: int, message_filter=None):
+        self._legacy_queue = Queue()
+        super().__init__(host_name, address, mqtt_client, max_pending_messages)
+
+    def generate_callback(self):
+        logger = self._logger
+        respond_method = self._respond_to
+        legacy_queue = self._legacy_queue
+        validator = self._validator
+
+        def buf_callback(client, userdata, message):
+            json_str = message.payload.decode("utf-8").replace("'", '"').replace("None", "null")
+            try:
+                body = json.loads(json_str)
+            except json.decoder.JSONDecodeError:
+                return
+            try:
+                validator.validate(body, req_validation_scheme_name)
+            except ValidationError:
+                logger.warning("Could not decode Request, Schema Validation failed.")
+            inc_req = Request(message.topic, body["session_id"], body["sender"], body["receiver"], body["payload"],
+                              connection_type=f"MQTT")
+            inc_req.set_callback_method(respond_method)
+            legacy_queue.put(inc_req)
+
+        return buf_callback
+
+    def _receive(self) -> Optional[Request]:
+        return self._legacy_queue.get()
+
+    def _stop_receiving(self):
+        self._legacy_queue.put(None)
+
+
+class CountingSubscriber(Subscriber):
+    count: int
+    done: threading.Event
+    _expected: int
+
+    def __init__(self, expected: int):
+        self.count = 0
+        self.done = threading.Event()
+        self._expected = expected
+
+    def receive(self, req: Request):
+        self.count += 1
+        if self.count >= self._expected:
+            self.done.set()
+
+
+def create_messages(count: int, foreign_share: float) -> list[BenchmarkMessage]:
+    """
+    Creates messages like the traffic of clients on a busy 'smarthome/#' topic
+
+    :param count: Number of messages
+    :param foreign_share: Share of the messages addressed to other hosts, the rest is addressed to the benchmark host
+    """
+    messages = []
+    for index in range(count):
+        is_foreign = index % 100 < foreign_share * 100
+        body = {"session_id": index,
+                "sender": f"client_{index % 20}",
+                "receiver": f"client_{(index + 1) % 20}" if is_foreign else _host_name,
+                "payload": {"name": f"gadget_{index % 100}", "characteristic": 1, "value": index % 100}}
+        messages.append(BenchmarkMessage(f"smarthome/gadget/update/{index % 20}", json.dumps(body).encode()))
+    return messages
+
+
+def measure(client_class, messages: list[BenchmarkMessage], expected: int,
+            message_filter: Optional[MQTTMessageFilter] = None) -> tuple[float, float]:
+    """
+    Delivers all messages as fast as possible.
+
+    :param client_class: Class of the client receiving the messages
+    :param messages: The messages to deliver
+    :param expected: Number of messages the client publishes
+    :param message_filter: Filter passed to the client
+    :return: Microseconds the network loop spent per message, messages per second handled by the client
+    """
+    mqtt_client = BenchmarkMQTTClient()
+    # Every message has to fit into the queue, otherwise messages would be dropped and never published
+    server_client = client_class(_host_name, "benchmark_broker", mqtt_client, len(messages), message_filter)
+    subscriber = CountingSubscriber(expected)
+    server_client.subscribe(subscriber)
+
+    # Published requests are logged by the client, which would dominate the measurement
+    server_client._forward_request = server_client._publish
+
+    start = time.perf_counter()
+    for message in messages:
+        mqtt_client.on_message(mqtt_client, None, message)
+    loop_time = time.perf_counter() - start
+    subscriber.done.wait()
+    total_time = time.perf_counter() - start
+
+    server_client.__del__()
+    return loop_time / len(messages) * 1000000, len(messages) / total_time
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the ingest of mqtt messages')
+    parser.add_argument('--messages', help='number of messages to deliver', type=int, default=20000)
+    parser.add_argument('--foreign_share', help='share of messages addressed to other hosts', type=float,
+                        default=0.8)
+    args = parser.parse_args()
+
+    messages = create_messages(args.messages, args.foreign_share)
+    own_count = len([message for message in messages if f'"{_host_name}"'.encode() in message.payload])
+    print(f"{'ingest':>8} | {'network loop [us/msg]':>21} | {'handled [msg/s]':>15}")
+    for name, client_class, message_filter, expected in [
+            ("legacy", LegacyMQTTServerClient, None, len(messages)),
+            ("batched", MQTTServerClient, None, len(messages)),
+            ("filtered", MQTTServerClient, MQTTMessageFilter(_host_name), own_count)]:
+        loop_us, rate = measure(client_class, messages, expected, message_filter)
+        print(f"{name:>8} | {loop_us:>21.2f} | {rate:>15.0f}")
+
+
+if __name__ == '__main__':
+    module_main()
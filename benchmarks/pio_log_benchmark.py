@@ -0,0 +1,113 @@
+"""Benchmark replaying a PlatformIO build log through the output analysis of the PioUploader.
+Run from the repository root: 'python -m benchmarks.pio_log_benchmark [--log <captured 'pio run' output>]'"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+from pio_uploader import PioUploader
+
+
+def create_build_log(source_count: int) -> list[str]:
+    """Creates the output of a verbose build and upload of a project with the given number of source files"""
+    lines = ["Processing esp32dev (platform: espressif32; board: esp32dev; framework: arduino)\n",
+             "-" * 80 + "\n",
+             "CONFIGURATION: https://docs.platformio.org/page/boards/espressif32/esp32dev.html\n",
+             "PLATFORM: Espressif 32 (3.2.0) > Espressif ESP32 Dev Module\n",
+             "HARDWARE: ESP32 240MHz, 320KB RAM, 4MB Flash\n",
+             "LDF: Library Dependency Finder -> http://bit.ly/configure-pio-ldf\n"]
+    folders = ["src", "FrameworkArduino", "lib8a1/ArduinoJson", "lib0/Smarthome"]
+    for i in range(source_count):
+        folder = folders[i % len(folders)]
+        lines.append(f"xtensa-esp32-elf-g++ -o .pio/build/esp32dev/{folder}/file_{i}.cpp.o -c -std=gnu++11 "
+                     f"-fexceptions -fno-rtti -Os -g3 -Wall -nostdlib -Wpointer-arith -Wno-error=unused-function "
+                     f"-DPLATFORMIO=50101 -DARDUINO_ESP32_DEV -DESP32 -DESP_PLATFORM -DF_CPU=240000000L "
+                     f"-Iinclude -Isrc -I.pio/libdeps/esp32dev/ArduinoJson/src {folder}/file_{i}.cpp\n")
+        lines.append(f"Compiling .pio/build/esp32dev/{folder}/file_{i}.cpp.o\n")
+        if i % 10 == 0:
+            lines.append(f"src/file_{i}.cpp:12:5: warning: unused variable 'buffer' [-Wunused-variable]\n")
+    lines += ["Linking .pio/build/esp32dev/firmware.elf\n",
+              "Retrieving maximum program size .pio/build/esp32dev/firmware.elf\n",
+              "Checking size .pio/build/esp32dev/firmware.elf\n",
+              "RAM:   [=         ]  13.9% (used 45524 bytes from 327680 bytes)\n",
+              "Flash: [========  ]  78.4% (used 1027458 bytes from 1310720 bytes)\n",
+              "Configuring upload protocol...\n",
+              "Looking for upload port...\n",
+              "Serial port /dev/cu.SLAB_USBtoUART\n",
+              "Connecting........_\n"]
+    lines += [f"Writing at 0x{0x10000 + i * 0x4000:08x}... ({i} %)\n" for i in range(100)]
+    return lines
+
+
+def analyze_line_with_regex_calls(uploader: PioUploader, line: str):
+    """Former analysis, compiling the patterns and calling the regex module for each of them on every line"""
+    if re.findall("Linking .pio/build/[a-zA-Z0-9]+?/firmware.elf", line):
+        uploader._callback(9, "Linking...")
+    elif re.findall(r"A fatal error occurred: \.+? Timed out waiting for packet header", line):
+        uploader._callback(-5, "Error connecting to Chip.")
+    elif re.findall("Serial port .+?", line):
+        uploader._callback(5, "Connecting to Chip...")
+    elif re.findall(r"Compiling .pio/build/\w+?/src/.+?.cpp.o", line):
+        if uploader._compile_src_unsent:
+            uploader._callback(11, "Compiling Source")
+            uploader._compile_src_unsent = False
+    elif re.findall(r"Compiling .pio/build/\w+?/FrameworkArduino/.+?.cpp.o", line):
+        if uploader._compile_framework_unsent:
+            uploader._callback(10, "Compiling Framework")
+            uploader._compile_framework_unsent = False
+    elif re.findall(r"Compiling .pio/build/\w+?/lib[0-9]+/.+?.o", line):
+        if uploader._compile_lib_unsent:
+            uploader._callback(12, "Compiling Libraries")
+            uploader._compile_lib_unsent = False
+    else:
+        writing_group = re.match(r"Writing at (0x[0-9a-f]+)\.+? \(([0-9]+?) %\)", line)
+        if writing_group and int(writing_group.groups()[0], 16) >= 65536:
+            uploader._callback(13, f"Writing Firmware: {writing_group.groups()[1]}%")
+        ram_groups = re.match("RAM:.+?([0-9\\.]+?)%", line)
+        if ram_groups:
+            uploader._callback(14, f"RAM usage: {ram_groups.groups()[0]}%")
+        flash_groups = re.match("Flash:.+?([0-9\\.]+?)%", line)
+        if flash_groups:
+            uploader._callback(8, f"Flash usage: {flash_groups.groups()[0]}%")
+
+
+def replay(lines: list[str], analyze) -> (float, list):
+    """Replays the lines through the analysis method, returns the time needed and the reported messages"""
+    messages = []
+    with tempfile.TemporaryDirectory() as project_path:
+        open(os.path.join(project_path, "platformio.ini"), "w").close()
+        uploader = PioUploader(project_path, output_callback=lambda code, message: messages.append((code, message)))
+        uploader._compile_src_unsent = True
+        uploader._compile_framework_unsent = True
+        uploader._compile_lib_unsent = True
+        start = time.perf_counter()
+        for line in lines:
+            analyze(uploader, line)
+        return time.perf_counter() - start, messages
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the analysis of the PlatformIO output')
+    parser.add_argument('--log', help='captured output of \'pio run --target upload\' to replay', type=str)
+    parser.add_argument('--sources', help='number of source files in the generated log', type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log) as f:
+            lines = f.readlines()
+    else:
+        lines = create_build_log(args.sources)
+
+    regex_call_time, regex_call_messages = replay(lines, analyze_line_with_regex_calls)
+    analyzer_time, messages = replay(lines, PioUploader._analyze_line)
+    print(f"Replayed {len(lines)} lines, {len(messages)} messages reported "
+          f"({'same as' if messages == regex_call_messages else 'DIFFERENT from'} the former analysis)")
+    print(f"One regex call per pattern: {regex_call_time * 1000:>8.1f}ms "
+          f"({regex_call_time / len(lines) * 1000000:.2f}µs per line)")
+    print(f"PioUploader._analyze_line:  {analyzer_time * 1000:>8.1f}ms "
+          f"({analyzer_time / len(lines) * 1000000:.2f}µs per line)")
+
+
+if __name__ == '__main__':
+    module_main()
@@ -0,0 +1,56 @@
+"""Benchmark checking that publishing does not get slower the more requests were sent over a connector.
+Run from the repository root: 'python -m benchmarks.publish_benchmark'"""
+import argparse
+import time
+
+from network.request import Request
+from pubsub import Subscriber
+from test_helpers.loopback_network_connector import LoopbackConnector
+
+_publish_samples = 10000
+
+
+class CountingSubscriber(Subscriber):
+    count: int
+
+    def __init__(self):
+        self.count = 0
+
+    def receive(self, req: Request):
+        self.count += 1
+
+
+def measure_publish(connector: LoopbackConnector) -> float:
+    """Returns the mean time in microseconds needed to pass a request to all subscribers of the connector"""
+    req = Request("benchmark/publish", None, "benchmark_sender", None, {})
+    start = time.perf_counter()
+    for _ in range(_publish_samples):
+        connector.receive(req)
+    return (time.perf_counter() - start) / _publish_samples * 1000000
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the publishing cost of network connectors')
+    parser.add_argument('--requests', help='number of requests to send', type=int, default=100000)
+    parser.add_argument('--steps', help='number of measurements taken while sending', type=int, default=5)
+    args = parser.parse_args()
+
+    connector = LoopbackConnector("benchmark_connector")
+    subscriber = CountingSubscriber()
+    connector.subscribe(subscriber)
+
+    print(f"{'requests sent':>14} | {'subscribers':>11} | {'pending':>7} | {'publish [us]':>12}")
+    sent = 0
+    step_size = max(args.requests // args.steps, 1)
+    while True:
+        print(f"{sent:>14} | {connector.get_client_number():>11} | {connector.get_pending_request_count():>7} | "
+              f"{measure_publish(connector):>12.2f}")
+        if sent >= args.requests:
+            break
+        for _ in range(step_size):
+            connector.send_request("benchmark/request", "benchmark_receiver", {}, timeout=1)
+        sent += step_size
+
+
+if __name__ == '__main__':
+    module_main()
@@ -0,0 +1,118 @@
+"""Benchmark comparing the threaded SocketServer with the SelectorSocketServer for many connected clients.
+Run from the repository root: 'python -m benchmarks.socket_server_benchmark --server selector'"""
+import argparse
+import selectors
+import socket
+import threading
+import time
+
+from network.echo_client import TestEchoClient
+from network.request import Request
+from network.selector_socket_server import SelectorSocketServer
+from network.socket_server import SocketServer
+from network.socket_message_buffer import SocketMessageBuffer
+from network.socket_server_client import encode_socket_request
+
+_server_name = "benchmark_server"
+
+
+def connect_clients(port: int, count: int) -> list[socket.socket]:
+    clients = []
+    for _ in range(count):
+        client = socket.create_connection((socket.gethostname(), port))
+        clients.append(client)
+    return clients
+
+
+def wait_for_client_count(server, count: int, timeout: float = 30):
+    end_time = time.time() + timeout
+    while server.get_client_count() < count and time.time() < end_time:
+        time.sleep(0.05)
+
+
+def measure_idle(seconds: float) -> float:
+    """Returns the cpu time in seconds used by the whole process while idling"""
+    start = time.process_time()
+    time.sleep(seconds)
+    return time.process_time() - start
+
+
+def run_active_rounds(clients: list[socket.socket], rounds: int) -> list[float]:
+    """Lets every client send a request and wait for the echo, returns the round trip time of every request"""
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    send_times = {}
+    latencies = []
+
+    for index, client in enumerate(clients):
+        client.setblocking(False)
+        selector.register(client, selectors.EVENT_READ, index)
+        buffers[index] = SocketMessageBuffer()
+
+    def send(index: int):
+        req = Request("benchmark/echo", None, f"benchmark_client_{index}", _server_name, {"index": index})
+        send_times[index] = time.perf_counter()
+        clients[index].sendall(encode_socket_request(req))
+
+    remaining = {index: rounds for index in range(len(clients))}
+    for index in remaining:
+        send(index)
+
+    while remaining:
+        for key, _ in selector.select(timeout=10):
+            index = key.data
+            for _ in buffers[index].add_data(key.fileobj.recv(65536)):
+                latencies.append(time.perf_counter() - send_times[index])
+                remaining[index] -= 1
+                if remaining[index]:
+                    send(index)
+                else:
+                    del remaining[index]
+
+    selector.close()
+    return latencies
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for socket servers with many clients')
+    parser.add_argument('--server', help='server implementation to test', choices=["threaded", "selector"],
+                        default="selector")
+    parser.add_argument('--clients', help='number of clients to connect', type=int, default=1000)
+    parser.add_argument('--rounds', help='requests sent by every client in the active phase', type=int, default=10)
+    parser.add_argument('--idle_time', help='seconds to measure cpu usage while idle', type=float, default=5)
+    parser.add_argument('--port', help='port to run the server on', type=int, default=5790)
+    args = parser.parse_args()
+
+    base_threads = threading.active_count()
+    if args.server == "threaded":
+        server = SocketServer(_server_name, args.port)
+    else:
+        server = SelectorSocketServer(_server_name, args.port)
+    echo = TestEchoClient(server)
+
+    start = time.perf_counter()
+    clients = connect_clients(args.port, args.clients)
+    wait_for_client_count(server, args.clients)
+    print(f"Connected {server.get_client_count()} clients in {time.perf_counter() - start:.2f}s")
+    print(f"Threads used by the server: {threading.active_count() - base_threads}")
+
+    idle_cpu = measure_idle(args.idle_time)
+    print(f"CPU usage while idle: {idle_cpu / args.idle_time * 100:.1f}%")
+
+    start = time.perf_counter()
+    latencies = sorted(run_active_rounds(clients, args.rounds))
+    duration = time.perf_counter() - start
+    print(f"Answered {len(latencies)} requests in {duration:.2f}s ({len(latencies) / duration:.0f} requests/s)")
+    print(f"Latency p50: {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.1f}ms")
+
+    start = time.perf_counter()
+    server.__del__()
+    print(f"Shutdown took {time.perf_counter() - start:.2f}s")
+    for client in clients:
+        client.close()
+    del echo
+
+
+if __name__ == '__main__':
+    module_main()
@@ -0,0 +1,55 @@
+"""Benchmark comparing the per-message cost of validating requests against their json schemas.
+Run from the repository root: 'python -m benchmarks.validation_benchmark'"""
+import argparse
+import json
+import os
+import time
+
+import jsonschema
+from jsonschema.validators import validator_for
+
+from json_validator import Validator
+
+_sample_request = {"path": "smarthome/remotes/gadget/update",
+                   "body": {"session_id": 123456,
+                            "sender": "esp32_livingroom",
+                            "receiver": "bridge",
+                            "payload": {"name": "ceiling_lamp",
+                                        "characteristics": [{"type": 1, "min": 0, "max": 1, "step": 1, "value": 1}]}}}
+_sample_config = {"name": "benchmark_client",
+                  "description": "Client config used for the validation benchmark",
+                  "data": {"id": "benchmark_client", "network_mode": 0},
+                  "gadgets": [{"type": 1, "name": "ceiling_lamp", "ports": {"port0": 4}}]}
+
+
+def measure(func, samples: int) -> float:
+    """Returns the mean time in microseconds needed to call func"""
+    start = time.perf_counter()
+    for _ in range(samples):
+        func()
+    return (time.perf_counter() - start) / samples * 1000000
+
+
+def module_main():
+    parser = argparse.ArgumentParser(description='Benchmark for the json schema validation')
+    parser.add_argument('--samples', help='number of validations per measurement', type=int, default=5000)
+    args = parser.parse_args()
+
+    validator = Validator()
+    schemas = {"request_basic_structure": (_sample_request["body"], True),
+               "socket_request_structure": (_sample_request, True),
+               "client_config": (_sample_config, False)}
+
+    for schema_name, (target, has_fast_path) in schemas.items():
+        with open(os.path.join("json_schemas", f"{schema_name}.json")) as f:
+            schema = json.load(f)
+        uncached = measure(lambda: jsonschema.validate(target, schema), args.samples)
+        compiled_validator = validator_for(schema)(schema)
+        compiled = measure(lambda: compiled_validator.validate(target), args.samples)
+        current = measure(lambda: validator.validate(target, schema_name), args.samples)
+        print(f"{schema_name:<26} jsonschema.validate: {uncached:>7.1f}µs  compiled: {compiled:>6.1f}µs  "
+              f"Validator.validate{' (fast path)' if has_fast_path else ''}: {current:>6.1f}µs")
+
+
+if __name__ == '__main__':
+    module_main()
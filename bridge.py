@@ -2,6 +2,7 @@ import argparse
 import json
 import socket
 import random
+import signal
 import sys
 import os
 import time
@@ -16,6 +17,10 @@ import logging
 from homekit_connector import HomeConnectorType, HomeKitConnector
 from network.serial_connector import SerialConnector
 from smarthomeclient import SmarthomeClient
+from api_server import ApiServerMode, DEFAULT_WORKER_COUNT
+from bridge_registry import BridgeRegistry, GadgetSyncResult
+from characteristic_stream import CharacteristicStream
+from connector_dispatcher import ConnectorDispatcher
 from gadget import Gadget, GadgetIdentifier, CharacteristicIdentifier, CharacteristicUpdateStatus, Characteristic
 from typing import Optional
 from network.mqtt_connector import MQTTConnector
@@ -100,7 +105,9 @@ class MainBridge(Subscriber):
 
     # API
     __api_port: int
-    __api_thread: Thread
+    __api_server_mode: ApiServerMode
+    __api_worker_count: int
+    __api_thread: Optional[Thread]
     _socket_api_port: int
     _socket_server: SocketServer
 
@@ -109,11 +116,11 @@ class MainBridge(Subscriber):
 
     __streaming_message_queue: [str]
 
-    # Gadgets:
-    __gadgets: [Gadget]
+    # Gadgets and clients
+    __registry: BridgeRegistry
 
-    # Clients
-    __clients: [SmarthomeClient]
+    # Pushes characteristic changes to the api
+    __characteristic_stream: CharacteristicStream
 
     # Connectors
     __connectors = []
@@ -174,20 +181,27 @@ class MainBridge(Subscriber):
 
         # API
         self.__api_port = 0
+        self.__api_server_mode = ApiServerMode.production
+        self.__api_worker_count = DEFAULT_WORKER_COUNT
+        self.__api_thread = None
         self._socket_api_port = 0
 
-        self.__clients = []
-        self.__gadgets = []
+        self.__registry = BridgeRegistry()
+        self.__characteristic_stream = CharacteristicStream()
         self.__connectors = []
+        self.__connector_dispatcher = ConnectorDispatcher()
 
         self.__streaming_message_queue = []
 
         print("Setting up Network...")
+        # Clients address the bridge as '<bridge>', responses to requests of the bridge carry its name
         self.__network_gadget = MQTTConnector(self.__bridge_name,
                                               self.__mqtt_ip,
                                               self.__mqtt_port,
                                               None,
-                                              None)
+                                              None,
+                                              receivers=["<bridge>"],
+                                              accept_broadcasts=False)
         self.__network_gadget.subscribe(self)
 
         self.__load_json_schemas()
@@ -287,67 +301,24 @@ class MainBridge(Subscriber):
 
                 print("Received sync data from '{}'".format(local_client.get_name()))
 
-                updated_gadgets: [str] = []
-
-                # Go over all gadgets and create or update them
-                for list_gadget in req_pl["gadgets"]:
-
-                    # If a gadget fails, it fails. That's why theres a giant try block.
-                    try:
-                        g_name = list_gadget["name"]
-                        g_type = GadgetIdentifier(list_gadget["type"])
-                        g_characteristics = []
-                        for characteristic in list_gadget["characteristics"]:
-                            # Create new characteristic
-                            new_c = Characteristic(CharacteristicIdentifier(characteristic["type"]),
-                                                   characteristic["min"],
-                                                   characteristic["max"],
-                                                   characteristic["step"],
-                                                   characteristic["value"])
-                            # Save it
-                            g_characteristics.append(new_c)
-
-                        # Get the gadget if there is already one in existence with the correct name
-                        buf_gadget: Optional[Gadget] = self.get_gadget(g_name)
-                        if buf_gadget is not None:
-                            # Update existing gadget
-                            print("Updating '{}'".format(buf_gadget.get_name()))
-                            buf_gadget.update_gadget_info(g_type,
-                                                          req.get_sender(),
-                                                          req_pl["runtime_id"],
-                                                          g_characteristics)
-                        else:
-                            # Create new gadget since there is no gadget with selected name
-                            print("Creating new '{}'".format(g_name))
-                            buf_gadget = Gadget(g_name,
-                                                g_type,
-                                                req.get_sender(),
-                                                req_pl["runtime_id"],
-                                                g_characteristics)
-                            self.add_gadget(buf_gadget)
-
-                        # Save name of gadget to skip deletion
-                        updated_gadgets.append(buf_gadget.get_name())
-
-                    except KeyError as e:
-                        print("Error syncing gadget:")
-                        print(e)
-
-                deleted_gadgets = 0
-
-                for gadget in self.__gadgets:
-                    if gadget.get_host_client() == req.get_sender():
-                        if gadget.get_hostname() not in updated_gadgets:
-                            self.delete_gadget(gadget)
-                            deleted_gadgets += 1
-
-                print("Updated {} Gadgets".format(len(updated_gadgets)))
-                print("Deleted {} Gadgets".format(deleted_gadgets))
+                sync_result = self.__registry.sync_client_gadgets(req.get_sender(),
+                                                                  req_pl["runtime_id"],
+                                                                  req_pl["gadgets"])
+                if sync_result.skipped:
+                    print("Gadgets are unchanged since the last sync")
+                else:
+                    self.__apply_sync_result_on_connectors(sync_result)
+                    print("Added {} Gadgets".format(len(sync_result.added)))
+                    print("Changed {} Gadgets".format(len(sync_result.changed)))
+                    print("Updated {} Values".format(len(sync_result.value_updates)))
+                    print("Deleted {} Gadgets".format(len(sync_result.removed)))
+                    print("Skipped {} unchanged Gadgets".format(sync_result.unchanged_count))
 
                 # Report update to client
                 local_client.update_data(req_pl["sw_uploaded"], req_pl["sw_commit"],
                                          req_pl["sw_branch"], req_pl["port_mapping"],
                                          req_pl["boot_mode"])
+                self.__registry.mark_client_changed(local_client.get_name())
 
                 print("Update finished.")
 
@@ -539,6 +510,14 @@ class MainBridge(Subscriber):
 
     # endregion
 
+    def get_characteristic_stream(self) -> CharacteristicStream:
+        """Returns the stream publishing every change of a characteristic"""
+        return self.__characteristic_stream
+
+    def get_registry_version(self) -> int:
+        """Returns a number that changes whenever any gadget or client changes"""
+        return self.__registry.get_version()
+
     # region CLIENT METHODS
 
     def get_client(self, name: str) -> Optional[SmarthomeClient]:
@@ -548,11 +527,7 @@ class MainBridge(Subscriber):
         :param name: Name of the wanted client
         :return: The client object if found, None otherwise
         """
-        with self.__lock:
-            for client in self.__clients:
-                if client.get_hostname() == name:
-                    return client
-        return None
+        return self.__registry.get_client(name)
 
     def __add_client(self, name: str, runtime_id: int) -> bool:
         """
@@ -562,18 +537,11 @@ class MainBridge(Subscriber):
         :param runtime_id: Current runtime id of the client
         :return: Whether adding the client was successful
         """
-        if self.get_client(name) is None:
-            with self.__lock:
-                buf_client = SmarthomeClient(name, runtime_id)
-                self.__clients.append(buf_client)
-                return True
-        return False
+        return self.__registry.add_client(SmarthomeClient(name, runtime_id))
 
     def get_all_clients(self) -> [SmarthomeClient]:
-        """Returns a list of all saved clients"""
-        with self.__lock:
-            return self.__clients
-        pass
+        """Returns a snapshot of all saved clients"""
+        return self.__registry.get_all_clients()
 
     @staticmethod
     def __trigger_client(client: SmarthomeClient):
@@ -595,10 +563,7 @@ class MainBridge(Subscriber):
         """
         local_client = self.get_client(name)
         if local_client is None:
-            success = self.__add_client(name, runtime_id)
-            local_client = self.get_client(name)
-            if local_client is None or not success:
-                return None
+            local_client = self.__registry.get_or_add_client(SmarthomeClient(name, runtime_id))
         return local_client
 
     def __get_or_create_client_from_request(self, req: Request) -> Optional[SmarthomeClient]:
@@ -618,6 +583,7 @@ class MainBridge(Subscriber):
 
         self.__trigger_client(local_client)
         local_client.update_runtime_id(req.get_payload()["runtime_id"])
+        self.__registry.mark_client_changed(local_client.get_name())
 
         return local_client
 
@@ -644,11 +610,10 @@ class MainBridge(Subscriber):
     def update_characteristic_on_gadget(self, gadget_name: str, characteristic: CharacteristicIdentifier,
                                         value: int) -> (CharacteristicUpdateStatus, Gadget):
         """Updates a single characteristic of the selected gadget"""
-        with self.__lock:
-            for buf_gadget in self.__gadgets:
-                if buf_gadget.get_hostname() == gadget_name:
-                    return buf_gadget.update_characteristic(characteristic, value), buf_gadget
-        return CharacteristicUpdateStatus.general_error, None
+        update_status, buf_gadget = self.__registry.update_characteristic(gadget_name, characteristic, value)
+        if update_status == CharacteristicUpdateStatus.update_successful:
+            self.__characteristic_stream.publish(gadget_name, characteristic, value)
+        return update_status, buf_gadget
 
     def update_characteristic_from_client(self, gadget_name: str, characteristic: CharacteristicIdentifier,
                                           value: int) -> CharacteristicUpdateStatus:
@@ -693,9 +658,13 @@ class MainBridge(Subscriber):
 
     def update_characteristic_on_connectors(self, gadget: Gadget, characteristic: CharacteristicIdentifier,
                                             value: int, exclude=None) -> bool:
-        for connector in self.__connectors:
-            if exclude is not None and connector != exclude:
-                connector.update_characteristic(gadget.get_name(), characteristic, value)
+        """Forwards a characteristic update to every connector except the excluded one without waiting for them"""
+        with self.__lock:
+            connectors = list(self.__connectors)
+        for connector in connectors:
+            if exclude is None or connector is not exclude:
+                self.__connector_dispatcher.dispatch(connector, gadget.get_name(), gadget.get_type(), characteristic,
+                                                     value)
         return True
 
     # endregion
@@ -704,26 +673,39 @@ class MainBridge(Subscriber):
 
     def get_gadget(self, gadget_name: str) -> Optional[Gadget]:
         """Returns the data for the selected gadget"""
-        with self.__lock:
-            for buf_gadget in self.__gadgets:
-                if buf_gadget.get_hostname() == gadget_name:
-                    return buf_gadget
-            return None
+        return self.__registry.get_gadget(gadget_name)
 
-    def get_all_gadgets(self):
-        """Returns the data for all gadgets"""
-        with self.__lock:
-            return self.__gadgets
+    def get_all_gadgets(self) -> [Gadget]:
+        """Returns a snapshot of the data for all gadgets"""
+        return self.__registry.get_all_gadgets()
+
+    def get_gadgets_of_client(self, client_name: str) -> [Gadget]:
+        """Returns a snapshot of the data for all gadgets hosted by the selected client"""
+        return self.__registry.get_gadgets_of_client(client_name)
 
     def add_gadget(self, gadget: Gadget) -> bool:
         """Adds a gadget to the bridge"""
-        if self.get_gadget(gadget.get_name()):
+        if not self.__registry.add_gadget(gadget):
             print("Gadget with this name is already present")
             return False
+        print("Adding new gadget '{}'".format(gadget.get_name()))
+        self.__characteristic_stream.publish_resync()
+        return True
+
+    def __apply_sync_result_on_connectors(self, sync_result: GadgetSyncResult):
+        """Tells the connectors about the gadgets changed by a sync"""
         with self.__lock:
-            print("Adding new gadget '{}'".format(gadget.get_name()))
-            self.__gadgets.append(gadget)
-            return True
+            for connector in self.__connectors:
+                for gadget in sync_result.removed:
+                    connector.remove_gadget(gadget)
+                # Connectors replace the registrations of changed gadgets themselves
+                for gadget in sync_result.changed + sync_result.added:
+                    connector.register_gadget(gadget)
+        for gadget, characteristic, value in sync_result.value_updates:
+            self.update_characteristic_on_connectors(gadget, characteristic, value)
+            self.__characteristic_stream.publish(gadget.get_name(), characteristic, value)
+        if sync_result.added or sync_result.removed or sync_result.changed:
+            self.__characteristic_stream.publish_resync()
 
     def delete_gadget(self, gadget: Gadget):
         """Deletes the passed gadget from all connectors and the local storage"""
@@ -731,7 +713,8 @@ class MainBridge(Subscriber):
             for connector in self.__connectors:
                 connector.remove_gadget(gadget)
 
-            self.__gadgets.remove(gadget)
+        self.__registry.remove_gadget(gadget.get_name())
+        self.__characteristic_stream.publish_resync()
 
     # endregion
 
@@ -742,6 +725,14 @@ class MainBridge(Subscriber):
         with self.__lock:
             return self.__connectors
 
+    def stop_connectors(self):
+        """Stops passing characteristic updates to the connectors, connectors that do not return are left behind"""
+        self.__connector_dispatcher.shutdown()
+
+    def get_connector_metrics(self) -> dict[str, dict]:
+        """Returns the delivery counters and latency histogram of the characteristic updates of every connector"""
+        return self.__connector_dispatcher.get_metrics()
+
     def __add_connector(self, c_type: HomeConnectorType, data: dict):
         if c_type == HomeConnectorType.homekit:
             try:
@@ -751,6 +742,9 @@ class MainBridge(Subscriber):
                                                  mqtt_port=data["port"])
                 self.__connectors.append(buf_connector)
                 print("Added 'HomeKit' connector '{}'".format(buf_connector.get_name()))
+                # Homebridge keeps the gadgets of earlier runs, those are brought up to date instead of added again.
+                # Clients did not sync yet, so gadgets are only removed once a sync shows they are gone.
+                buf_connector.reconcile_gadgets(self.__registry.get_all_gadgets())
             except KeyError:
                 print("Received broken connector config")
 
@@ -770,12 +764,37 @@ class MainBridge(Subscriber):
         with self.__lock:
             return self.__api_port
 
+    def set_api_server(self, mode: ApiServerMode, worker_count: int = DEFAULT_WORKER_COUNT):
+        """Sets the server hosting the REST API and the number of requests the production server handles in parallel"""
+        with self.__lock:
+            self.__api_server_mode = mode
+            self.__api_worker_count = worker_count
+
+    def get_api_server_mode(self) -> ApiServerMode:
+        """Returns the server hosting the REST API"""
+        with self.__lock:
+            return self.__api_server_mode
+
+    def get_api_worker_count(self) -> int:
+        """Returns the number of requests the production server handles in parallel"""
+        with self.__lock:
+            return self.__api_worker_count
+
     def run_api(self):
         """Launches the REST API"""
         with self.__lock:
             self.__api_thread = BridgeAPIThread(parent=self)
             self.__api_thread.start()
 
+    def stop_api(self):
+        """Stops the REST API after answering all accepted requests"""
+        with self.__lock:
+            api_thread = self.__api_thread
+        # Open event streams would keep the server from stopping
+        self.__characteristic_stream.close()
+        if api_thread is not None and api_thread.stop():
+            api_thread.join()
+
     def set_socket_api_port(self, port: int):
         """Sets the port for the REST API"""
         with self.__lock:
@@ -813,6 +832,10 @@ if __name__ == '__main__':
     parser.add_argument('--mqtt_pw', help='mPassword for the MQTT Broker', type=str)
     parser.add_argument('--dummy_data', help='Adds dummy data for debugging.', action="store_true")
     parser.add_argument('--api_port', help='Port for the REST-API', type=int)
+    parser.add_argument('--api_server', help='Server hosting the REST-API', type=str,
+                        choices=[mode.value for mode in ApiServerMode], default=ApiServerMode.production.value)
+    parser.add_argument('--api_workers', help='Number of requests the REST-API handles in parallel', type=int,
+                        default=DEFAULT_WORKER_COUNT)
     parser.add_argument('--socket_port', help='Port for the Socket Server', type=int)
     ARGS = parser.parse_args()
 
@@ -844,8 +867,19 @@ if __name__ == '__main__':
         print("Adding dummy data:")
         bridge.add_dummy_data()
 
+    def handle_termination(signum, frame):
+        # Answers accepted api requests and finishes the running connector updates before terminating, all other
+        # threads are killed like before
+        bridge.stop_api()
+        bridge.stop_connectors()
+        sys.stdout.flush()
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, handle_termination)
+
     if ARGS.api_port:
         bridge.set_api_port(ARGS.api_port)
+        bridge.set_api_server(ApiServerMode(ARGS.api_server), ARGS.api_workers)
         bridge.run_api()
     else:
         print("No port for REST API configured.")
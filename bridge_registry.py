@@ -0,0 +1,309 @@
+"""Module to contain the registry storing the gadgets and clients known to the bridge"""
+import hashlib
+import json
+import logging
+import threading
+from typing import Optional
+
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier, CharacteristicUpdateStatus
+from smarthomeclient import SmarthomeClient
+
+
+def _get_digest(data) -> bytes:
+    """Returns a digest of json-compatible data, which is equal for equal data regardless of the order of keys"""
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).digest()
+
+
+class GadgetSyncResult:
+    """Changes made to the gadgets of a client by syncing them"""
+
+    # Whether the synced gadgets were the same as in the last sync, nothing was changed then
+    skipped: bool
+
+    # Gadgets that were not known before
+    added: list[Gadget]
+
+    # Gadgets that are not hosted by the client anymore
+    removed: list[Gadget]
+
+    # Gadgets whose type or characteristic options changed
+    changed: list[Gadget]
+
+    # Characteristic values that changed on otherwise unchanged gadgets
+    value_updates: list[tuple[Gadget, CharacteristicIdentifier, int]]
+
+    # Number of gadgets that were skipped because they did not change since the last sync
+    unchanged_count: int
+
+    def __init__(self):
+        self.skipped = False
+        self.added = []
+        self.removed = []
+        self.changed = []
+        self.value_updates = []
+        self.unchanged_count = 0
+
+
+class BridgeRegistry:
+    """
+    Thread-safe storage for the gadgets and clients of the bridge.
+
+    Gadgets and clients are indexed by their names, gadgets additionally by the client hosting them, so every lookup
+    is independent of the number of stored objects. Methods returning several objects return snapshots, which stay
+    unaffected by later changes to the registry.
+
+    Every change to the stored objects increases the version of the registry, so data derived from them can be
+    cached until the version changes. Characteristic values are changed via update_characteristic(), other changes
+    made directly on stored objects have to be reported via mark_gadget_changed() or mark_client_changed().
+    """
+
+    # Gadgets stored by their names
+    __gadgets: dict[str, Gadget]
+
+    # Names of the gadgets hosted by every client, stored by the client names
+    __gadgets_by_client: dict[str, set[str]]
+
+    # Clients stored by their names
+    __clients: dict[str, SmarthomeClient]
+
+    # Digests of the data gadgets were last synced with, stored by gadget name
+    __gadget_sync_digests: dict[str, bytes]
+
+    # Runtime id and digest of the complete gadget list every client last synced, stored by client name
+    __client_sync_digests: dict[str, tuple[int, bytes]]
+
+    # Increased on every change of the stored gadgets or clients
+    __version: int
+
+    __lock: threading.RLock
+    __logger: logging.Logger
+
+    def __init__(self):
+        self.__gadgets = {}
+        self.__gadgets_by_client = {}
+        self.__clients = {}
+        self.__gadget_sync_digests = {}
+        self.__client_sync_digests = {}
+        self.__version = 0
+        self.__lock = threading.RLock()
+        self.__logger = logging.getLogger(self.__class__.__name__)
+
+    def get_version(self) -> int:
+        """Returns the current version of the registry, which changes whenever a gadget or client changes"""
+        with self.__lock:
+            return self.__version
+
+    def __increase_version(self):
+        self.__version += 1
+
+    # region GADGETS
+
+    def get_gadget(self, name: str) -> Optional[Gadget]:
+        """Returns the gadget with the given name, or None if there is no such gadget"""
+        with self.__lock:
+            return self.__gadgets.get(name)
+
+    def get_all_gadgets(self) -> list[Gadget]:
+        """Returns a snapshot of all stored gadgets"""
+        with self.__lock:
+            return list(self.__gadgets.values())
+
+    def get_gadgets_of_client(self, client_name: str) -> list[Gadget]:
+        """Returns a snapshot of all gadgets hosted by the given client"""
+        with self.__lock:
+            return [self.__gadgets[name] for name in self.__gadgets_by_client.get(client_name, ())]
+
+    def get_gadget_count(self) -> int:
+        with self.__lock:
+            return len(self.__gadgets)
+
+    def add_gadget(self, gadget: Gadget) -> bool:
+        """Adds a gadget, returns False if there already is a gadget with the same name"""
+        with self.__lock:
+            if gadget.get_name() in self.__gadgets:
+                return False
+            self.__gadgets[gadget.get_name()] = gadget
+            self.__gadgets_by_client.setdefault(gadget.get_host_client(), set()).add(gadget.get_name())
+            self.__increase_version()
+            return True
+
+    def remove_gadget(self, name: str) -> Optional[Gadget]:
+        """Removes the gadget with the given name and returns it, or None if there was no such gadget"""
+        with self.__lock:
+            gadget = self.__gadgets.pop(name, None)
+            if gadget is None:
+                return None
+            self.__remove_from_client_index(gadget.get_host_client(), name)
+            self.__invalidate_sync(gadget)
+            self.__increase_version()
+            return gadget
+
+    def mark_gadget_changed(self, name: str):
+        """Reports that a gadget was changed outside of a sync, so the next sync has to check it again"""
+        with self.__lock:
+            gadget = self.__gadgets.get(name)
+            if gadget is not None:
+                self.__invalidate_sync(gadget)
+                self.__increase_version()
+
+    def update_characteristic(self, name: str, c_type: CharacteristicIdentifier,
+                              value: int) -> tuple[CharacteristicUpdateStatus, Optional[Gadget]]:
+        """
+        Updates a single characteristic of a gadget.
+
+        The update is made under the lock of the registry, so it cannot be lost to a sync replacing the
+        characteristics of the gadget at the same time.
+        :param name: Name of the gadget to update
+        :param c_type: Characteristic to update
+        :param value: New value of the characteristic
+        :return: The status of the update and the updated gadget, None if there is no such gadget
+        """
+        with self.__lock:
+            gadget = self.__gadgets.get(name)
+            if gadget is None:
+                return CharacteristicUpdateStatus.general_error, None
+            update_status = gadget.update_characteristic(c_type, value)
+            if update_status == CharacteristicUpdateStatus.update_successful:
+                self.__invalidate_sync(gadget)
+                self.__increase_version()
+            return update_status, gadget
+
+    def __invalidate_sync(self, gadget: Gadget):
+        self.__gadget_sync_digests.pop(gadget.get_name(), None)
+        self.__client_sync_digests.pop(gadget.get_host_client(), None)
+
+    def sync_client_gadgets(self, client_name: str, runtime_id: int, gadget_data: list[dict]) -> GadgetSyncResult:
+        """
+        Brings the gadgets hosted by a client up to date with the gadget data it sent.
+
+        Gadgets whose data did not change since the last sync are skipped without being parsed. All changes are
+        applied at once, other threads either see the state before or after the sync.
+        :param client_name: Name of the client hosting the gadgets
+        :param runtime_id: Current runtime id of the client
+        :param gadget_data: Serialized gadgets as sent by the client
+        :return: The changes made
+        """
+        result = GadgetSyncResult()
+        client_digest = (runtime_id, _get_digest(gadget_data))
+        with self.__lock:
+            if self.__client_sync_digests.get(client_name) == client_digest:
+                result.skipped = True
+                return result
+
+            synced_names = set()
+            for data in gadget_data:
+                try:
+                    name = data["name"]
+                    digest = _get_digest(data)
+                    gadget = self.__gadgets.get(name)
+                    if gadget is not None and gadget.get_host_client() == client_name \
+                            and self.__gadget_sync_digests.get(name) == digest:
+                        result.unchanged_count += 1
+                        synced_names.add(name)
+                        continue
+                    self.__sync_gadget(client_name, runtime_id, data, result)
+                    self.__gadget_sync_digests[name] = digest
+                    synced_names.add(name)
+                except (KeyError, TypeError, ValueError) as err:
+                    self.__logger.warning(f"Error syncing gadget from '{client_name}': {err}")
+
+            for name in list(self.__gadgets_by_client.get(client_name, ())):
+                if name not in synced_names:
+                    result.removed.append(self.remove_gadget(name))
+
+            self.__client_sync_digests[client_name] = client_digest
+            if result.changed or result.value_updates:
+                self.__increase_version()
+        return result
+
+    def __sync_gadget(self, client_name: str, runtime_id: int, data: dict, result: GadgetSyncResult):
+        g_type = GadgetIdentifier(data["type"])
+        characteristics = [Characteristic(CharacteristicIdentifier(c_data["type"]),
+                                          c_data["min"],
+                                          c_data["max"],
+                                          c_data["step"],
+                                          c_data["value"])
+                           for c_data in data["characteristics"]]
+        gadget = self.__gadgets.get(data["name"])
+        if gadget is None:
+            new_gadget = Gadget(data["name"], g_type, client_name, runtime_id, characteristics)
+            self.add_gadget(new_gadget)
+            result.added.append(new_gadget)
+            return
+
+        old_host_client = gadget.get_host_client()
+        changes = gadget.update_gadget_info(g_type, client_name, runtime_id, characteristics)
+        if old_host_client != client_name or changes.is_structural():
+            self.update_gadget_host(gadget.get_name(), old_host_client)
+            # The previous host has to check its gadgets again on its next sync
+            self.__client_sync_digests.pop(old_host_client, None)
+            result.changed.append(gadget)
+            return
+
+        for c_type in changes.value_changed:
+            result.value_updates.append((gadget, c_type, gadget.get_characteristic_value(c_type)))
+
+    def update_gadget_host(self, name: str, old_host_client: str):
+        """Moves a gadget to the index of its current host client after the host was changed on the gadget"""
+        with self.__lock:
+            gadget = self.__gadgets.get(name)
+            if gadget is None or gadget.get_host_client() == old_host_client:
+                return
+            self.__remove_from_client_index(old_host_client, name)
+            self.__gadgets_by_client.setdefault(gadget.get_host_client(), set()).add(name)
+            self.__increase_version()
+
+    def __remove_from_client_index(self, client_name: str, gadget_name: str):
+        client_gadgets = self.__gadgets_by_client.get(client_name)
+        if client_gadgets is None:
+            return
+        client_gadgets.discard(gadget_name)
+        if not client_gadgets:
+            del self.__gadgets_by_client[client_name]
+
+    # endregion
+
+    # region CLIENTS
+
+    def get_client(self, name: str) -> Optional[SmarthomeClient]:
+        """Returns the client with the given name, or None if there is no such client"""
+        with self.__lock:
+            return self.__clients.get(name)
+
+    def get_all_clients(self) -> list[SmarthomeClient]:
+        """Returns a snapshot of all stored clients"""
+        with self.__lock:
+            return list(self.__clients.values())
+
+    def add_client(self, client: SmarthomeClient) -> bool:
+        """Adds a client, returns False if there already is a client with the same name"""
+        with self.__lock:
+            if client.get_name() in self.__clients:
+                return False
+            self.__clients[client.get_name()] = client
+            self.__increase_version()
+            return True
+
+    def get_or_add_client(self, client: SmarthomeClient) -> SmarthomeClient:
+        """Adds the client if there is no client with the same name yet, returns the stored client"""
+        with self.__lock:
+            if self.add_client(client):
+                return client
+            return self.__clients[client.get_name()]
+
+    def remove_client(self, name: str) -> Optional[SmarthomeClient]:
+        """Removes the client with the given name and returns it, the gadgets hosted by it are kept"""
+        with self.__lock:
+            client = self.__clients.pop(name, None)
+            if client is not None:
+                self.__increase_version()
+            return client
+
+    def mark_client_changed(self, name: str):
+        """Reports that a client was changed directly on the client object"""
+        with self.__lock:
+            if name in self.__clients:
+                self.__increase_version()
+
+    # endregion
@@ -8,6 +8,7 @@ from typing import Optional
 from network.mqtt_connector import MQTTConnector
 from network.request import Request
 import api
+from api_server import ApiServerMode, PooledWSGIServer
 from client_controller import ClientController, NoClientResponseException
 
 
@@ -31,11 +32,13 @@ class BridgeMQTTThread(Thread):
 
 class BridgeAPIThread(Thread):
     __parent_object: MainBridge
+    __server: Optional[PooledWSGIServer]
 
     def __init__(self, parent: MainBridge):
         super().__init__()
         print("Creating Bridge API Thread")
         self.__parent_object = parent
+        self.__server = None
 
     def run(self):
         print("Starting Bridge API Thread")
@@ -45,8 +48,26 @@ class BridgeAPIThread(Thread):
             print("API port not configured")
             return
 
-        print("Launching API")
-        api.run_api(self.__parent_object, buf_api_port)
+        if self.__parent_object.get_api_server_mode() == ApiServerMode.development:
+            print("Launching API on development server")
+            api.run_api(self.__parent_object, buf_api_port)
+            return
+
+        worker_count = self.__parent_object.get_api_worker_count()
+        print(f"Launching API with {worker_count} workers")
+        self.__server = api.create_server(self.__parent_object, buf_api_port, worker_count)
+        self.__server.serve_forever()
+
+    def stop(self) -> bool:
+        """
+        Stops the production server after serving all accepted requests, the development server cannot be stopped
+
+        :return: Whether the server was stopped
+        """
+        if self.__server is None:
+            return False
+        self.__server.stop()
+        return True
 
 
 class ChipConfigFlasherThread(Thread):
@@ -0,0 +1,142 @@
+"""Module to push characteristic changes to consumers as they happen"""
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from gadgetlib import CharacteristicIdentifier
+
+# Maximum number of characteristics with undelivered changes a subscription keeps
+_default_max_pending = 1000
+
+
+class CharacteristicDelta:
+    """The latest value of a single characteristic"""
+
+    __slots__ = ("gadget_name", "characteristic", "value")
+
+    gadget_name: str
+    characteristic: CharacteristicIdentifier
+    value: int
+
+    def __init__(self, gadget_name: str, characteristic: CharacteristicIdentifier, value: int):
+        self.gadget_name = gadget_name
+        self.characteristic = characteristic
+        self.value = value
+
+    def serialized(self) -> dict:
+        return {"name": self.gadget_name, "characteristic": int(self.characteristic), "value": self.value}
+
+
+class CharacteristicSubscription:
+    """
+    Changes waiting to be delivered to a single consumer.
+
+    Changes of a characteristic that was changed before and not delivered yet replace the earlier change, so slow
+    consumers only receive the latest values. If more characteristics are pending than the subscription may keep,
+    the pending changes are dropped and the consumer is told to reload the complete state instead.
+    """
+
+    # Pending changes stored by gadget name and characteristic, in the order they were first changed
+    __pending: OrderedDict
+    __max_pending: int
+    __needs_resync: bool
+    __closed: bool
+    __condition: threading.Condition
+
+    def __init__(self, max_pending: int = _default_max_pending):
+        self.__pending = OrderedDict()
+        self.__max_pending = max_pending
+        self.__needs_resync = False
+        self.__closed = False
+        self.__condition = threading.Condition()
+
+    def push(self, gadget_name: str, characteristic: CharacteristicIdentifier, value: int):
+        with self.__condition:
+            if self.__closed or self.__needs_resync:
+                return
+            key = (gadget_name, characteristic)
+            if key in self.__pending:
+                self.__pending[key].value = value
+            elif len(self.__pending) < self.__max_pending:
+                self.__pending[key] = CharacteristicDelta(gadget_name, characteristic, value)
+            else:
+                self.__pending.clear()
+                self.__needs_resync = True
+            self.__condition.notify()
+
+    def request_resync(self):
+        """Tells the consumer to reload the complete state, for changes that cannot be expressed as deltas"""
+        with self.__condition:
+            self.__pending.clear()
+            self.__needs_resync = True
+            self.__condition.notify()
+
+    def get_changes(self, timeout: float) -> Optional[list[CharacteristicDelta]]:
+        """
+        Waits for changes and returns all pending ones.
+
+        :param timeout: Maximum time in seconds to wait for changes
+        :return: The pending changes, an empty list if there were none before the timeout or the subscription was
+                 closed, None if the consumer has to reload the complete state
+        """
+        with self.__condition:
+            self.__condition.wait_for(lambda: self.__pending or self.__needs_resync or self.__closed, timeout)
+            if self.__needs_resync:
+                self.__needs_resync = False
+                return None
+            changes = list(self.__pending.values())
+            self.__pending.clear()
+            return changes
+
+    def close(self):
+        with self.__condition:
+            self.__closed = True
+            self.__pending.clear()
+            self.__condition.notify_all()
+
+    def is_closed(self) -> bool:
+        with self.__condition:
+            return self.__closed
+
+
+class CharacteristicStream:
+    """Distributes characteristic changes to all subscriptions without ever waiting for their consumers"""
+
+    # Replaced as a whole on every change, so publishing can iterate it without holding the lock
+    __subscriptions: tuple
+    __lock: threading.Lock
+
+    def __init__(self):
+        self.__subscriptions = ()
+        self.__lock = threading.Lock()
+
+    def subscribe(self, max_pending: int = _default_max_pending) -> CharacteristicSubscription:
+        subscription = CharacteristicSubscription(max_pending)
+        with self.__lock:
+            self.__subscriptions += (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: CharacteristicSubscription):
+        subscription.close()
+        with self.__lock:
+            self.__subscriptions = tuple(x for x in self.__subscriptions if x is not subscription)
+
+    def get_subscription_count(self) -> int:
+        return len(self.__subscriptions)
+
+    def publish(self, gadget_name: str, characteristic: CharacteristicIdentifier, value: int):
+        for subscription in self.__subscriptions:
+            subscription.push(gadget_name, characteristic, value)
+
+    def publish_resync(self):
+        """Tells all consumers to reload the complete state"""
+        for subscription in self.__subscriptions:
+            subscription.request_resync()
+
+    def close(self):
+        """Closes all subscriptions"""
+        with self.__lock:
+            subscriptions = self.__subscriptions
+            self.__subscriptions = ()
+        for subscription in subscriptions:
+            subscription.close()
@@ -5,7 +5,8 @@ import repository_manager
 from typing import Optional, Callable
 from pio_uploader import PioUploader, PioUploadException, PioNoProjectFoundException
 
-from repo_locker import RepoLocker, RepositoryAccessTimeout
+from repo_locker import RepositoryAccessTimeout
+from repository_cache import RepositoryCache, DEFAULT_FETCH_INTERVAL
 
 # Declare Type of callback function for hinting
 CallbackFunction = Optional[Callable[[str, int, str], None]]
@@ -25,9 +26,6 @@ _cloning_fail_code = -2
 _checkout_ok_code = 3
 _checkout_fail_code = -3
 
-_pull_ok_code = 4
-_pull_fail_code = -4
-
 
 class UploadFailedException(Exception):
     def __init__(self):
@@ -38,51 +36,45 @@ class ChipFlasher:
 
     _output_callback: CallbackFunction
     _max_delay: Optional[int] = None
+    _fetch_interval: float
     _logger: logging.Logger
-    _locker: Optional[RepoLocker]
 
-    def __init__(self, output_callback: CallbackFunction = None, max_delay: Optional[int] = None):
+    def __init__(self, output_callback: CallbackFunction = None, max_delay: Optional[int] = None,
+                 fetch_interval: float = DEFAULT_FETCH_INTERVAL):
         self._output_callback = output_callback
         self._max_delay = max_delay
+        self._fetch_interval = fetch_interval
         self._logger = logging.getLogger("ChipFlasher")
-        self._locker = None
 
     def upload_software(self, branch: str, upload_port: Optional[str] = None, clone_new_repository: bool = False):
-        with RepoLocker(_repo_base_path, self._max_delay) as self._locker:
-            repo_manager = repository_manager.RepositoryManager(_repo_base_path, repo_name, repo_url)
-            try:
-                repo_manager.init_repository(force_reset=clone_new_repository)
-                self._callback(_cloning_ok_code, "Cloning ok.")
-            except repository_manager.RepositoryCloneException:
-                self._callback(_cloning_fail_code, "Cloning failed.")
-                raise UploadFailedException
-
-            try:
-                repo_manager.fetch()
+        repo_cache = RepositoryCache(_repo_base_path, repo_name, repo_url, self._fetch_interval, self._max_delay)
+        try:
+            repo_cache.init_mirror(force_reset=clone_new_repository)
+            self._callback(_cloning_ok_code, "Cloning ok.")
+        except repository_manager.RepositoryCloneException:
+            self._callback(_cloning_fail_code, "Cloning failed.")
+            raise UploadFailedException
+
+        try:
+            if repo_cache.fetch():
                 self._callback(_fetch_ok_code, "Fetching OK.")
-            except repository_manager.RepositoryFetchException:
-                self._callback(_fetch_fail_code, "Fetching failed.")
-                raise UploadFailedException
-
-            try:
-                repo_manager.checkout(branch)
+            else:
+                self._callback(_fetch_ok_code, "Fetched recently, skipping fetch.")
+        except repository_manager.RepositoryFetchException:
+            self._callback(_fetch_fail_code, "Fetching failed.")
+            raise UploadFailedException
+
+        try:
+            with repo_cache.checkout_worktree(branch) as worktree_path:
                 self._callback(_checkout_ok_code, f"Checking out '{branch}' OK.")
-            except repository_manager.RepositoryCheckoutException:
-                self._callback(_checkout_fail_code, f"Checking out '{branch}' failed.")
-                raise UploadFailedException
-
-            try:
-                repo_manager.pull()
-                self._callback(_pull_ok_code, "Pulling was successful")
-            except repository_manager.RepositoryPullException:
-                self._callback(_pull_fail_code, f"Pulling failed.")
-                raise UploadFailedException
-
-            try:
-                uploader = PioUploader(os.path.join(_repo_base_path, repo_name), self._callback)
-                uploader.upload_software(upload_port)
-            except PioUploadException:
-                raise UploadFailedException
+                try:
+                    uploader = PioUploader(worktree_path, self._callback)
+                    uploader.upload_software(upload_port)
+                except (PioUploadException, PioNoProjectFoundException):
+                    raise UploadFailedException
+        except repository_manager.RepositoryCheckoutException:
+            self._callback(_checkout_fail_code, f"Checking out '{branch}' failed.")
+            raise UploadFailedException
 
     def _callback(self, code: int, message: str):
         print(f"callback: {message}")
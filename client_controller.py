@@ -71,7 +71,7 @@ class ClientController:
 
         payload_dict = {"config": config}
 
-        result = self._network.send_request_split("smarthome/config/write", self._client_name, payload_dict, 50)
+        result = self._network.send_request_split("smarthome/config/write", self._client_name, payload_dict)
 
         if not result:
             raise NoClientResponseException
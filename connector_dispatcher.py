@@ -0,0 +1,292 @@
+"""Module to hand characteristic updates to the connectors of the bridge without waiting for them"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from typing import Optional
+
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+
+# Number of threads passing updates to the connectors
+_default_worker_count = 4
+
+# Maximum number of characteristics with undelivered updates kept for a single connector
+_default_max_pending = 1000
+
+# Time in seconds after which undelivered updates are dropped, and after which a connector is given up on while it
+# does not return from an update
+_default_update_timeout = 10
+
+# Share of the update timeout waited between two checks for connectors that did not return in time
+_stall_check_share = 0.5
+
+# Number of updates passed to a connector before its worker is handed to the next connector
+_drain_batch_size = 50
+
+# Upper bounds of the latency histogram buckets in milliseconds, the last bucket holds all higher latencies
+_latency_bucket_bounds = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class LatencyHistogram:
+    """Counts latencies in buckets of increasing size"""
+
+    # Number of latencies in every bucket, the last one counts the latencies above the highest bound
+    __counts: list[int]
+    __total_seconds: float
+
+    def __init__(self):
+        self.__counts = [0] * (len(_latency_bucket_bounds) + 1)
+        self.__total_seconds = 0
+
+    def record(self, seconds: float):
+        self.__counts[bisect_left(_latency_bucket_bounds, seconds * 1000)] += 1
+        self.__total_seconds += seconds
+
+    def get_count(self) -> int:
+        return sum(self.__counts)
+
+    def serialized(self) -> dict:
+        buckets = {f"le_{bound}ms": count for bound, count in zip(_latency_bucket_bounds, self.__counts)}
+        buckets[f"gt_{_latency_bucket_bounds[-1]}ms"] = self.__counts[-1]
+        count = self.get_count()
+        return {"count": count,
+                "mean_ms": self.__total_seconds / count * 1000 if count else 0,
+                "buckets": buckets}
+
+
+class _ConnectorQueue:
+    """Updates waiting to be passed to a single connector"""
+
+    connector: object
+
+    # Arguments of the pending updates along with the time the oldest of them was queued, stored by gadget name and
+    # characteristic in the order they were last queued
+    pending: OrderedDict
+
+    # Whether a worker is assigned to the connector or the connector is waiting for one
+    is_scheduled: bool
+
+    # Time the update the connector is working on was passed to it, None if it is not working on one
+    call_start: Optional[float]
+
+    # Whether the connector did not return from an update in time, its worker was replaced then
+    is_stalled: bool
+
+    latency: LatencyHistogram
+    metrics: dict[str, int]
+
+    def __init__(self, connector):
+        self.connector = connector
+        self.pending = OrderedDict()
+        self.is_scheduled = False
+        self.call_start = None
+        self.is_stalled = False
+        self.latency = LatencyHistogram()
+        self.metrics = {"delivered": 0,
+                        "replaced": 0,
+                        "dropped_overflow": 0,
+                        "expired": 0,
+                        "failed": 0,
+                        "timed_out": 0}
+
+
+class ConnectorDispatcher:
+    """
+    Passes characteristic updates to the connectors using a fixed number of worker threads.
+
+    Every connector has its own queue and gets its updates one after another in the order they were queued, so
+    updates of a gadget never overtake each other. A slow connector only delays its own updates. Updates of a
+    characteristic that was not delivered yet replace the pending one and move to the end of the queue, so they stay
+    behind every update queued before them. Updates waiting longer than the timeout are dropped, a replaced update
+    keeps the time its characteristic was first queued, so constant changes cannot keep it from expiring. The latency
+    from queueing an update to the connector returning is recorded for every connector.
+
+    A connector not returning from an update within the timeout is given up on: Its worker is replaced by a new one
+    and the connector gets no further updates until it returns, so hanging connectors cannot stop the other ones from
+    being updated. The abandoned worker ends once the connector returns.
+    """
+
+    __queues: dict
+    __max_pending: int
+    __timeout: float
+    __logger: logging.Logger
+
+    # Queues of the connectors waiting for a worker, in the order they got ready
+    __ready: deque
+    __condition: threading.Condition
+
+    # All worker threads started, including the abandoned ones
+    __workers: list[threading.Thread]
+    __stall_checker: threading.Thread
+
+    # Set on shutdown, the stall checker waits on it instead of the condition, so it never takes a notification
+    # meant for a worker
+    __stop_event: threading.Event
+
+    # Whether updates are accepted, cleared on shutdown
+    __running: bool
+
+    def __init__(self, worker_count: int = _default_worker_count, max_pending: int = _default_max_pending,
+                 timeout: float = _default_update_timeout):
+        """
+        Constructor for the ConnectorDispatcher
+
+        :param worker_count: Number of connectors updated at the same time
+        :param max_pending: Maximum number of characteristics with undelivered updates per connector
+        :param timeout: Time in seconds after which undelivered updates are dropped and connectors not returning
+                        from an update are given up on
+        """
+        self.__queues = {}
+        self.__max_pending = max_pending
+        self.__timeout = timeout
+        self.__logger = logging.getLogger(self.__class__.__name__)
+        self.__ready = deque()
+        self.__condition = threading.Condition()
+        self.__workers = []
+        self.__stop_event = threading.Event()
+        self.__running = True
+        for _ in range(worker_count):
+            self.__start_worker()
+        self.__stall_checker = threading.Thread(target=self.__check_stalls, name="connector_stall_checker",
+                                                daemon=True)
+        self.__stall_checker.start()
+
+    def __start_worker(self):
+        """Starts a new worker, has to be called holding the condition once the workers are running"""
+        # Daemon threads, so connectors that never return do not keep the process from exiting
+        worker = threading.Thread(target=self.__run_worker, name=f"connector_worker_{len(self.__workers)}",
+                                  daemon=True)
+        self.__workers.append(worker)
+        worker.start()
+
+    def dispatch(self, connector, gadget_name: str, g_type: GadgetIdentifier,
+                 characteristic: CharacteristicIdentifier, value: int):
+        """Queues a characteristic update for a connector and returns without waiting for the connector"""
+        key = (gadget_name, characteristic)
+        with self.__condition:
+            if not self.__running:
+                return
+            queue = self.__queues.get(connector)
+            if queue is None:
+                queue = _ConnectorQueue(connector)
+                self.__queues[connector] = queue
+
+            queued_time = time.monotonic()
+            if key in queue.pending:
+                queued_time = queue.pending.pop(key)[1]
+                queue.metrics["replaced"] += 1
+            elif len(queue.pending) >= self.__max_pending:
+                queue.pending.popitem(last=False)
+                queue.metrics["dropped_overflow"] += 1
+            queue.pending[key] = ((gadget_name, g_type, characteristic, value), queued_time)
+
+            if not queue.is_scheduled:
+                queue.is_scheduled = True
+                self.__ready.append(queue)
+                self.__condition.notify()
+
+    def __run_worker(self):
+        while True:
+            with self.__condition:
+                while self.__running and not self.__ready:
+                    self.__condition.wait()
+                if not self.__running:
+                    return
+                queue = self.__ready.popleft()
+            if not self.__drain(queue):
+                return
+
+    def __drain(self, queue: _ConnectorQueue) -> bool:
+        """
+        Passes the pending updates to a connector, runs on a worker
+
+        :return: Whether the worker may go on, False if it was replaced because the connector did not return in time
+        """
+        for _ in range(_drain_batch_size):
+            with self.__condition:
+                if not queue.pending or not self.__running:
+                    queue.is_scheduled = False
+                    return True
+                _, (args, queued_time) = queue.pending.popitem(last=False)
+                start_time = time.monotonic()
+                if start_time - queued_time > self.__timeout:
+                    queue.metrics["expired"] += 1
+                    continue
+                queue.call_start = start_time
+
+            try:
+                queue.connector.update_characteristic(*args)
+                failed = False
+            except Exception as err:
+                self.__logger.error(f"Connector '{queue.connector.get_name()}' failed to update '{args[0]}': {err}")
+                failed = True
+            end_time = time.monotonic()
+
+            with self.__condition:
+                queue.call_start = None
+                queue.latency.record(end_time - queued_time)
+                queue.metrics["failed" if failed else "delivered"] += 1
+                if queue.is_stalled:
+                    # Another worker took the place of this one, the connector is handed to the workers again
+                    self.__logger.info(f"Connector '{queue.connector.get_name()}' returned after "
+                                       f"{end_time - start_time:.1f}s, resuming its updates")
+                    queue.is_stalled = False
+                    self.__reschedule(queue)
+                    return False
+
+        # Hands the worker to other connectors, the remaining updates are passed on by the next free worker
+        with self.__condition:
+            self.__reschedule(queue)
+        return True
+
+    def __reschedule(self, queue: _ConnectorQueue):
+        """Hands a connector with pending updates to the workers, has to be called holding the condition"""
+        if queue.pending and self.__running:
+            self.__ready.append(queue)
+            self.__condition.notify()
+        else:
+            queue.is_scheduled = False
+
+    def __check_stalls(self):
+        """Gives up on connectors not returning from an update in time, runs on its own thread"""
+        while not self.__stop_event.wait(self.__timeout * _stall_check_share):
+            with self.__condition:
+                if not self.__running:
+                    return
+                deadline = time.monotonic() - self.__timeout
+                for queue in self.__queues.values():
+                    if queue.is_stalled or queue.call_start is None or queue.call_start > deadline:
+                        continue
+                    self.__logger.warning(f"Connector '{queue.connector.get_name()}' did not return from an update "
+                                          f"within {self.__timeout}s, replacing its worker")
+                    queue.is_stalled = True
+                    queue.metrics["timed_out"] += 1
+                    self.__start_worker()
+
+    def get_metrics(self) -> dict[str, dict]:
+        """Returns counters and the latency histogram of every connector, stored by connector name"""
+        with self.__condition:
+            metrics = {}
+            for queue in self.__queues.values():
+                connector_metrics = dict(queue.metrics)
+                connector_metrics["pending"] = len(queue.pending)
+                connector_metrics["stalled"] = queue.is_stalled
+                connector_metrics["latency"] = queue.latency.serialized()
+                metrics[queue.connector.get_name()] = connector_metrics
+            return metrics
+
+    def shutdown(self):
+        """
+        Stops the workers after the updates they are working on, updates not handed to a connector yet are dropped.
+        Waits at most for the timeout, connectors not returning in that time are left behind.
+        """
+        with self.__condition:
+            self.__running = False
+            self.__condition.notify_all()
+            workers = list(self.__workers)
+        self.__stop_event.set()
+        deadline = time.monotonic() + self.__timeout
+        for worker in workers + [self.__stall_checker]:
+            if worker is not threading.current_thread():
+                worker.join(max(deadline - time.monotonic(), 0))
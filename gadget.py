@@ -4,6 +4,9 @@ from gadgetlib import GadgetIdentifier, CharacteristicIdentifier, Characteristic
 
 
 class Characteristic:
+    # Installations can hold many thousands of characteristics, slots keep every one of them small
+    __slots__ = ("__type", "__min", "__max", "__step", "__val")
+
     __type: CharacteristicIdentifier
     __min: int
     __max: int
@@ -43,8 +46,46 @@ class Characteristic:
                 "value": self.__val}
 
 
+class GadgetChanges:
+    """Changes made to a gadget by updating its info"""
+
+    __slots__ = ("type_changed", "added", "removed", "options_changed", "value_changed")
+
+    # Whether the type of the gadget changed
+    type_changed: bool
+
+    # Characteristics the gadget did not have before
+    added: list[CharacteristicIdentifier]
+
+    # Characteristics the gadget does not have anymore
+    removed: list[CharacteristicIdentifier]
+
+    # Characteristics whose min, max or step changed
+    options_changed: list[CharacteristicIdentifier]
+
+    # Characteristics whose options stayed the same, but whose value changed
+    value_changed: list[CharacteristicIdentifier]
+
+    def __init__(self):
+        self.type_changed = False
+        self.added = []
+        self.removed = []
+        self.options_changed = []
+        self.value_changed = []
+
+    def is_structural(self) -> bool:
+        """Returns whether anything changed that connectors need to know about when registering the gadget"""
+        return self.type_changed or bool(self.added or self.removed or self.options_changed)
+
+    def is_empty(self) -> bool:
+        return not (self.is_structural() or self.value_changed)
+
+
 class Gadget:
-    __characteristics: [Characteristic]
+    __slots__ = ("__characteristics", "__name", "__type", "__host_client", "__host_client_runtime_id")
+
+    # Characteristics stored by their type, in the order they were added
+    __characteristics: dict[CharacteristicIdentifier, Characteristic]
     __name: str
     __type: GadgetIdentifier
     __host_client: str
@@ -60,72 +101,65 @@ class Gadget:
         self.__type = g_type
         self.__host_client = host_client
         self.__host_client_runtime_id = host_client_runtime_id
-        self.__characteristics = characteristics
+        self.__characteristics = {characteristic.get_type(): characteristic for characteristic in characteristics}
 
     def update_gadget_info(self,
                            g_type: GadgetIdentifier,
                            host_client: str,
                            host_client_runtime_id: int,
-                           new_characteristics: [Characteristic]) -> bool:
-        """Updates the information a gadget consists of and returns whether anything important was changed"""
-        update_needed = False
+                           new_characteristics: [Characteristic]) -> GadgetChanges:
+        """
+        Replaces the information a gadget consists of.
+
+        :param g_type: New type of the gadget
+        :param host_client: Name of the client hosting the gadget
+        :param host_client_runtime_id: Runtime id of the client hosting the gadget
+        :param new_characteristics: Characteristics replacing the current ones
+        :return: The changes made to the type and the characteristics of the gadget
+        """
+        changes = GadgetChanges()
         if self.__type != g_type:
-            update_needed = True
+            changes.type_changed = True
             self.__type = g_type
 
-        if self.__host_client != host_client:
-            # update_needed = True
-            self.__host_client = host_client
-
-        if self.__host_client_runtime_id != host_client_runtime_id:
-            # update_needed = True
-            self.__host_client_runtime_id = host_client_runtime_id
+        self.__host_client = host_client
+        self.__host_client_runtime_id = host_client_runtime_id
 
-        old_characteristics: [Characteristic] = self.__characteristics
-        self.__characteristics = []
+        old_characteristics = self.__characteristics
+        self.__characteristics = {}
 
         for new_c in new_characteristics:
-            found_old_c: Optional[Characteristic] = None
-            for old_c in old_characteristics:
-                if old_c.get_type() != new_c.get_type():
-                    found_old_c = old_c
-                    old_characteristics.remove(old_c)
-
-            if found_old_c is not None:
-                if found_old_c.get_options() != new_c.get_options():
-                    update_needed = True
-
-            self.__characteristics.append(new_c)
-
-        if old_characteristics:
-            update_needed = True
-
-        return update_needed
-
-    def __get_characteristic(self, c_type: CharacteristicIdentifier) -> Optional[Characteristic]:
-        for characteristic in self.__characteristics:
-            if characteristic.get_type() == c_type:
-                return characteristic
-        return None
+            c_type = new_c.get_type()
+            self.__characteristics[c_type] = new_c
+            old_c = old_characteristics.get(c_type)
+            if old_c is None:
+                changes.added.append(c_type)
+            elif old_c.get_options() != new_c.get_options():
+                changes.options_changed.append(c_type)
+            elif old_c.get_val() != new_c.get_val():
+                changes.value_changed.append(c_type)
+
+        changes.removed = [c_type for c_type in old_characteristics if c_type not in self.__characteristics]
+        return changes
 
     def add_characteristic(self, c_type: CharacteristicIdentifier, min_val: int, max_val: int, step: int):
         buf_characteristic = Characteristic(c_type, min_val, max_val, step)
-        self.__characteristics.append(buf_characteristic)
+        self.__characteristics[c_type] = buf_characteristic
 
     def update_characteristic(self, c_type: CharacteristicIdentifier, value: int) -> CharacteristicUpdateStatus:
-        buf_characteristic = self.__get_characteristic(c_type)
+        buf_characteristic = self.__characteristics.get(c_type)
         if buf_characteristic is None:
             return CharacteristicUpdateStatus.unknown_characteristic
         return buf_characteristic.set_val(value)
 
     def get_characteristic_value(self, c_type: CharacteristicIdentifier):
-        buf_characteristic = self.__get_characteristic(c_type)
+        buf_characteristic = self.__characteristics.get(c_type)
         if buf_characteristic is None:
             return False
         return buf_characteristic.get_val()
 
     def get_characteristic_options(self, c_type: CharacteristicIdentifier) -> (int, int, int):
-        buf_characteristic = self.__get_characteristic(c_type)
+        buf_characteristic = self.__characteristics.get(c_type)
         if buf_characteristic is None:
             return None, None, None
         return buf_characteristic.get_options()
@@ -140,13 +174,9 @@ class Gadget:
         return self.__type
 
     def get_characteristic_types(self) -> [CharacteristicIdentifier]:
-        buf_list: [CharacteristicIdentifier] = []
-        for characteristic in self.__characteristics:
-            buf_list.append(characteristic.get_type())
-        return buf_list
+        return list(self.__characteristics)
 
     def serialized(self) -> dict:
-        buf_json = {"type": int(self.__type), "name": self.__name, "characteristics": []}
-        for characteristic in self.__characteristics:
-            buf_json["characteristics"].append(characteristic.serialized())
-        return buf_json
+        return {"type": int(self.__type),
+                "name": self.__name,
+                "characteristics": [characteristic.serialized() for characteristic in self.__characteristics.values()]}
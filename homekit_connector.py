@@ -1,15 +1,31 @@
 import enum
+import itertools
 import json
+import logging
+import threading
 import time
 import paho.mqtt.client as mqtt
+from collections import OrderedDict
 from typing import Optional
 from gadgetlib import GadgetIdentifier
 from gadget import Characteristic, Gadget, CharacteristicIdentifier
 from queue import Queue
-from threading import Thread, Lock
+from thread_manager import ThreadManager
 
-# Global queue for mqtt results
-mqtt_res_queue = Queue()
+# Maximum number of characteristic updates sent to homebridge without being acknowledged yet
+_default_max_in_flight = 32
+
+# Time in seconds an update is waited on to be acknowledged, before its place in the window is given to the next one
+_default_ack_timeout = 5
+
+# Maximum number of gadgets added or removed at once, before waiting for the registration interval
+_default_registration_batch_size = 10
+
+# Minimum time in seconds between the starts of two batches of gadget registrations
+_default_registration_interval = 1
+
+# Topic filter for all messages sent by homebridge
+_homebridge_topic = "homebridge/from/#"
 
 
 class HomeConnectorType(enum.IntEnum):
@@ -51,6 +67,44 @@ def characteristic_str_to_type(characteristic: str) -> CharacteristicIdentifier:
     return switcher.get(characteristic, None)
 
 
+def _get_registration(gadget: Gadget) -> dict:
+    """Returns the data homebridge needs to add a gadget"""
+
+    # {"name": "flex_lamp", "service_name": "flex_lamp", "service": "Lightbulb",
+    #  "Brightness": {"minValue": 0, "maxValue": 100, "minStep": 1},
+    #  "Hue": {"minValue": 0, "maxValue": 360, "minStep": 1},
+    #  "Saturation": {"minValue": 0, "maxValue": 100, "minStep": 1}}
+
+    gadget_service = gadget_type_to_string(gadget.get_type())
+    reg_dict = {"name": gadget.get_name(), "service_name": gadget_service, "service": gadget_service}
+
+    for characteristic in gadget.get_characteristic_types():
+        characteristic_str = characteristic_type_to_string(characteristic)
+        if characteristic_str:
+            min_v, max_v, step_v = gadget.get_characteristic_options(characteristic)
+            if min_v is not None:
+                reg_dict[characteristic_str] = {"minValue": min_v, "maxValue": max_v, "minStep": step_v}
+    return reg_dict
+
+
+def _get_services(gadget_list: dict) -> dict[str, Optional[str]]:
+    """Reads the service type of every gadget from the gadget list sent by homebridge"""
+
+    # {"flex_lamp": {"services": {"flex_lamp": "Lightbulb"}, "characteristics": {"flex_lamp": {"On": true}}}}
+
+    services = {}
+    for name, gadget_data in gadget_list.items():
+        # Skips fields like the request id
+        if not isinstance(gadget_data, dict):
+            continue
+        gadget_services = gadget_data.get("services")
+        if isinstance(gadget_services, dict) and gadget_services:
+            services[name] = next(iter(gadget_services.values()))
+        else:
+            services[name] = None
+    return services
+
+
 class HomeKitRequest:
     topic: str
     message: dict
@@ -73,113 +127,256 @@ class HomeConnector:
     def register_gadget(self, gadget: Gadget):
         pass
 
+    def remove_gadget(self, gadget: Gadget):
+        pass
+
+    def reconcile_gadgets(self, gadgets: list[Gadget]) -> bool:
+        """Registers all gadgets, returns whether the gadgets already known to the remote were taken into account"""
+        for gadget in gadgets:
+            self.register_gadget(gadget)
+        return False
+
     def update_characteristic(self, name: str, g_type: GadgetIdentifier,
                               characteristic: CharacteristicIdentifier, value: int):
         pass
 
-    def __update_characteristic_on_bridge(self, name: str, characteristic: CharacteristicIdentifier, value: int):
-        self.__bridge.update_characteristic_from_connector(name, characteristic, value)
+    def _update_characteristic_on_bridge(self, name: str, characteristic: CharacteristicIdentifier, value: int):
+        self.__bridge.update_characteristic_from_connector(name, characteristic, value, self)
 
     def serialized(self) -> dict:
         return {"type": int(self.__type)}
 
 
 class HomeKitConnector(HomeConnector):
+    """
+    Connects the bridge to homebridge over mqtt.
+
+    Characteristic updates are queued and sent by a thread of the connector, callers never wait for homebridge.
+    Every update carries a request id that homebridge returns with its acknowledgement, so many updates can be sent
+    before the first one is acknowledged. Queued updates of a characteristic are replaced by newer ones, so only the
+    latest value is sent.
+
+    Gadgets are registered the same way, limited to a number of gadgets per interval. The connector keeps track of
+    the gadgets homebridge hosts and only sends the registrations that change them. Reconciling asks homebridge for
+    all of its gadgets and adds the missing and changed ones. Gadgets the bridge does not know (yet) are kept, they
+    are only removed when the bridge removes them, e.g. because their client stopped hosting them.
+    """
 
     __own_name: str
     __ip: str
     __port: int
+    __client: mqtt.Client
 
     __mqtt_username: Optional[str]
     __mqtt_password: Optional[str]
 
-    __mqtt_callback_thread: Thread
+    __thread_manager: ThreadManager
+    __logger: logging.Logger
+
+    # Messages received from homebridge, waiting to be handled
+    __inbound_queue: Queue
 
-    # thread lock
-    __lock: Lock
-    __status_responses: Queue
+    # Updates waiting to be sent, stored by gadget name and characteristic in the order they were first queued
+    __queued_updates: OrderedDict
+
+    # Send times of the messages waiting for acknowledgement along with the name of the gadget they add, if any,
+    # stored by request id in the order they were sent
+    __in_flight: OrderedDict
+    __max_in_flight: int
+    __ack_timeout: float
+    __request_ids: itertools.count
+    __update_condition: threading.Condition
+    __wake_requested: bool
+    __metrics: dict[str, int]
+
+    # Registration data of the gadgets homebridge is believed to host along with whether the data is complete,
+    # otherwise only the service is known, stored by gadget name
+    __remote_gadgets: dict[str, tuple[dict, bool]]
+
+    # Whether homebridge reported its gadgets, otherwise only gadgets added by the connector are known
+    __remote_gadgets_known: bool
+
+    # Registration data gadgets should have on homebridge, 'None' for gadgets to remove, stored by gadget name in the
+    # order they were first queued
+    __queued_registrations: OrderedDict
+    __registration_batch_size: int
+    __registration_interval: float
+    __batch_start: float
+    __batch_count: int
+
+    # Request id of a pending request for the gadget list of homebridge along with the event set on its response
+    __gadget_list_request: Optional[tuple[str, threading.Event]]
+    __gadget_list_response: Optional[dict]
 
     def __init__(self, bridge, own_name: str, mqtt_ip: str, mqtt_port: int,
-                 mqtt_user: Optional[str] = None, mqtt_pw: Optional[str] = None):
+                 mqtt_user: Optional[str] = None, mqtt_pw: Optional[str] = None,
+                 max_in_flight: int = _default_max_in_flight, ack_timeout: float = _default_ack_timeout,
+                 registration_batch_size: int = _default_registration_batch_size,
+                 registration_interval: float = _default_registration_interval,
+                 mqtt_client: Optional[mqtt.Client] = None):
+        """
+        Constructor for the HomeKitConnector
+
+        :param bridge: The bridge the connector belongs to
+        :param own_name: Name of the connector
+        :param mqtt_ip: IP of the broker homebridge is connected to
+        :param mqtt_port: Port of the broker
+        :param mqtt_user: Username to access the broker
+        :param mqtt_pw: Password to access the broker
+        :param max_in_flight: Maximum number of updates and registrations sent without being acknowledged yet
+        :param ack_timeout: Time in seconds to wait for the acknowledgement of an update or the gadget list
+        :param registration_batch_size: Maximum number of gadgets added or removed per registration interval
+        :param registration_interval: Minimum time in seconds between the starts of two batches of registrations
+        :param mqtt_client: Already connected mqtt client to use instead of connecting to the broker
+        """
         super().__init__(bridge)
         self.__own_name = own_name
-        self.__client = mqtt.Client(self.__own_name + "_HomeBridge")
         self.__ip = mqtt_ip
         self.__port = mqtt_port
         self.__mqtt_username = mqtt_user
         self.__mqtt_password = mqtt_pw
+        self.__logger = logging.getLogger(self.__class__.__name__)
+
+        self.__inbound_queue = Queue()
+        self.__queued_updates = OrderedDict()
+        self.__in_flight = OrderedDict()
+        self.__max_in_flight = max_in_flight
+        self.__ack_timeout = ack_timeout
+        self.__request_ids = itertools.count()
+        self.__update_condition = threading.Condition()
+        self.__wake_requested = False
+        self.__metrics = {"queued": 0,
+                          "replaced": 0,
+                          "sent": 0,
+                          "acknowledged": 0,
+                          "failed": 0,
+                          "timed_out": 0,
+                          "registrations": 0,
+                          "skipped_registrations": 0}
+        self.__remote_gadgets = {}
+        self.__remote_gadgets_known = False
+        self.__queued_registrations = OrderedDict()
+        self.__registration_batch_size = registration_batch_size
+        self.__registration_interval = registration_interval
+        self.__batch_start = 0
+        self.__batch_count = 0
+        self.__gadget_list_request = None
+        self.__gadget_list_response = None
 
+        self.__type = HomeConnectorType.homekit
+
+        self.__thread_manager = ThreadManager()
+        # Both tasks block, they are woken up with a 'None' or a notification when stopping
+        self.__thread_manager.add_thread("homekit_send_thread", self.__task_send,
+                                         wake_method=self.__wake_send_thread)
+        self.__thread_manager.add_thread("homekit_receive_thread", self.__task_receive,
+                                         wake_method=lambda: self.__inbound_queue.put(None))
+        self.__thread_manager.start_threads()
+
+        if mqtt_client is not None:
+            self.__client = mqtt_client
+            self.__client.on_message = self.__on_message
+            return
+
+        self.__client = mqtt.Client(self.__own_name + "_HomeBridge")
         if self.__mqtt_username and self.__mqtt_password:
             self.__client.username_pw_set(self.__mqtt_username, self.__mqtt_password)
         try:
             self.__client.connect(self.__ip, self.__port, 15)
         except OSError:
             print("Could not connect to MQTT Server.")
-        self.__client.loop_start()
         self.__client.on_message = self.__on_message
-        self.__client.subscribe("homebridge/#")
-
-        self.__mqtt_callback_thread = HomeKitMQTTThread(parent=self)
-        self.__mqtt_callback_thread.start()
-
-        self.__type = HomeConnectorType.homekit
-
-        self.__lock = Lock()
+        self.__client.loop_start()
+        self.__client.subscribe(_homebridge_topic)
 
     def __del__(self):
+        self.__thread_manager.__del__()
         self.__client.disconnect()
 
     def get_name(self) -> str:
         return self.__own_name
 
-    @staticmethod
-    def __on_message(client, userdata, message):
-        global mqtt_res_queue
-
-        topic = message.topic
-        json_str = message.payload.decode("utf-8")
-
+    def __on_message(self, client, userdata, message):
+        """Runs in the network loop of the mqtt client, only decodes the message and hands it to the connector"""
         try:
-            body = json.loads(json_str)
-        except json.decoder.JSONDecodeError:
-            print("Couldn't decode json: '{}'".format(json_str))
+            body = json.loads(message.payload)
+        except ValueError:
+            print("Couldn't decode json: '{}'".format(message.payload))
             return
 
-        buf_req = HomeKitRequest(topic, body)
+        self.__inbound_queue.put(HomeKitRequest(message.topic, body))
 
-        mqtt_res_queue.put(buf_req)
+    def __task_receive(self):
+        buf_req: Optional[HomeKitRequest] = self.__inbound_queue.get()
+        if buf_req is not None:
+            self.handle_request(buf_req)
 
     def register_gadget(self, gadget: Gadget):
-        """Registers a gadget on the homebridge remote"""
-
-        # {"name": "flex_lamp", "service_name": "flex_lamp", "service": "Lightbulb",
-        #  "Brightness": {"minValue": 0, "maxValue": 100, "minStep": 1},
-        #  "Hue": {"minValue": 0, "maxValue": 360, "minStep": 1},
-        #  "Saturation": {"minValue": 0, "maxValue": 100, "minStep": 1}}
-
-        gadget_service = gadget_type_to_string(gadget.get_type())
-        reg_dict = {"name": gadget.get_name(), "service_name": gadget_service, "service": gadget_service}
-        topic = "homebridge/to/add"
-
-        for characteristic in gadget.get_characteristic_types():
-            characteristic_str = characteristic_type_to_string(characteristic)
-            if characteristic_str:
-                min_v, max_v, step_v = gadget.get_characteristic_options(characteristic)
-                if min_v is not None:
-                    reg_dict[characteristic_str] = {"minValue": min_v, "minVal": max_v, "maxStep": step_v}
-        buf_req = HomeKitRequest(topic, reg_dict)
-        self.__send_request(buf_req)
+        """Queues a gadget to be registered on the homebridge remote, replacing an outdated registration"""
+        with self.__update_condition:
+            self.__queued_registrations[gadget.get_name()] = _get_registration(gadget)
+            self.__update_condition.notify()
 
     def remove_gadget(self, gadget: Gadget):
-        """Removes a gadget from the homebridge remote"""
-        buf_req = HomeKitRequest("homebridge/to/remove", {"name": gadget.get_name()})
-        self.__send_request(buf_req)
+        """Queues a gadget to be removed from the homebridge remote"""
+        with self.__update_condition:
+            self.__queued_registrations[gadget.get_name()] = None
+            for key in [key for key in self.__queued_updates if key[0] == gadget.get_name()]:
+                del self.__queued_updates[key]
+            self.__update_condition.notify()
+
+    def reconcile_gadgets(self, gadgets: list[Gadget]) -> bool:
+        """
+        Brings the gadgets on the homebridge remote in line with the given ones.
+
+        Waits for homebridge to report its gadgets, the registrations are sent by the connector afterwards. Remote
+        gadgets not in the given list are kept: After a restart of the bridge they belong to clients that did not
+        sync yet, and adding them again later would recreate the accessories and lose their HomeKit settings.
+        :param gadgets: Gadgets homebridge should host
+        :return: Whether homebridge reported its gadgets. If not, only the gadgets added by the connector are
+                 taken into account.
+        """
+        request_id = self.__next_request_id()
+        response_event = threading.Event()
+        with self.__update_condition:
+            self.__gadget_list_request = (request_id, response_event)
+            self.__gadget_list_response = None
+        self.__send_request(HomeKitRequest("homebridge/to/get", {"name": "*", "request_id": request_id}))
+        reported = response_event.wait(self.__ack_timeout)
+
+        with self.__update_condition:
+            self.__gadget_list_request = None
+            if reported:
+                self.__apply_gadget_list(self.__gadget_list_response)
+            else:
+                self.__logger.warning("Homebridge did not report its gadgets")
+            for gadget in gadgets:
+                self.__queued_registrations[gadget.get_name()] = _get_registration(gadget)
+            self.__update_condition.notify()
+        return reported
+
+    def __apply_gadget_list(self, gadget_list: dict):
+        """Replaces the known remote gadgets with the reported ones, has to be called holding the update condition"""
+        remote_gadgets = {}
+        for name, service in _get_services(gadget_list).items():
+            known_gadget = self.__remote_gadgets.get(name)
+            if known_gadget is not None and known_gadget[1] and known_gadget[0]["service"] == service:
+                remote_gadgets[name] = known_gadget
+            else:
+                remote_gadgets[name] = ({"service": service}, False)
+        self.__remote_gadgets = remote_gadgets
+        self.__remote_gadgets_known = True
+
+    def __next_request_id(self) -> str:
+        # Acknowledgements of other clients of the same homebridge must not be mistaken for our own
+        return f"{self.__own_name}_{next(self.__request_ids)}"
 
     def __send_request(self, req: HomeKitRequest):
         self.__client.publish(req.topic, json.dumps(req.message))
 
     def update_characteristic(self, name: str, g_type: GadgetIdentifier,
-                              characteristic: CharacteristicIdentifier, value: int) -> bool:
+                              characteristic: CharacteristicIdentifier, value: int):
+        """Queues a characteristic update to be sent to homebridge and returns without waiting for it"""
         gadget_service = gadget_type_to_string(g_type)
         reg_str = {"name": name,
                    "service_name": gadget_service,
@@ -189,24 +386,180 @@ class HomeKitConnector(HomeConnector):
 
         topic = "homebridge/to/set"
         buf_req = HomeKitRequest(topic, reg_str)
-        with self.__lock:
-            self.__send_request(buf_req)
-            start_time = time.time()
-            while time.time() < start_time + 5:
-                if not self.__status_responses.empty():
-                    resp: HomeKitRequest = self.__status_responses.get()
-                    if resp.message["ack"]:
-                        print("Updating Characteristic was successful")
-                        return True
-                    else:
-                        print("failed to update characteristic")
-                        return False
-        return False
+        key = (name, characteristic)
+        with self.__update_condition:
+            if key in self.__queued_updates:
+                self.__metrics["replaced"] += 1
+            self.__queued_updates[key] = buf_req
+            self.__metrics["queued"] += 1
+            self.__update_condition.notify()
+
+    def __expire_in_flight(self):
+        """Gives up on messages that were not acknowledged in time, has to be called holding the update condition"""
+        deadline = time.monotonic() - self.__ack_timeout
+        while self.__in_flight:
+            request_id, (sent_time, added_gadget) = next(iter(self.__in_flight.items()))
+            if sent_time > deadline:
+                return
+            self.__logger.warning(f"Message {request_id} was not acknowledged in time")
+            del self.__in_flight[request_id]
+            self.__forget_added_gadget(added_gadget)
+            self.__metrics["timed_out"] += 1
+
+    def __forget_added_gadget(self, added_gadget: Optional[str]):
+        """Called for adds that might have failed, whether homebridge hosts the gadget is unknown afterwards"""
+        if added_gadget is not None:
+            self.__remote_gadgets.pop(added_gadget, None)
+
+    def __get_registration_delay(self) -> float:
+        """Returns the time in seconds until the next registration may be sent"""
+        if self.__batch_count < self.__registration_batch_size:
+            return 0
+        return max(self.__batch_start + self.__registration_interval - time.monotonic(), 0)
+
+    def __is_update_sendable(self, key: tuple) -> bool:
+        # Updates of gadgets waiting to be registered would fail
+        return key[0] not in self.__queued_registrations
+
+    def __can_send(self) -> bool:
+        if len(self.__in_flight) >= self.__max_in_flight:
+            return False
+        if self.__queued_registrations and not self.__get_registration_delay():
+            return True
+        return any(self.__is_update_sendable(key) for key in self.__queued_updates)
+
+    def __take_registration(self) -> Optional[tuple[HomeKitRequest, Optional[str]]]:
+        """
+        Takes the next registration homebridge is not up to date with, has to be called holding the update condition
+
+        :return: The message to send along with the name of the gadget it adds, None if there is no registration to send
+        """
+        while self.__queued_registrations:
+            name, registration = next(iter(self.__queued_registrations.items()))
+            remote_gadget = self.__remote_gadgets.get(name)
+
+            if registration is None:
+                del self.__queued_registrations[name]
+                if remote_gadget is None and self.__remote_gadgets_known:
+                    self.__metrics["skipped_registrations"] += 1
+                    continue
+                self.__remote_gadgets.pop(name, None)
+                return HomeKitRequest("homebridge/to/remove", {"name": name}), None
+
+            if remote_gadget is not None:
+                remote_registration, is_complete = remote_gadget
+                if remote_registration == registration or \
+                        (not is_complete and remote_registration["service"] == registration["service"]):
+                    del self.__queued_registrations[name]
+                    self.__metrics["skipped_registrations"] += 1
+                    continue
+                # Gadgets can only be changed by removing and adding them again, the add stays queued
+                del self.__remote_gadgets[name]
+                return HomeKitRequest("homebridge/to/remove", {"name": name}), None
+
+            del self.__queued_registrations[name]
+            self.__remote_gadgets[name] = (registration, True)
+            return HomeKitRequest("homebridge/to/add", dict(registration)), name
+        return None
+
+    def __take_update(self) -> Optional[HomeKitRequest]:
+        if not self.__queued_registrations:
+            return self.__queued_updates.popitem(last=False)[1] if self.__queued_updates else None
+        for key in self.__queued_updates:
+            if self.__is_update_sendable(key):
+                return self.__queued_updates.pop(key)
+        return None
+
+    def __get_wait_time(self) -> float:
+        # Waking up regularly is necessary to expire messages that are never acknowledged
+        registration_delay = self.__get_registration_delay()
+        if self.__queued_registrations and registration_delay:
+            return min(registration_delay, self.__ack_timeout)
+        return self.__ack_timeout
+
+    def __task_send(self):
+        with self.__update_condition:
+            if not self.__can_send() and not self.__wake_requested:
+                self.__update_condition.wait(self.__get_wait_time())
+            self.__wake_requested = False
+            self.__expire_in_flight()
+            if not self.__can_send():
+                return
+
+            taken_registration = None
+            if not self.__get_registration_delay():
+                taken_registration = self.__take_registration()
+            if taken_registration is not None:
+                buf_req, added_gadget = taken_registration
+                now = time.monotonic()
+                if now >= self.__batch_start + self.__registration_interval:
+                    self.__batch_start = now
+                    self.__batch_count = 0
+                self.__batch_count += 1
+                self.__metrics["registrations"] += 1
+            else:
+                buf_req = self.__take_update()
+                added_gadget = None
+                if buf_req is None:
+                    return
+
+            request_id = self.__next_request_id()
+            buf_req.message["request_id"] = request_id
+            self.__in_flight[request_id] = (time.monotonic(), added_gadget)
+            self.__metrics["sent"] += 1
+        self.__send_request(buf_req)
+
+    def __wake_send_thread(self):
+        with self.__update_condition:
+            self.__wake_requested = True
+            self.__update_condition.notify_all()
+
+    def __handle_ack(self, message: dict):
+        with self.__update_condition:
+            request_id = message.get("request_id")
+            if request_id is None:
+                if len(self.__in_flight) != 1:
+                    # Cannot be matched safely, the update waits for its own acknowledgement or times out instead
+                    self.__logger.warning(f"Ignoring acknowledgement without request id with "
+                                          f"{len(self.__in_flight)} updates in flight")
+                    return
+                # Sent by older homebridge plugins, can only belong to the single update in flight
+                request_id = next(iter(self.__in_flight))
+            elif request_id not in self.__in_flight:
+                return
+            _, added_gadget = self.__in_flight.pop(request_id)
+            if message["ack"]:
+                self.__metrics["acknowledged"] += 1
+            else:
+                self.__logger.warning(f"Homebridge failed to apply {request_id}: {message.get('message')}")
+                self.__forget_added_gadget(added_gadget)
+                self.__metrics["failed"] += 1
+            self.__update_condition.notify()
+
+    def get_update_metrics(self) -> dict[str, int]:
+        """Returns counters about the sent updates and registrations along with the number of unfinished ones"""
+        with self.__update_condition:
+            metrics = dict(self.__metrics)
+            metrics["pending"] = len(self.__queued_updates)
+            metrics["pending_registrations"] = len(self.__queued_registrations)
+            metrics["in_flight"] = len(self.__in_flight)
+        return metrics
+
+    def __handle_gadget_list(self, message: dict) -> bool:
+        """Hands the gadget list to a waiting reconciliation, returns whether the message was the expected list"""
+        with self.__update_condition:
+            if self.__gadget_list_request is None or message.get("request_id") != self.__gadget_list_request[0]:
+                return False
+            self.__gadget_list_response = message
+            self.__gadget_list_request[1].set()
+            return True
 
     def handle_request(self, req: HomeKitRequest):
-        # Just store request in the response queue for waiting processes to access
+        if req.topic == "homebridge/from/response" and self.__handle_gadget_list(req.message):
+            return
+
         if req.topic == "homebridge/from/response" and "ack" in req.message:
-            self.__status_responses.put(req)
+            self.__handle_ack(req.message)
             return
 
         # Check handle characteristic updates
@@ -216,26 +569,13 @@ class HomeKitConnector(HomeConnector):
             if not ("name" in req.message and "characteristic" in req.message and "value" in req.message):
                 print("Received broken characteristic update request")
                 return
-            self.__update_characteristic_on_bridge(req.message["name"],
-                                                   req.message["characteristic"],
-                                                   req.message["value"])
-
-
-class HomeKitMQTTThread(Thread):
-    __parent_object: HomeKitConnector
-
-    def __init__(self, parent: HomeKitConnector):
-        super().__init__()
-        print("Starting HomeKitConnector MQTT Thread")
-        self.__parent_object = parent
-        self.__mqtt_connector = Queue
-
-    def run(self):
-        global mqtt_res_queue
-        while True:
-            buf_req: Optional[HomeKitRequest] = mqtt_res_queue.get()
-            if buf_req:
-                self.__parent_object.handle_request(buf_req)
+            characteristic = characteristic_str_to_type(req.message["characteristic"])
+            if characteristic is None:
+                print("Received update for unknown characteristic")
+                return
+            self._update_characteristic_on_bridge(req.message["name"],
+                                                  characteristic,
+                                                  req.message["value"])
 
 
 if __name__ == '__main__':
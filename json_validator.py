@@ -1,11 +1,46 @@
 import json
 import logging
 import os
-from jsonschema import validate, ValidationError
+from typing import Callable
+
+from jsonschema import ValidationError
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
 
 
 _schema_folder = "json_schemas"
 _schema_data: dict = {}  # Schemas do not change at runtime, therefore all Validators can share the same dataset
+_compiled_validators: dict = {}  # Validators are created once per schema, the first time the schema is used
+
+
+def _is_basic_request(target: dict) -> bool:
+    """Hand-written check for the 'request_basic_structure' schema, only True if the schema would accept the target"""
+    try:
+        return (isinstance(target, dict)
+                and isinstance(target["sender"], str)
+                and (target["receiver"] is None or isinstance(target["receiver"], str))
+                and isinstance(target["session_id"], int)
+                and not isinstance(target["session_id"], bool)
+                and target["session_id"] >= 0
+                and isinstance(target["payload"], dict))
+    except KeyError:
+        return False
+
+
+def _is_socket_request(target: dict) -> bool:
+    """Hand-written check for the 'socket_request_structure' schema, only True if the schema would accept the target"""
+    try:
+        return isinstance(target, dict) and isinstance(target["path"], str) and isinstance(target["body"], dict)
+    except KeyError:
+        return False
+
+
+# Checks for schemas validated on every single request. Targets they reject are passed on to the full validator,
+# which reports the actual error.
+_fast_paths: dict[str, Callable[[dict], bool]] = {
+    "request_basic_structure": _is_basic_request,
+    "socket_request_structure": _is_socket_request
+}
 
 
 class SchemaDoesNotExistException(Exception):
@@ -25,6 +60,7 @@ class Validator:
 
     def reload_schemas(self):
         global _schema_data
+        global _compiled_validators
 
         self._logger.info("Reloading Schema Data")
         buf_schemas = {}
@@ -36,11 +72,30 @@ class Validator:
                 data = json.load(f)
                 buf_schemas[filename[:-5]] = data
         _schema_data = buf_schemas
+        _compiled_validators = {}
 
     @staticmethod
-    def validate(target: dict, schema_name: str):
-        global _schema_data
+    def _get_compiled_validator(schema_name: str):
+        global _compiled_validators
+        try:
+            return _compiled_validators[schema_name]
+        except KeyError:
+            pass
         try:
-            validate(target, _schema_data[schema_name])
+            schema = _schema_data[schema_name]
         except KeyError:
             raise SchemaDoesNotExistException(f"Schema '{schema_name}' does not exist.")
+        validator_class = validator_for(schema)
+        validator_class.check_schema(schema)
+        compiled_validator = validator_class(schema)
+        _compiled_validators[schema_name] = compiled_validator
+        return compiled_validator
+
+    @staticmethod
+    def validate(target: dict, schema_name: str):
+        fast_path = _fast_paths.get(schema_name)
+        if fast_path is not None and schema_name in _schema_data and fast_path(target):
+            return
+        error = best_match(Validator._get_compiled_validator(schema_name).iter_errors(target))
+        if error is not None:
+            raise error
@@ -0,0 +1,54 @@
+import time
+from typing import Optional
+
+# Number of ping intervals without any received data after which a connection is considered dead
+_ping_timeout_factor = 3
+
+
+class ConnectionMonitor:
+    """
+    Tracks whether a connection is alive from the traffic received on it, without doing any I/O itself.
+
+    Without a ping interval, a connection is alive until it is reported closed. With a ping interval, the owner of
+    the connection is expected to send a ping whenever ping_due() says so, and the connection is considered dead if
+    nothing was received for several ping intervals.
+    """
+
+    _ping_interval: Optional[float]
+    _last_seen: float
+    _last_ping: float
+    _closed: bool
+
+    def __init__(self, ping_interval: Optional[float] = None):
+        self._ping_interval = ping_interval
+        self._last_seen = time.monotonic()
+        self._last_ping = self._last_seen
+        self._closed = False
+
+    def report_activity(self):
+        """Reports that data was received on the connection"""
+        self._last_seen = time.monotonic()
+
+    def report_closed(self):
+        """Reports that the connection was closed or broke"""
+        self._closed = True
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def ping_due(self) -> bool:
+        """Returns whether a ping should be sent now. Expects the ping to be sent if it returns True."""
+        if self._ping_interval is None or self._closed:
+            return False
+        now = time.monotonic()
+        if now - self._last_seen < self._ping_interval or now - self._last_ping < self._ping_interval:
+            return False
+        self._last_ping = now
+        return True
+
+    def is_alive(self) -> bool:
+        if self._closed:
+            return False
+        if self._ping_interval is None:
+            return True
+        return time.monotonic() - self._last_seen < self._ping_interval * _ping_timeout_factor
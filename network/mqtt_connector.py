@@ -1,4 +1,5 @@
 from network.network_client import NetworkClient
+from network.mqtt_message_filter import MQTTMessageFilter
 from network.mqtt_server_client import MQTTServerClient
 from typing import Optional
 import paho.mqtt.client as mqtt
@@ -6,6 +7,14 @@ import json
 
 from network.request import Request
 
+# Length of the parts split requests are divided into. The clients receive mqtt messages into a 256 byte buffer
+# (PubSubClient default), which has to hold the topic and the request envelope on top of the part, with every quote
+# in the part escaped. 50 is the part size the client firmware is known to receive.
+_mqtt_split_part_size = 50
+
+# Topic filter subscribed to if no other topics are selected
+_default_topic = "smarthome/#"
+
 
 class MQTTConnector(NetworkClient):
     """Class to implement a MQTT connection module"""
@@ -18,8 +27,22 @@ class MQTTConnector(NetworkClient):
     __mqtt_password: Optional[str]
 
     def __init__(self, hostname: str, mqtt_ip: str, mqtt_port: int, mqtt_user: Optional[str] = None,
-                 mqtt_pw: Optional[str] = None):
+                 mqtt_pw: Optional[str] = None, topics: Optional[list[str]] = None,
+                 receivers: Optional[list[str]] = None, accept_broadcasts: bool = True):
+        """
+        Constructor for the MQTTConnector
 
+        Only messages addressed to the hostname, one of the additional receivers or broadcasts are received, messages
+        sent by the connector itself are dropped.
+        :param hostname: Name of the connector, used as sender of all requests
+        :param mqtt_ip: IP of the broker
+        :param mqtt_port: Port of the broker
+        :param mqtt_user: Username to access the broker
+        :param mqtt_pw: Password to access the broker
+        :param topics: Topic filters to subscribe to, defaults to all smarthome topics
+        :param receivers: Additional receiver names to receive messages for
+        :param accept_broadcasts: Whether messages without a receiver are received
+        """
         self.__client = mqtt.Client(hostname)
         self.__ip = mqtt_ip
         self.__port = mqtt_port
@@ -35,14 +58,21 @@ class MQTTConnector(NetworkClient):
             self._logger.error("Could not connect to MQTT Server.")
 
         self.__client.loop_start()
-        self.__client.subscribe("smarthome/#")
+        if topics is None:
+            topics = [_default_topic]
+        self.__client.subscribe([(topic, 0) for topic in topics])
 
-        buf_client = MQTTServerClient(hostname, f"{self.__ip}, {self.__port}", self.__client)
+        message_filter = MQTTMessageFilter(hostname, receivers, accept_broadcasts)
+        buf_client = MQTTServerClient(hostname, f"{self.__ip}, {self.__port}", self.__client,
+                                      message_filter=message_filter)
 
         super().__init__(hostname, buf_client)
 
     def __del__(self):
         super().__del__()
 
+    def _get_split_part_size(self) -> int:
+        return _mqtt_split_part_size
+
     def _send_data(self, req: Request):
         self.__client.publish(req.get_path(), json.dumps(req.get_body()))
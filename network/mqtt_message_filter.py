@@ -0,0 +1,86 @@
+"""Module to drop mqtt messages not meant for a host before decoding them"""
+import re
+from typing import Iterable, Optional, Union
+
+from network.request import Request
+
+
+# Matches the string or null value following a key in a json object, strings with escaped characters do not match
+_value_pattern = re.compile(rb'\s*:\s*(?:(null)|"([^"\\]*)")')
+
+_sender_key = b'"sender"'
+_receiver_key = b'"receiver"'
+
+# Returned by _read_header_value() if the value cannot be read without decoding the message
+_undecided = object()
+
+
+def _read_header_value(payload: bytes, key: bytes) -> Union[bytes, None, object]:
+    """
+    Reads a value from the header of a raw request body.
+
+    :param payload: The raw request body
+    :param key: The quoted key to read the value of
+    :return: The value, None for null values, or _undecided if the key is missing, appears several times
+             (e.g. in the payload of the request) or its value contains escaped characters
+    """
+    # Counting and finding the key is a lot cheaper than searching the whole payload with a pattern
+    if payload.count(key) != 1:
+        return _undecided
+    match = _value_pattern.match(payload, payload.find(key) + len(key))
+    if match is None:
+        return _undecided
+    null_value, value = match.groups()
+    if null_value:
+        return None
+    return value
+
+
+class MQTTMessageFilter:
+    """
+    Decides which messages received over mqtt are meant for a host.
+
+    Messages are accepted if they are addressed to the host or one of the additional receivers, or if they are
+    broadcasts and broadcasts are accepted. Messages sent by the host itself are never accepted. The header check
+    works on the raw message and is meant to drop most other traffic before it is decoded, messages it cannot decide
+    on are passed and have to be checked again after decoding.
+    """
+
+    _host_name: str
+    _receivers: frozenset[str]
+    _encoded_host_name: bytes
+    _encoded_receivers: frozenset[bytes]
+    _accept_broadcasts: bool
+
+    def __init__(self, host_name: str, receivers: Optional[Iterable[str]] = None, accept_broadcasts: bool = True):
+        """
+        Constructor for the MQTTMessageFilter
+
+        :param host_name: Name of the host, messages addressed to it are accepted and messages sent by it are dropped
+        :param receivers: Additional receiver names the host accepts messages for
+        :param accept_broadcasts: Whether messages without a receiver are accepted
+        """
+        self._host_name = host_name
+        self._receivers = frozenset([host_name, *(receivers or [])])
+        self._encoded_host_name = host_name.encode()
+        self._encoded_receivers = frozenset(receiver.encode() for receiver in self._receivers)
+        self._accept_broadcasts = accept_broadcasts
+
+    def check_header(self, payload: bytes) -> bool:
+        """Checks the raw body of a request, only returns False for messages that are certainly not accepted"""
+        # Most foreign traffic is addressed to other hosts, so the receiver is checked first
+        receiver = _read_header_value(payload, _receiver_key)
+        if receiver is None:
+            if not self._accept_broadcasts:
+                return False
+        elif receiver is not _undecided and receiver not in self._encoded_receivers:
+            return False
+        return _read_header_value(payload, _sender_key) != self._encoded_host_name
+
+    def accepts(self, req: Request) -> bool:
+        """Checks whether a decoded request is meant for the host"""
+        if req.get_sender() == self._host_name:
+            return False
+        if req.get_receiver() is None:
+            return self._accept_broadcasts
+        return req.get_receiver() in self._receivers
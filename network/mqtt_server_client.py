@@ -1,23 +1,110 @@
 import json
-from queue import Queue
+import logging
+import threading
+from collections import deque
 from typing import Optional
 
 from jsonschema import ValidationError
 
+from json_validator import Validator
+from network.mqtt_message_filter import MQTTMessageFilter
 from network.network_connector import req_validation_scheme_name
 from network.request import Request
 from network.network_server import NetworkServerClient
 import paho.mqtt.client as mqtt
 
+# Maximum number of received messages waiting to be decoded, further messages are dropped until there is room again
+_default_max_pending_messages = 10000
+
+
+def _load_mqtt_payload(payload: bytes) -> dict:
+    """
+    Parses the payload of a mqtt message.
+
+    :param payload: The raw payload
+    :return: The parsed json object
+    :raises ValueError: If the payload is no valid json, even after fixing the quotes of older senders
+    """
+    try:
+        return json.loads(payload)
+    except ValueError:
+        pass
+    # Older senders publish python representations of their requests, with single quotes and 'None'
+    return json.loads(payload.decode("utf-8").replace("'", '"').replace("None", "null"))
+
+
+def parse_mqtt_message(topic: str, payload: bytes, validator: Validator,
+                       logger: logging.Logger) -> Optional[Request]:
+    """Creates a request from a single message received over mqtt, returns None if that is not possible"""
+    try:
+        body = _load_mqtt_payload(payload)
+    except ValueError:
+        logger.warning(f"Couldn't decode json: '{payload}'")
+        return None
+
+    try:
+        validator.validate(body, req_validation_scheme_name)
+    except ValidationError:
+        logger.warning("Could not decode Request, Schema Validation failed.")
+        return None
+
+    return Request(topic,
+                   body["session_id"],
+                   body["sender"],
+                   body["receiver"],
+                   body["payload"],
+                   connection_type=f"MQTT")
+
 
 class MQTTServerClient(NetworkServerClient):
+    """
+    Receives requests from a mqtt broker.
 
-    _client: mqtt.Client
-    _buf_queue: Queue
+    The message callback runs in the network loop of the mqtt client, so it only stores the raw messages. They are
+    decoded by the receive thread, which takes all messages received in the meantime at once. If the receive thread
+    falls too far behind, new messages are dropped instead of stalling the network loop.
 
-    def __init__(self, host_name: str, address: str, mqtt_client: mqtt.Client):
+    If a message filter is set, messages not meant for the host are dropped before decoding them, as far as that can
+    be decided from the raw message, and the remaining ones after decoding them.
+    """
+
+    _client: mqtt.Client
+    _message_filter: Optional[MQTTMessageFilter]
+
+    # Topics and payloads of the received messages, waiting to be taken by the receive thread
+    _pending_messages: deque
+    _max_pending_messages: int
+    _pending_condition: threading.Condition
+    _wake_requested: bool
+
+    # Messages taken by the receive thread that are not decoded yet, only used by the receive thread
+    _received_batch: deque
+
+    _metrics: dict[str, int]
+
+    def __init__(self, host_name: str, address: str, mqtt_client: mqtt.Client,
+                 max_pending_messages: int = _default_max_pending_messages,
+                 message_filter: Optional[MQTTMessageFilter] = None):
+        """
+        Constructor for the MQTTServerClient
+        :param host_name: Name of the host the client is connected to
+        :param address: Address of the broker
+        :param mqtt_client: The mqtt client connected to the broker
+        :param max_pending_messages: Maximum number of received messages waiting to be decoded
+        :param message_filter: Filter for the messages meant for the host, all messages are received if 'None'
+        """
         super().__init__(host_name, address)
-        self._buf_queue = Queue()
+        self._pending_messages = deque()
+        self._max_pending_messages = max_pending_messages
+        self._pending_condition = threading.Condition()
+        self._wake_requested = False
+        self._received_batch = deque()
+        self._message_filter = message_filter
+        self._metrics = {"received": 0,
+                         "dropped_foreign": 0,
+                         "dropped_overflow": 0,
+                         "invalid": 0,
+                         "batches": 0}
         self._client = mqtt_client
         self._client.on_message = self.generate_callback()
         self._client.on_disconnect = self.generate_disconnect_callback()
@@ -28,51 +115,33 @@ class MQTTServerClient(NetworkServerClient):
         super().__del__()
         self._client.disconnect()
 
-    def _add_req_to_queue(self, req: Request):
-        self._buf_queue.put(req)
-
     def generate_callback(self):
-        """Generates a callback with captured queue"""
+        """Generates the callback storing received messages for the receive thread"""
 
         logger = self._logger
-        respond_method = self._respond_to
-        handler_function = self._add_req_to_queue
-        validator = self._validator
+        pending_messages = self._pending_messages
+        condition = self._pending_condition
+        max_pending = self._max_pending_messages
+        metrics = self._metrics
+        overflowing = False
 
         def buf_callback(client, userdata, message):
-            """Callback to attach to mqtt object, mqtt_res_queue gets catched in closure"""
-            topic = message.topic
-
-            try:
-                json_str = message.payload.decode("utf-8").replace("'", '"').replace("None", "null")
-            except UnicodeDecodeError:
-                logger.warning("Couldn't format json string")
-                return
-
-            try:
-                body = json.loads(json_str)
-            except json.decoder.JSONDecodeError:
-                logger.warning("Couldn't decode json: '{}'".format(json_str))
-                return
-
-            try:
-                validator.validate(body, req_validation_scheme_name)
-            except ValidationError:
-                logger.warning("Could not decode Request, Schema Validation failed.")
-
-            try:
-                inc_req = Request(topic,
-                                  body["session_id"],
-                                  body["sender"],
-                                  body["receiver"],
-                                  body["payload"],
-                                  connection_type=f"MQTT")
-                inc_req.set_callback_method(respond_method)
-
-                handler_function(inc_req)
-
-            except ValueError:
-                logger.error("Error creating Request")
+            """Callback to attach to mqtt object, runs in the network loop and must never block"""
+            nonlocal overflowing
+            with condition:
+                metrics["received"] += 1
+                if len(pending_messages) >= max_pending:
+                    # Only the first message dropped in a row is logged, logging every one would slow down the loop
+                    if not overflowing:
+                        logger.warning("Receive queue is full, dropping messages")
+                        overflowing = True
+                    metrics["dropped_overflow"] += 1
+                    return
+                overflowing = False
+                pending_messages.append((message.topic, message.payload))
+                # The receive thread only waits if there were no pending messages
+                if len(pending_messages) == 1:
+                    condition.notify()
 
         # Return callback
         return buf_callback
@@ -96,11 +165,49 @@ class MQTTServerClient(NetworkServerClient):
     def _send(self, req: Request):
         self._client.publish(req.get_path(), json.dumps(req.get_body()))
 
+    def _take_pending_messages(self):
+        """Waits for received messages and moves all of them to the batch of the receive thread"""
+        with self._pending_condition:
+            self._pending_condition.wait_for(lambda: self._pending_messages or self._wake_requested)
+            self._wake_requested = False
+            if self._pending_messages:
+                # The deque is captured by the message callback and can therefore not be replaced
+                self._received_batch.extend(self._pending_messages)
+                self._pending_messages.clear()
+                self._metrics["batches"] += 1
+
     def _receive(self) -> Optional[Request]:
-        if not self._buf_queue.empty():
-            buf_req = self._buf_queue.get()
-            return buf_req
+        if not self._received_batch:
+            self._take_pending_messages()
+        while self._received_batch:
+            topic, payload = self._received_batch.popleft()
+            if self._message_filter is not None and not self._message_filter.check_header(payload):
+                with self._pending_condition:
+                    self._metrics["dropped_foreign"] += 1
+                continue
+            req = parse_mqtt_message(topic, payload, self._validator, self._logger)
+            if req is None:
+                with self._pending_condition:
+                    self._metrics["invalid"] += 1
+            elif self._message_filter is not None and not self._message_filter.accepts(req):
+                with self._pending_condition:
+                    self._metrics["dropped_foreign"] += 1
+            else:
+                req.set_callback_method(self._respond_to)
+                return req
         return None
 
+    def _stop_receiving(self):
+        with self._pending_condition:
+            self._wake_requested = True
+            self._pending_condition.notify()
+
     def is_connected(self) -> bool:
         return self._client.is_connected()
+
+    def get_ingest_metrics(self) -> dict[str, int]:
+        """Returns counters about the received messages along with the number of messages waiting to be decoded"""
+        with self._pending_condition:
+            metrics = dict(self._metrics)
+            metrics["pending"] = len(self._pending_messages) + len(self._received_batch)
+        return metrics
@@ -18,8 +18,5 @@ class NetworkClient(NetworkConnector, Subscriber):
     def __del__(self):
         self._client.__del__()
 
-    def receive(self, req: Request):
-        self._publish(req)
-
     def _send_data(self, req: Request):
         self._client.send_request(req)
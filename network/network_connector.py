@@ -1,6 +1,8 @@
 import json
 import logging
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Optional, Iterator, Callable
 from time import sleep
 from abc import abstractmethod
 
@@ -8,9 +10,22 @@ from network.request import Request
 from pubsub import Publisher, Subscriber
 from json_validator import Validator
 from network.network_receiver import NetworkReceiver
+from network.split_request_handler import SPLIT_ACK_KEY, SPLIT_ACK_REQUEST_KEY, SPLIT_ESCAPED_KEY
 
 req_validation_scheme_name = "request_basic_structure"
 
+# Length of the parts split requests are divided into, if the connector does not know a better one for its transport
+_default_split_part_size = 30
+
+# Number of split request parts sent before waiting for the receiver to acknowledge them
+_split_window_size = 8
+
+# Time in seconds to wait for an acknowledgement before treating the receiver as one that does not send any
+_split_ack_timeout = 1
+
+# Delay in seconds between two parts sent to receivers that do not acknowledge parts
+_split_unacknowledged_part_delay = 0.1
+
 
 class NetworkConnector(Publisher, Subscriber):
     """Class to implement an network interface prototype"""
@@ -19,11 +34,17 @@ class NetworkConnector(Publisher, Subscriber):
     _validator: Validator
     _hostname: str
 
+    # Receivers waiting for responses, stored by the session id of the request they are waiting for
+    _pending_responses: dict[int, list[NetworkReceiver]]
+    _pending_lock: threading.Lock
+
     def __init__(self, hostname: str):
         super().__init__()
         self._hostname = hostname
         self._logger = logging.getLogger(self.__class__.__name__)
         self._validator = Validator()
+        self._pending_responses = {}
+        self._pending_lock = threading.Lock()
 
     def __del__(self):
         pass
@@ -35,16 +56,57 @@ class NetworkConnector(Publisher, Subscriber):
     def _send_data(self, req: Request):
         pass
 
+    def _add_receiver(self, receiver: NetworkReceiver):
+        with self._pending_lock:
+            self._pending_responses.setdefault(receiver.get_session_id(), []).append(receiver)
+
+    def _remove_receiver(self, receiver: NetworkReceiver):
+        with self._pending_lock:
+            receivers = self._pending_responses.get(receiver.get_session_id())
+            if receivers is None:
+                return
+            if receiver in receivers:
+                receivers.remove(receiver)
+            if not receivers:
+                del self._pending_responses[receiver.get_session_id()]
+
+    def _forward_response(self, req: Request):
+        """Hands the request to every receiver waiting for a response with its session id"""
+        with self._pending_lock:
+            receivers = self._pending_responses.get(req.get_session_id())
+            if not receivers:
+                return
+            receivers = list(receivers)
+        for receiver in receivers:
+            receiver.receive(req)
+
+    @contextmanager
+    def _listen_for_responses(self, req: Request, max_responses: Optional[int],
+                              accept: Optional[Callable[[Request], bool]] = None) -> Iterator[NetworkReceiver]:
+        """Registers a receiver for the responses to the request, which is removed again when leaving the scope"""
+        req_receiver = NetworkReceiver(req, max_responses, accept)
+        self._add_receiver(req_receiver)
+        try:
+            yield req_receiver
+        finally:
+            self._remove_receiver(req_receiver)
+
+    def _send_and_wait(self, req: Request, timeout: int, max_responses: Optional[int],
+                       accept: Optional[Callable[[Request], bool]] = None) -> list[Request]:
+        # The receiver has to be registered before sending, the response might arrive before sending returns
+        with self._listen_for_responses(req, max_responses, accept) as req_receiver:
+            self._send_data(req)
+            return req_receiver.wait_for_responses(timeout)
+
     def __send_request_obj(self, req: Request, timeout: int = 6) -> Optional[Request]:
         self._logger.debug(f"Sending Request to '{req.get_path()}'")
-        self._send_data(req)
         if timeout > 0:
             self._logger.debug(f"Waiting for Response ({timeout})...")
-            req_receiver = NetworkReceiver(self)
-            responses = req_receiver.wait_for_responses(req, timeout)
+            responses = self._send_and_wait(req, timeout, 1)
             if not responses:
                 return None
             return responses[0]
+        self._send_data(req)
         return None
 
     def send_request(self, path: str, receiver: str, payload: dict, timeout: int = 6) -> Optional[Request]:
@@ -58,60 +120,89 @@ class NetworkConnector(Publisher, Subscriber):
     def send_broadcast(self, path: str, payload: dict, timeout: int = 5,
                        max_responses: Optional[int] = None) -> list[Request]:
         req = Request(path, None, self._hostname, None, payload)
-        self._send_data(req)
-        req_receiver = NetworkReceiver(self)
-        responses = req_receiver.wait_for_responses(req, timeout, max_responses)
-        return responses
+        return self._send_and_wait(req, timeout, max_responses)
 
-    def send_request_split(self, path: str, receiver: str, payload: dict, part_max_size: int = 30,
-                           timeout: int = 6) -> Optional[Request]:
-        req = Request(path, None, self._hostname, receiver, payload)
-        session_id = req.get_session_id()
-        path = req.get_path()
-        sender = req.get_sender()
-        receiver = req.get_receiver()
+    def _get_split_part_size(self) -> int:
+        """Returns the length of the parts split requests are divided into, transports may allow bigger parts"""
+        return _default_split_part_size
 
-        payload_str = json.dumps(req.get_payload())
+    def _send_split_part(self, req: Request, acknowledged: bool) -> bool:
+        """Sends a single part of a split request, returns whether it was acknowledged if that was requested"""
+        if not acknowledged:
+            self._send_data(req)
+            return False
+        part_index = req.get_payload()["package_index"]
 
-        # Make string ready to be contained in json itself
-        payload_str = payload_str.replace('"', "$*$")
+        def is_ack(response: Request) -> bool:
+            ack_index = response.get_payload().get(SPLIT_ACK_KEY)
+            return isinstance(ack_index, int) and ack_index >= part_index
 
-        payload_len = len(payload_str)
-        parts = []
-        start = 0
-        package_index = 0
+        return bool(self._send_and_wait(req, _split_ack_timeout, 1, is_ack))
 
-        while start < payload_len:
-            end = start + part_max_size
-            payload_part = payload_str[start:(end if end < payload_len else payload_len)]
-            parts.append(payload_part)
-            start = end
+    def send_request_split(self, path: str, receiver: str, payload: dict, part_max_size: Optional[int] = None,
+                           timeout: int = 6) -> Optional[Request]:
+        """
+        Sends a request split into several parts and waits for the response to the complete request.
+
+        Parts are sent back to back, the receiver is asked to acknowledge the first part and the last part of every
+        window. Receivers that do not acknowledge the first part get the remaining parts with a delay in between.
+        :param path: Path to send the request to
+        :param receiver: Receiver of the request
+        :param payload: Payload of the request
+        :param part_max_size: Maximum length of the parts, defaults to the part size of the transport
+        :param timeout: Time in seconds to wait for the response
+        :return: The response, if there is any
+        """
+        req = Request(path, None, self._hostname, receiver, payload)
+        session_id = req.get_session_id()
+        if part_max_size is None:
+            part_max_size = self._get_split_part_size()
 
+        payload_str = json.dumps(req.get_payload())
+        parts = [payload_str[start:start + part_max_size] for start in range(0, len(payload_str), part_max_size)]
         last_index = len(parts)
 
-        for payload_part in parts:
-
+        acks_supported = True
+        for package_index, payload_part in enumerate(parts):
             out_dict = {"package_index": package_index, "split_payload": payload_part}
             if package_index == 0:
                 out_dict["last_index"] = last_index
+                out_dict[SPLIT_ESCAPED_KEY] = False
 
             out_req = Request(path,
                               session_id,
-                              sender,
+                              self._hostname,
                               receiver,
                               out_dict)
-            if package_index == last_index - 1:
-                res = self.__send_request_obj(out_req, timeout)
 
-                return res
+            if package_index == last_index - 1:
+                def is_response(response: Request) -> bool:
+                    return SPLIT_ACK_KEY not in response.get_payload()
+
+                responses = self._send_and_wait(out_req, timeout, 1, is_response)
+                return responses[0] if responses else None
+
+            request_ack = acks_supported and (package_index == 0 or (package_index + 1) % _split_window_size == 0)
+            if request_ack:
+                out_dict[SPLIT_ACK_REQUEST_KEY] = True
+                if not self._send_split_part(out_req, True):
+                    self._logger.info(f"Part {package_index} of split request was not acknowledged, "
+                                      f"sending the remaining parts with a delay")
+                    acks_supported = False
             else:
-                self.__send_request_obj(out_req, 0)
-            package_index += 1
-            sleep(0.1)
+                self._send_split_part(out_req, False)
+                if not acks_supported:
+                    sleep(_split_unacknowledged_part_delay)
         return None
 
+    def get_pending_request_count(self) -> int:
+        """Returns the number of requests currently waiting for responses"""
+        with self._pending_lock:
+            return len(self._pending_responses)
+
     def get_hostname(self) -> str:
         return self._hostname
 
     def receive(self, req: Request):
+        self._forward_response(req)
         self._publish(req)
@@ -1,53 +1,62 @@
-from datetime import datetime, timedelta
-from queue import Queue
-from typing import Optional
+import threading
+from typing import Optional, Callable
 
 from network.request import Request
-from pubsub import Publisher, Subscriber
+from pubsub import Subscriber
 
 
 class NetworkReceiver(Subscriber):
-
-    _request_queue: Queue
-    _keep_queue: bool
-
-    def __init__(self, network: Publisher):
+    """Collects the responses to a single outgoing request.
+    The receiver is fed by the correlation table of its NetworkConnector, waiting costs no cpu time."""
+
+    _session_id: int
+    _sender: str
+    _max_resp_count: Optional[int]
+    _accept: Optional[Callable[[Request], bool]]
+    _responses: list[Request]
+    _condition: threading.Condition
+
+    def __init__(self, out_req: Request, max_resp_count: Optional[int] = 1,
+                 accept: Optional[Callable[[Request], bool]] = None):
+        """
+        Constructor for the NetworkReceiver
+        :param out_req: The request to collect the responses for
+        :param max_resp_count: Number of responses to wait for, 'None' to wait for the whole timeout
+        :param accept: Optional filter, responses it returns False for are ignored
+        """
         super().__init__()
-        self._request_queue = Queue()
-        self._keep_queue = False
-        self._network = network
-        self._network.subscribe(self)
+        self._session_id = out_req.get_session_id()
+        self._sender = out_req.get_sender()
+        self._max_resp_count = max_resp_count
+        self._accept = accept
+        self._responses = []
+        self._condition = threading.Condition()
 
     def __del__(self):
         pass
 
-    def receive(self, req: Request):
-        self._request_queue.put(req)
-
-    def start_listening_for_responses(self):
-        """Clears the queue and starts recording requests.
-        All received requests are used the next time wait_for_responses() is called."""
-        self._request_queue = Queue()
-        self._keep_queue = True
-
-    def wait_for_responses(self, out_req: Request, timeout: int = 300,
-                           max_resp_count: Optional[int] = 1) -> list[Request]:
-        if not self._keep_queue:
-            self._request_queue = Queue()
-        else:
-            self._keep_queue = False
+    def _is_complete(self) -> bool:
+        return self._max_resp_count is not None and len(self._responses) >= self._max_resp_count
 
-        responses: list[Request] = []
-        timeout_time = datetime.now() + timedelta(seconds=timeout)
+    def get_session_id(self) -> int:
+        return self._session_id
 
-        while timeout and datetime.now() < timeout_time:
-            if not self._request_queue.empty():
-                res: Request = self._request_queue.get()
-                if res.get_session_id() == out_req.get_session_id() and out_req.get_sender() != res.get_sender():
-
-                    responses.append(res)
-
-                    if max_resp_count and len(responses) >= max_resp_count:
-                        return responses
-
-        return responses
+    def receive(self, req: Request):
+        if req.get_session_id() != self._session_id or req.get_sender() == self._sender:
+            return
+        if self._accept is not None and not self._accept(req):
+            return
+        with self._condition:
+            if self._is_complete():
+                return
+            self._responses.append(req)
+            if self._is_complete():
+                self._condition.notify_all()
+
+    def wait_for_responses(self, timeout: int = 300) -> list[Request]:
+        """Blocks until enough responses were received or the timeout is reached.
+        Returns all responses received until then."""
+        with self._condition:
+            if timeout:
+                self._condition.wait_for(self._is_complete, timeout)
+            return list(self._responses)
@@ -1,4 +1,3 @@
-import time
 from abc import ABC
 
 from network.network_server_client import NetworkServerClient
@@ -9,6 +8,9 @@ from pubsub import Subscriber
 from network.network_connector import NetworkConnector, Request
 import threading
 
+# Time in seconds between two checks for disconnected clients
+_cleanup_interval = 1
+
 
 class NetworkServer(NetworkConnector, Subscriber, ABC):
     _clients: [NetworkServerClient]
@@ -21,7 +23,7 @@ class NetworkServer(NetworkConnector, Subscriber, ABC):
         self._clients = []
         self.__client_list_lock = threading.Lock()
         self._thread_manager = ThreadManager()
-        self._thread_manager.add_thread("thread_cleanup", self.__task_cleanup_clients)
+        self._thread_manager.add_thread("thread_cleanup", self.__task_cleanup_clients, interval=_cleanup_interval)
 
     def __del__(self):
         self._logger.info(f"Stopping {self.__class__.__name__}")
@@ -31,12 +33,16 @@ class NetworkServer(NetworkConnector, Subscriber, ABC):
             client = self._clients[0]
             self._remove_client(client.get_address())
 
+    def _get_clients(self) -> list[NetworkServerClient]:
+        """Returns a snapshot of the connected clients, safe to iterate while clients connect or disconnect"""
+        with self.__client_list_lock:
+            return list(self._clients)
+
     def __task_cleanup_clients(self):
-        for client in self._clients:
+        for client in self._get_clients():
             if not client.is_connected():
                 self._logger.info(f"Lost connection to '{client.get_address()}'")
                 self._remove_client(client.get_address())
-        time.sleep(1)
 
     def _add_client(self, client: NetworkServerClient):
         with self.__client_list_lock:
@@ -77,7 +83,4 @@ class NetworkServer(NetworkConnector, Subscriber, ABC):
         return len(self._clients)
 
     def get_client_addresses(self) -> list[str]:
-        addresses = []
-        for client in self._clients:
-            addresses.append(client.get_address())
-        return addresses
+        return [client.get_address() for client in self._get_clients()]
@@ -24,7 +24,14 @@ class NetworkServerClient(Publisher):
     __out_queue: Queue
     __in_queue: Queue
 
-    def __init__(self, host_name: str, address: str):
+    def __init__(self, host_name: str, address: str, use_threads: bool = True):
+        """
+        Constructor for the NetworkServerClient
+        :param host_name: Name of the host the client is connected to
+        :param address: Address of the connected client
+        :param use_threads: Whether the client runs its own send, receive and publish threads. Clients served
+        by an external event loop pass 'False' and call handle_request() themselves.
+        """
         super().__init__()
         self._logger = logging.getLogger(self.__class__.__name__)
         self._host_name = host_name
@@ -37,16 +44,23 @@ class NetworkServerClient(Publisher):
         self.__in_queue = Queue()
 
         self._thread_manager = ThreadManager()
-        self._thread_manager.add_thread("send_thread", self.__task_send)
-        self._thread_manager.add_thread("receive_thread", self.__task_receive)
-        self._thread_manager.add_thread("publish_thread", self.__task_publish)
+        if not use_threads:
+            return
+
+        # The send and publish tasks block on their queues and are woken up with a 'None' when stopping
+        self._thread_manager.add_thread("send_thread", self.__task_send,
+                                        wake_method=lambda: self.__out_queue.put(None))
+        self._thread_manager.add_thread("receive_thread", self.__task_receive,
+                                        wake_method=self._stop_receiving)
+        self._thread_manager.add_thread("publish_thread", self.__task_publish,
+                                        wake_method=lambda: self.__in_queue.put(None))
 
     def __del__(self):
         self._thread_manager.__del__()
 
     def __task_send(self):
-        if not self.__out_queue.empty():
-            out_req = self.__out_queue.get()
+        out_req = self.__out_queue.get()
+        if out_req is not None:
             self._send(out_req)
 
     def __task_receive(self):
@@ -55,12 +69,18 @@ class NetworkServerClient(Publisher):
             self.__in_queue.put(in_req)
 
     def __task_publish(self):
-        if not self.__in_queue.empty():
-            in_req = self.__in_queue.get()
-            req = self.__split_handler.handle(in_req)
-            if req:
-                req.set_callback_method(self._respond_to)
-                self._forward_request(req)
+        in_req = self.__in_queue.get()
+        if in_req is not None:
+            self.handle_request(in_req)
+
+    def handle_request(self, in_req: Request):
+        """Reassembles split requests and publishes every complete request"""
+        # Parts of split requests are acknowledged by the split handler
+        in_req.set_callback_method(self._respond_to)
+        req = self.__split_handler.handle(in_req)
+        if req:
+            req.set_callback_method(self._respond_to)
+            self._forward_request(req)
 
     def _respond_to(self, req: Request, payload: dict, path: Optional[str] = None):
         if path:
@@ -91,6 +111,11 @@ class NetworkServerClient(Publisher):
 
     @abstractmethod
     def _receive(self) -> Optional[Request]:
+        """Waits for the next request. May block, but has to return when _stop_receiving() is called"""
+        pass
+
+    def _stop_receiving(self):
+        """Wakes up a _receive() call blocking the receive thread, called when the client is shut down"""
         pass
 
     @abstractmethod
@@ -99,3 +124,7 @@ class NetworkServerClient(Publisher):
 
     def get_address(self) -> str:
         return self._address
+
+    def get_split_request_metrics(self) -> dict[str, int]:
+        """Returns counters about the split requests reassembled for this client"""
+        return self.__split_handler.get_metrics()
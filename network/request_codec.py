@@ -0,0 +1,326 @@
+"""Module to contain the codecs used to encode requests for transmission"""
+import json
+import struct
+from abc import ABC, abstractmethod
+from typing import Optional
+
+# Control messages used to agree on the codec of a connection. Both are sent as plain text, followed by codec names.
+CODEC_OFFER_MESSAGE = "CODEC_OFFER"
+CODEC_ACCEPT_MESSAGE = "CODEC_ACCEPT"
+
+
+class RequestDecodeException(Exception):
+    def __init__(self, reason: str):
+        super().__init__(f"RequestDecodeException: {reason}")
+
+
+class RequestCodec(ABC):
+    """Encodes the json-compatible objects describing a request into bytes and back"""
+
+    @staticmethod
+    @abstractmethod
+    def get_name() -> str:
+        """Returns the name used to select the codec when negotiating"""
+
+    @staticmethod
+    @abstractmethod
+    def get_id() -> int:
+        """Returns the id used to mark binary messages encoded with this codec"""
+
+    @abstractmethod
+    def encode(self, obj: dict) -> bytes:
+        """Encodes the object"""
+
+    @abstractmethod
+    def decode(self, data: bytes) -> dict:
+        """
+        Decodes an object
+        :param data: The encoded object
+        :return: The decoded object
+        :raises RequestDecodeException: If the data could not be decoded
+        """
+
+
+class JsonRequestCodec(RequestCodec):
+    """The default codec every connection starts with and falls back to"""
+
+    @staticmethod
+    def get_name() -> str:
+        return "json"
+
+    @staticmethod
+    def get_id() -> int:
+        return 0
+
+    def encode(self, obj: dict) -> bytes:
+        return json.dumps(obj).encode()
+
+    def decode(self, data: bytes) -> dict:
+        try:
+            return json.loads(data)
+        except (UnicodeDecodeError, json.decoder.JSONDecodeError) as err:
+            raise RequestDecodeException(str(err))
+
+
+class MsgPackRequestCodec(RequestCodec):
+    """
+    Binary codec producing MessagePack, which clients can read and write with ArduinoJson.
+
+    Only supports the types json supports, so both codecs can be used for the same requests.
+    """
+
+    @staticmethod
+    def get_name() -> str:
+        return "msgpack"
+
+    @staticmethod
+    def get_id() -> int:
+        return 1
+
+    def encode(self, obj: dict) -> bytes:
+        out_data = bytearray()
+        self._pack(obj, out_data)
+        return bytes(out_data)
+
+    def decode(self, data: bytes) -> dict:
+        try:
+            obj, end = self._unpack(data, 0)
+        except (IndexError, struct.error, UnicodeDecodeError):
+            raise RequestDecodeException("Data ended unexpectedly or contained invalid strings")
+        if end != len(data):
+            raise RequestDecodeException(f"{len(data) - end} bytes left over after decoding")
+        return obj
+
+    def _pack(self, obj, out_data: bytearray):
+        if obj is None:
+            out_data.append(0xc0)
+        elif obj is True:
+            out_data.append(0xc3)
+        elif obj is False:
+            out_data.append(0xc2)
+        elif isinstance(obj, int):
+            self._pack_int(obj, out_data)
+        elif isinstance(obj, float):
+            out_data.append(0xcb)
+            out_data += struct.pack(">d", obj)
+        elif isinstance(obj, str):
+            buf_str = obj.encode()
+            length = len(buf_str)
+            if length < 32:
+                out_data.append(0xa0 | length)
+            elif length < 0x100:
+                out_data += struct.pack(">BB", 0xd9, length)
+            elif length < 0x10000:
+                out_data += struct.pack(">BH", 0xda, length)
+            else:
+                out_data += struct.pack(">BI", 0xdb, length)
+            out_data += buf_str
+        elif isinstance(obj, (list, tuple)):
+            length = len(obj)
+            if length < 16:
+                out_data.append(0x90 | length)
+            elif length < 0x10000:
+                out_data += struct.pack(">BH", 0xdc, length)
+            else:
+                out_data += struct.pack(">BI", 0xdd, length)
+            for item in obj:
+                self._pack(item, out_data)
+        elif isinstance(obj, dict):
+            length = len(obj)
+            if length < 16:
+                out_data.append(0x80 | length)
+            elif length < 0x10000:
+                out_data += struct.pack(">BH", 0xde, length)
+            else:
+                out_data += struct.pack(">BI", 0xdf, length)
+            for key, value in obj.items():
+                self._pack(str(key), out_data)
+                self._pack(value, out_data)
+        else:
+            raise TypeError(f"Object of type {obj.__class__.__name__} cannot be encoded")
+
+    @staticmethod
+    def _pack_int(value: int, out_data: bytearray):
+        if 0 <= value < 0x80:
+            out_data.append(value)
+        elif -32 <= value < 0:
+            out_data.append(value & 0xff)
+        elif 0 <= value < 0x100:
+            out_data += struct.pack(">BB", 0xcc, value)
+        elif 0 <= value < 0x10000:
+            out_data += struct.pack(">BH", 0xcd, value)
+        elif 0 <= value < 0x100000000:
+            out_data += struct.pack(">BI", 0xce, value)
+        elif 0 <= value < 0x10000000000000000:
+            out_data += struct.pack(">BQ", 0xcf, value)
+        elif -0x80 <= value < 0:
+            out_data += struct.pack(">Bb", 0xd0, value)
+        elif -0x8000 <= value < 0:
+            out_data += struct.pack(">Bh", 0xd1, value)
+        elif -0x80000000 <= value < 0:
+            out_data += struct.pack(">Bi", 0xd2, value)
+        elif -0x8000000000000000 <= value < 0:
+            out_data += struct.pack(">Bq", 0xd3, value)
+        else:
+            raise OverflowError(f"Integer {value} is too big to be encoded")
+
+    def _unpack(self, data: bytes, pos: int):
+        """Decodes the object starting at pos, returns the object and the position after it"""
+        type_byte = data[pos]
+        pos += 1
+
+        if type_byte < 0x80:
+            return type_byte, pos
+        if type_byte >= 0xe0:
+            return type_byte - 0x100, pos
+        if 0xa0 <= type_byte < 0xc0:
+            return self._unpack_str(data, pos, type_byte & 0x1f)
+        if 0x90 <= type_byte < 0xa0:
+            return self._unpack_array(data, pos, type_byte & 0x0f)
+        if 0x80 <= type_byte < 0x90:
+            return self._unpack_map(data, pos, type_byte & 0x0f)
+
+        if type_byte == 0xc0:
+            return None, pos
+        if type_byte == 0xc2:
+            return False, pos
+        if type_byte == 0xc3:
+            return True, pos
+        if type_byte in _fixed_len_types:
+            buf_format, length = _fixed_len_types[type_byte]
+            return struct.unpack_from(buf_format, data, pos)[0], pos + length
+        if type_byte in _str_types:
+            buf_format, length = _str_types[type_byte]
+            return self._unpack_str(data, pos + length, struct.unpack_from(buf_format, data, pos)[0])
+        if type_byte in (0xdc, 0xdd):
+            buf_format, length = (">H", 2) if type_byte == 0xdc else (">I", 4)
+            return self._unpack_array(data, pos + length, struct.unpack_from(buf_format, data, pos)[0])
+        if type_byte in (0xde, 0xdf):
+            buf_format, length = (">H", 2) if type_byte == 0xde else (">I", 4)
+            return self._unpack_map(data, pos + length, struct.unpack_from(buf_format, data, pos)[0])
+        raise RequestDecodeException(f"Unsupported type byte {hex(type_byte)}")
+
+    @staticmethod
+    def _unpack_str(data: bytes, pos: int, length: int):
+        end = pos + length
+        if end > len(data):
+            raise IndexError
+        return data[pos:end].decode(), end
+
+    def _unpack_array(self, data: bytes, pos: int, length: int):
+        out_list = []
+        for _ in range(length):
+            item, pos = self._unpack(data, pos)
+            out_list.append(item)
+        return out_list, pos
+
+    def _unpack_map(self, data: bytes, pos: int, length: int):
+        out_map = {}
+        for _ in range(length):
+            key, pos = self._unpack(data, pos)
+            value, pos = self._unpack(data, pos)
+            out_map[key] = value
+        return out_map, pos
+
+
+# Type bytes of numbers with a fixed length: (struct format, length in bytes)
+_fixed_len_types = {
+    0xca: (">f", 4),
+    0xcb: (">d", 8),
+    0xcc: (">B", 1),
+    0xcd: (">H", 2),
+    0xce: (">I", 4),
+    0xcf: (">Q", 8),
+    0xd0: (">b", 1),
+    0xd1: (">h", 2),
+    0xd2: (">i", 4),
+    0xd3: (">q", 8)
+}
+
+# Type bytes of strings: (struct format of the length, length of the length in bytes)
+_str_types = {
+    0xd9: (">B", 1),
+    0xda: (">H", 2),
+    0xdb: (">I", 4)
+}
+
+JSON_CODEC = JsonRequestCodec()
+MSGPACK_CODEC = MsgPackRequestCodec()
+
+_codecs_by_name: dict[str, RequestCodec] = {codec.get_name(): codec for codec in [JSON_CODEC, MSGPACK_CODEC]}
+_codecs_by_id: dict[int, RequestCodec] = {codec.get_id(): codec for codec in _codecs_by_name.values()}
+
+
+def get_codec(name: str) -> Optional[RequestCodec]:
+    """Returns the codec with the given name, or None if there is no such codec"""
+    return _codecs_by_name.get(name)
+
+
+def get_codec_names() -> list[str]:
+    return list(_codecs_by_name.keys())
+
+
+def encode_binary_message(obj: dict, codec: RequestCodec) -> bytes:
+    """Encodes an object into a binary message, marked with the id of the codec used"""
+    return bytes([codec.get_id()]) + codec.encode(obj)
+
+
+def decode_binary_message(message: bytes) -> dict:
+    """
+    Decodes a binary message created by encode_binary_message()
+    :param message: The message
+    :return: The decoded object
+    :raises RequestDecodeException: If the message could not be decoded
+    """
+    if not message:
+        raise RequestDecodeException("Message is empty")
+    codec = _codecs_by_id.get(message[0])
+    if codec is None:
+        raise RequestDecodeException(f"Unknown codec id {message[0]}")
+    return codec.decode(message[1:])
+
+
+class CodecNegotiator:
+    """
+    Keeps track of the codec used to send requests over a single connection.
+
+    Every connection starts out using json. One side offers the codecs it would like to use, and the other side
+    accepts the first one it supports. Received messages are decoded by the codec they are marked with, so it does not
+    matter which side switches first.
+    """
+
+    _codec: RequestCodec
+
+    def __init__(self):
+        self._codec = JSON_CODEC
+
+    def get_codec(self) -> RequestCodec:
+        return self._codec
+
+    @staticmethod
+    def create_offer(codec_names: list[str]) -> str:
+        """Creates the control message offering the codecs to the peer, the preferred one first"""
+        return " ".join([CODEC_OFFER_MESSAGE] + codec_names)
+
+    @staticmethod
+    def is_control_message(message: str) -> bool:
+        return message.startswith(CODEC_OFFER_MESSAGE) or message.startswith(CODEC_ACCEPT_MESSAGE)
+
+    def handle_control_message(self, message: str) -> Optional[str]:
+        """
+        Handles a control message received from the peer
+        :param message: The received message
+        :return: The message to answer with, if any
+        """
+        elements = message.split()
+        if elements[0] == CODEC_OFFER_MESSAGE:
+            for name in elements[1:]:
+                if name in _codecs_by_name:
+                    self._codec = _codecs_by_name[name]
+                    return f"{CODEC_ACCEPT_MESSAGE} {name}"
+            # Nothing offered is supported, stick with json
+            self._codec = JSON_CODEC
+            return f"{CODEC_ACCEPT_MESSAGE} {JSON_CODEC.get_name()}"
+        if elements[0] == CODEC_ACCEPT_MESSAGE and len(elements) == 2 and elements[1] in _codecs_by_name:
+            self._codec = _codecs_by_name[elements[1]]
+        return None
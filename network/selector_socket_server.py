@@ -0,0 +1,191 @@
+import selectors
+import socket
+import threading
+from queue import Queue
+from typing import Optional
+
+from network.network_server import NetworkServer
+from network.selector_socket_server_client import SelectorSocketServerClient
+from network.socket_server import SocketServerCreationFailedException
+from network.socket_server_client import SOCKET_SPLIT_PART_SIZE
+
+# Backlog of the listening socket, large enough for many clients connecting at once
+_selector_server_backlog = 128
+
+# Time in seconds between two checks whether any client needs to be pinged
+_ping_check_interval = 1
+
+
+class SelectorSocketServer(NetworkServer):
+    """
+    SocketServer serving all of its connections from a single event loop thread.
+
+    Can be used in place of the SocketServer when there are many clients connected, since no client needs any
+    threads of its own. Received requests are published from a separate thread, so slow subscribers do not block
+    reading and writing the sockets.
+    """
+
+    _server_socket: socket.socket
+    _port: int
+    _host: str
+    _ping_interval: Optional[float]
+
+    _selector: selectors.BaseSelector
+
+    # Socket pair used to wake up the event loop from other threads
+    _wake_reader: socket.socket
+    _wake_writer: socket.socket
+    _wake_pending: bool
+
+    # Clients that need their registration on the selector changed by the event loop
+    _changed_clients: set
+    _changed_lock: threading.Lock
+
+    _publish_queue: Queue
+
+    def __init__(self, own_name: str, port: int, ping_interval: Optional[float] = None):
+        super().__init__(own_name)
+        self._port = port
+        self._ping_interval = ping_interval
+        self._host = socket.gethostname()
+
+        self._selector = selectors.DefaultSelector()
+        self._changed_clients = set()
+        self._changed_lock = threading.Lock()
+        self._publish_queue = Queue()
+
+        self._wake_pending = False
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        self._wake_reader.setblocking(False)
+        self._wake_writer.setblocking(False)
+        self._selector.register(self._wake_reader, selectors.EVENT_READ)
+
+        self._start_server()
+
+        self._thread_manager.add_thread("selector_loop", self.__task_loop, wake_method=self._wake_loop)
+        self._thread_manager.add_thread("selector_publish", self.__task_publish,
+                                        wake_method=lambda: self._publish_queue.put(None))
+        if self._ping_interval is not None:
+            self._thread_manager.add_thread("selector_ping", self.__task_ping, interval=_ping_check_interval)
+        self._thread_manager.start_threads()
+
+    def __del__(self):
+        super().__del__()
+        selector_map = self._selector.get_map()
+        if selector_map is None:
+            # Already shut down
+            return
+        # The event loop is not running anymore, close everything that is left
+        for key in list(selector_map.values()):
+            key.fileobj.close()
+        self._selector.close()
+        self._server_socket.close()
+        self._wake_writer.close()
+
+    def _get_split_part_size(self) -> int:
+        return SOCKET_SPLIT_PART_SIZE
+
+    def _start_server(self):
+        self._logger.info(f"SelectorSocketServer is binding to {self._host} @ {self._port}")
+        self._server_socket = socket.socket()
+        self._server_socket.setblocking(False)
+        try:
+            self._server_socket.bind((self._host, self._port))
+        except OSError:
+            raise SocketServerCreationFailedException(self._host, self._port)
+
+        self._server_socket.listen(_selector_server_backlog)
+        self._selector.register(self._server_socket, selectors.EVENT_READ)
+        self._logger.info("SelectorSocketServer is listening for clients...")
+
+    def _wake_loop(self):
+        with self._changed_lock:
+            if self._wake_pending:
+                return
+            self._wake_pending = True
+        try:
+            self._wake_writer.send(b"\0")
+        except OSError:
+            pass
+
+    def __client_changed(self, client: SelectorSocketServerClient):
+        """Called by the clients from any thread when they have data to send or were closed"""
+        with self._changed_lock:
+            self._changed_clients.add(client)
+        self._wake_loop()
+
+    def __apply_client_changes(self):
+        with self._changed_lock:
+            buf_clients = self._changed_clients
+            self._changed_clients = set()
+            self._wake_pending = False
+
+        for client in buf_clients:
+            client_socket = client.get_socket()
+            if client.is_closed():
+                try:
+                    self._selector.unregister(client_socket)
+                except (KeyError, ValueError):
+                    pass
+                client_socket.close()
+                continue
+            events = selectors.EVENT_READ
+            if client.wants_write():
+                events |= selectors.EVENT_WRITE
+            try:
+                self._selector.modify(client_socket, events, client)
+            except (KeyError, ValueError):
+                pass
+
+    def __accept_new_clients(self):
+        while True:
+            try:
+                new_client, address = self._server_socket.accept()
+            except OSError:
+                # No more connections waiting
+                return
+            client = SelectorSocketServerClient(self._hostname, str(address), new_client, self.__client_changed,
+                                                self._ping_interval)
+            self._selector.register(new_client, selectors.EVENT_READ, client)
+            self._add_client(client)
+
+    def __task_loop(self):
+        self.__apply_client_changes()
+        for key, mask in self._selector.select():
+            if key.fileobj is self._server_socket:
+                self.__accept_new_clients()
+                continue
+
+            if key.fileobj is self._wake_reader:
+                try:
+                    while self._wake_reader.recv(1024):
+                        pass
+                except OSError:
+                    pass
+                continue
+
+            client: SelectorSocketServerClient = key.data
+            if mask & selectors.EVENT_READ:
+                for req in client.handle_read():
+                    self._publish_queue.put((client, req))
+            if mask & selectors.EVENT_WRITE:
+                client.handle_write()
+                if not client.wants_write():
+                    # Data queued in the meantime marks the client as changed again, so this cannot lose any
+                    self._selector.modify(client.get_socket(), selectors.EVENT_READ, client)
+
+            if client.is_closed():
+                self._logger.info(f"Lost connection to '{client.get_address()}'")
+                self._remove_client(client.get_address())
+
+    def __task_publish(self):
+        buf_entry = self._publish_queue.get()
+        if buf_entry is None:
+            return
+        client, req = buf_entry
+        client.handle_request(req)
+
+    def __task_ping(self):
+        # Runs on its own thread, the selector thread may add or remove clients meanwhile
+        for client in self._get_clients():
+            client.send_ping_if_due()
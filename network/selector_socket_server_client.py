@@ -0,0 +1,130 @@
+from __future__ import annotations
+import socket
+import threading
+from typing import Optional, Callable
+
+from network.connection_monitor import ConnectionMonitor
+from network.request import Request
+from network.request_codec import CodecNegotiator
+from network.network_server_client import NetworkServerClient
+from network.socket_message_buffer import SocketMessageBuffer, SOCKET_MESSAGE_DELIMITER
+from network.socket_server_client import encode_socket_request, parse_socket_message, _socket_receive_len, \
+    is_socket_control_message, answer_socket_control_message, SOCKET_PING_MESSAGE
+
+
+class SelectorSocketServerClient(NetworkServerClient):
+    """
+    Socket client without any threads of its own.
+
+    Reading and writing is done by the event loop of the SelectorSocketServer, which gets notified through the
+    update callback whenever the client has data waiting to be sent or was closed.
+    """
+
+    _socket_client: socket.socket
+    _update_callback: Callable[[SelectorSocketServerClient], None]
+    _message_buffer: SocketMessageBuffer
+    _out_buffer: bytearray
+    _out_lock: threading.Lock
+    _monitor: ConnectionMonitor
+    _codec_negotiator: CodecNegotiator
+
+    def __init__(self, host_name: str, address: str, client: socket.socket,
+                 update_callback: Callable[[SelectorSocketServerClient], None], ping_interval: Optional[float] = None):
+        super().__init__(host_name, address, use_threads=False)
+        self._socket_client = client
+        self._socket_client.setblocking(False)
+        self._update_callback = update_callback
+        self._message_buffer = SocketMessageBuffer()
+        self._out_buffer = bytearray()
+        self._out_lock = threading.Lock()
+        self._monitor = ConnectionMonitor(ping_interval)
+        self._codec_negotiator = CodecNegotiator()
+
+    def __del__(self):
+        super().__del__()
+        self.close()
+
+    def close(self):
+        """Marks the connection as closed. The socket itself is closed by the event loop."""
+        if not self._monitor.is_closed():
+            self._monitor.report_closed()
+            self._update_callback(self)
+
+    def is_closed(self) -> bool:
+        return self._monitor.is_closed()
+
+    def get_socket(self) -> socket.socket:
+        return self._socket_client
+
+    def send_request(self, req: Request):
+        self._send(req)
+
+    def _send(self, req: Request):
+        self._send_raw(encode_socket_request(req, self._codec_negotiator.get_codec()))
+
+    def _send_raw(self, data: bytes):
+        if self._monitor.is_closed():
+            return
+        with self._out_lock:
+            self._out_buffer += data
+        self._update_callback(self)
+
+    def send_ping_if_due(self):
+        """Pings the peer if nothing was received from it for a while"""
+        if self._monitor.ping_due():
+            self._send_raw(SOCKET_PING_MESSAGE.encode() + SOCKET_MESSAGE_DELIMITER)
+
+    def _receive(self) -> Optional[Request]:
+        # Receiving is done by handle_read(), called from the event loop
+        return None
+
+    def wants_write(self) -> bool:
+        with self._out_lock:
+            return len(self._out_buffer) > 0
+
+    def handle_write(self):
+        """Writes as much buffered data as the socket accepts without blocking"""
+        with self._out_lock:
+            try:
+                bytes_sent = self._socket_client.send(self._out_buffer)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._logger.info(f"Connection to '{self._address}' was lost while sending")
+                self._out_buffer.clear()
+                connection_lost = True
+            else:
+                del self._out_buffer[:bytes_sent]
+                connection_lost = False
+        if connection_lost:
+            self.close()
+
+    def handle_read(self) -> list[Request]:
+        """Reads the data available on the socket and returns all requests completed by it"""
+        try:
+            buf_rec_data = self._socket_client.recv(_socket_receive_len)
+        except BlockingIOError:
+            return []
+        except OSError:
+            buf_rec_data = b""
+
+        if not buf_rec_data:
+            self.close()
+            return []
+
+        self._monitor.report_activity()
+
+        out_requests = []
+        for message in self._message_buffer.add_data(buf_rec_data):
+            if is_socket_control_message(message):
+                answer = answer_socket_control_message(message, self._codec_negotiator)
+                if answer:
+                    self._send_raw(answer.encode() + SOCKET_MESSAGE_DELIMITER)
+                continue
+            buf_req = parse_socket_message(message, self._validator, self._logger)
+            if buf_req:
+                out_requests.append(buf_req)
+        return out_requests
+
+    def is_connected(self) -> bool:
+        return self._monitor.is_alive()
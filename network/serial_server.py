@@ -5,6 +5,12 @@ import serial
 from network.network_server import NetworkServer
 from network.serial_server_client import SerialServerClient
 
+# Time in seconds between two scans for new serial ports
+_port_scan_interval = 1
+
+# Length of the parts split requests are divided into, small enough for the serial buffers of the clients
+_serial_split_part_size = 50
+
 
 class SerialServer(NetworkServer):
 
@@ -16,12 +22,15 @@ class SerialServer(NetworkServer):
         self._baud_rate = baud_rate
         self._blocked_addresses = []
 
-        self._thread_manager.add_thread("serial_server_accept", self._accept_new_clients)
+        self._thread_manager.add_thread("serial_server_accept", self._accept_new_clients, interval=_port_scan_interval)
         self._thread_manager.start_threads()
 
     def __del__(self):
         super().__del__()
 
+    def _get_split_part_size(self) -> int:
+        return _serial_split_part_size
+
     @staticmethod
     def get_serial_ports() -> [str]:
         """Returns a list of all serial ports available to the system"""
@@ -1,5 +1,6 @@
 import json
 import re
+from collections import deque
 from typing import Optional
 
 import serial
@@ -9,6 +10,12 @@ from jsonschema import ValidationError
 from network.network_connector import req_validation_scheme_name
 from network.network_server_client import NetworkServerClient
 from network.request import Request
+from network.request_codec import CodecNegotiator, RequestDecodeException, JSON_CODEC, encode_binary_message, \
+    decode_binary_message
+from network.socket_message_buffer import SocketMessageBuffer, encode_binary_socket_message
+
+# Maximum length of a single message in bytes
+_serial_max_message_len = 64 * 1024
 
 
 class SerialConnectionFailedException(Exception):
@@ -20,11 +27,20 @@ class SerialServerClient(NetworkServerClient):
 
     _serial_client: serial.Serial
     _is_closed: bool
+    _message_buffer: SocketMessageBuffer
+    _received_requests: deque
+    _codec_negotiator: CodecNegotiator
 
     def __init__(self, host_name: str, address: str, client: serial.Serial):
         super().__init__(host_name, address)
         self._serial_client = client
         self._is_closed = False
+        # Lines and binary messages are framed the same way as on sockets. Clients print noise containing zero bytes
+        # at boot, so binary framing is only used once a binary codec was negotiated, until then stray bytes are
+        # dropped with the rest of their line.
+        self._message_buffer = SocketMessageBuffer(_serial_max_message_len, binary_framing=False)
+        self._received_requests = deque()
+        self._codec_negotiator = CodecNegotiator()
         self._thread_manager.start_threads()
 
     def __del__(self):
@@ -42,12 +58,17 @@ class SerialServerClient(NetworkServerClient):
     def _send(self, req: Request):
         """Sends a request on the serial port"""
 
-        json_str = json.dumps(req.get_body())
-
-        req_line = "!r_p[{}]_b[{}]_\n".format(req.get_path(),
-                                              json_str)
-        self._logger.debug("Sending: {}".format(req_line[:-1]))
-        out_data = req_line.encode()
+        codec = self._codec_negotiator.get_codec()
+        if codec is JSON_CODEC:
+            req_line = self._format_request(req)
+            self._logger.debug("Sending: {}".format(req_line[:-1]))
+            self._write(req_line.encode())
+        else:
+            self._logger.debug(f"Sending '{req.get_path()}' as {codec.get_name()}")
+            req_obj = {"path": req.get_path(), "body": req.get_body()}
+            self._write(encode_binary_socket_message(encode_binary_message(req_obj, codec)))
+
+    def _write(self, out_data: bytes):
         bytes_written = self._serial_client.write(out_data)
         if not bytes_written == len(out_data):
             self._logger.error(f"Problem sending request: only {bytes_written} of {len(out_data)} bytes written.")
@@ -89,26 +110,65 @@ class SerialServerClient(NetworkServerClient):
                 return None
         return None
 
-    def _receive(self) -> Optional[Request]:
+    def _decode_binary_message(self, message: bytes) -> Optional[Request]:
+        """Decodes a binary message and extracts the request from it if possible"""
         try:
-            ser_bytes = self._serial_client.readline().decode()
-            message = ser_bytes[:-1]
-            if not message:
-                return None
-            if message.startswith("Backtrace: 0x"):
-                self._logger.info("Client crashed with {}".format(message))
-                return None
-            read_buf_req = self._decode_line(ser_bytes)
-            if not read_buf_req:
-                return None
-            return read_buf_req
+            req_obj = decode_binary_message(message)
+            json_body = req_obj["body"]
+            self._validator.validate(json_body, req_validation_scheme_name)
+            return Request(path=req_obj["path"],
+                           session_id=json_body["session_id"],
+                           sender=json_body["sender"],
+                           receiver=json_body["receiver"],
+                           payload=json_body["payload"],
+                           connection_type=f"Serial[{self._address}]")
+        except (RequestDecodeException, KeyError, TypeError, ValidationError):
+            self._logger.warning("Could not decode binary Request")
+            return None
 
-        except (FileNotFoundError, serial.serialutil.SerialException):
+    def _handle_message(self, message):
+        if isinstance(message, bytes):
+            read_buf_req = self._decode_binary_message(message)
+        elif CodecNegotiator.is_control_message(message):
+            answer = self._codec_negotiator.handle_control_message(message)
+            if answer:
+                self._write(f"{answer}\n".encode())
+            # The client only switches after receiving the answer, so everything it sent before is still text
+            self._message_buffer.set_binary_framing(self._codec_negotiator.get_codec() is not JSON_CODEC)
+            return
+        elif message.startswith("Backtrace: 0x"):
+            self._logger.info("Client crashed with {}".format(message))
+            return
+        else:
+            read_buf_req = self._decode_line(message)
+        if read_buf_req:
+            self._received_requests.append(read_buf_req)
+
+    def _receive(self) -> Optional[Request]:
+        # A single read may have completed several requests, those are handed out first
+        if self._received_requests:
+            return self._received_requests.popleft()
+
+        try:
+            # Block for the first byte, then take everything else that already arrived
+            ser_bytes = self._serial_client.read(1)
+            ser_bytes += self._serial_client.read(self._serial_client.in_waiting)
+        except (FileNotFoundError, OSError, serial.serialutil.SerialException):
             self._is_closed = True
             return None
-        except UnicodeDecodeError:
-            self._logger.error("Unable to decode message")
-            return None
+
+        for message in self._message_buffer.add_data(ser_bytes):
+            self._handle_message(message)
+
+        if self._received_requests:
+            return self._received_requests.popleft()
+        return None
+
+    def _stop_receiving(self):
+        try:
+            self._serial_client.cancel_read()
+        except (AttributeError, serial.serialutil.SerialException):
+            pass
 
     def is_connected(self) -> bool:
         return not self._is_closed and self._serial_client.isOpen()
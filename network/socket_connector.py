@@ -2,7 +2,7 @@ import socket
 from typing import Optional
 
 from network.network_client import NetworkClient
-from network.socket_server_client import SocketServerClient, _socket_timeout
+from network.socket_server_client import SocketServerClient, _socket_timeout, SOCKET_SPLIT_PART_SIZE
 
 
 class SocketConnector(NetworkClient):
@@ -11,7 +11,15 @@ class SocketConnector(NetworkClient):
     _address: str
     _port: int
 
-    def __init__(self, hostname: str, address: Optional[str], port: int):
+    def __init__(self, hostname: str, address: Optional[str], port: int, codecs: Optional[list[str]] = None):
+        """
+        Constructor for the SocketConnector
+        :param hostname: Name of this connector
+        :param address: Address of the server to connect to
+        :param port: Port of the server to connect to
+        :param codecs: Codecs to offer the server for sending requests, the preferred one first. Requests are sent
+        as json if this is 'None' or the server does not accept any of them.
+        """
         if not address or address == "localhost":
             address = socket.gethostname()
         self._port = port
@@ -21,9 +29,14 @@ class SocketConnector(NetworkClient):
         self._socket_client.settimeout(_socket_timeout)
         self._socket_client.connect((self._address, self._port))
         buf_client = SocketServerClient(hostname, self._address, self._socket_client)
+        if codecs:
+            buf_client.offer_codecs(codecs)
 
         super().__init__(hostname, buf_client)
 
     def __del__(self):
         super().__del__()
         self._logger.info("Shutting down SocketClient")
+
+    def _get_split_part_size(self) -> int:
+        return SOCKET_SPLIT_PART_SIZE
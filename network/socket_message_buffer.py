@@ -0,0 +1,105 @@
+import logging
+from typing import Union
+
+# Byte terminating every text message sent over a socket
+SOCKET_MESSAGE_DELIMITER = b"\n"
+
+# Byte starting a binary message, which is followed by its length and cannot be terminated by a delimiter
+BINARY_MESSAGE_MARKER = 0
+_binary_length_bytes = 4
+_binary_header_len = 1 + _binary_length_bytes
+
+# Maximum length of a single message in bytes, longer messages are dropped
+_default_max_message_len = 4 * 1024 * 1024
+
+
+class SocketMessageBuffer:
+    """
+    Incremental read buffer for a socket connection.
+
+    Collects the received data and splits it into the messages it contains. Text messages are separated by
+    newlines, binary messages are prefixed with a marker byte and their length. Messages may arrive in any number of
+    chunks and one chunk may contain any number of messages. Without binary framing the marker byte has no meaning
+    and every message ends at the next newline.
+    """
+
+    _logger: logging.Logger
+    _buffer: bytearray
+    _search_start: int
+    _max_message_len: int
+    _discarding: bool
+    _binary_framing: bool
+
+    def __init__(self, max_message_len: int = _default_max_message_len, binary_framing: bool = True):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._buffer = bytearray()
+        # Position up to which the buffer is known to contain no delimiter
+        self._search_start = 0
+        self._max_message_len = max_message_len
+        self._discarding = False
+        self._binary_framing = binary_framing
+
+    def set_binary_framing(self, enabled: bool):
+        """Sets whether the marker byte starts a binary message, applies to all data not split into messages yet"""
+        self._binary_framing = enabled
+
+    def add_data(self, data: bytes) -> list[Union[str, bytes]]:
+        """
+        Adds received data to the buffer
+        :param data: The received data
+        :return: All messages completed by the data, text messages as str and binary messages as bytes
+        """
+        self._buffer += data
+        messages = []
+        msg_start = 0
+
+        while msg_start < len(self._buffer):
+            if self._binary_framing and not self._discarding and self._buffer[msg_start] == BINARY_MESSAGE_MARKER:
+                if len(self._buffer) < msg_start + _binary_header_len:
+                    break
+                msg_len = int.from_bytes(self._buffer[msg_start + 1:msg_start + _binary_header_len], "big")
+                if msg_len <= self._max_message_len:
+                    msg_end = msg_start + _binary_header_len + msg_len
+                    if len(self._buffer) < msg_end:
+                        break
+                    messages.append(bytes(self._buffer[msg_start + _binary_header_len:msg_end]))
+                    msg_start = msg_end
+                    continue
+                # The length cannot be trusted, drop everything up to the next delimiter
+                self._logger.info(f"Binary message announced {msg_len} bytes, dropping it")
+                self._discarding = True
+
+            msg_end = self._buffer.find(SOCKET_MESSAGE_DELIMITER, max(self._search_start, msg_start))
+            if msg_end == -1:
+                break
+            if self._discarding:
+                self._discarding = False
+            elif msg_end > msg_start:
+                try:
+                    messages.append(self._buffer[msg_start:msg_end].decode())
+                except UnicodeDecodeError:
+                    self._logger.info("Received message that could not be decoded")
+            msg_start = msg_end + 1
+
+        del self._buffer[:msg_start]
+        self._search_start = len(self._buffer)
+
+        max_buffered_len = self._max_message_len
+        if self._binary_framing and self._buffer and self._buffer[0] == BINARY_MESSAGE_MARKER and not self._discarding:
+            max_buffered_len += _binary_header_len
+        if len(self._buffer) > max_buffered_len:
+            self._logger.info(f"Message exceeded {self._max_message_len} bytes, dropping it")
+            self._buffer.clear()
+            self._search_start = 0
+            self._discarding = True
+
+        return messages
+
+    def get_buffered_len(self) -> int:
+        """Returns the number of bytes of incomplete messages currently buffered"""
+        return len(self._buffer)
+
+
+def encode_binary_socket_message(message: bytes) -> bytes:
+    """Formats a binary message to be sent over a socket"""
+    return bytes([BINARY_MESSAGE_MARKER]) + len(message).to_bytes(_binary_length_bytes, "big") + message
@@ -1,6 +1,8 @@
 import socket
+from typing import Optional
+
 from network.network_server import NetworkServer
-from network.socket_server_client import _socket_timeout, SocketServerClient
+from network.socket_server_client import _socket_timeout, SocketServerClient, SOCKET_SPLIT_PART_SIZE
 
 _socket_server_max_clients = 10
 
@@ -15,15 +17,18 @@ class SocketServer(NetworkServer):
     _server_socket: socket.socket
     _port: int
     _host: str
+    _ping_interval: Optional[float]
 
-    def __init__(self, own_name: str, port: int):
+    def __init__(self, own_name: str, port: int, ping_interval: Optional[float] = None):
         super().__init__(own_name)
         self._port = port
+        self._ping_interval = ping_interval
         self._host = socket.gethostname()
 
         self._start_server()
 
-        self._thread_manager.add_thread("socket_server_accept", self._accept_new_clients)
+        self._thread_manager.add_thread("socket_server_accept", self._accept_new_clients,
+                                        wake_method=self._stop_accepting)
         self._thread_manager.start_threads()
 
     def __del__(self):
@@ -31,6 +36,9 @@ class SocketServer(NetworkServer):
         self._thread_manager.__del__()
         self._server_socket.close()
 
+    def _get_split_part_size(self) -> int:
+        return SOCKET_SPLIT_PART_SIZE
+
     def _start_server(self):
         self._logger.info(f"SocketServer is binding to {self._host} @ {self._port}")
         self._server_socket = socket.socket()
@@ -44,12 +52,21 @@ class SocketServer(NetworkServer):
         self._server_socket.listen(_socket_server_max_clients)
         self._logger.info("SocketServer is listening for clients...")
 
+    def _stop_accepting(self):
+        try:
+            self._server_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
     def _accept_new_clients(self):
         try:
             new_client, address = self._server_socket.accept()  # accept new connection
             if new_client:
                 new_client.settimeout(_socket_timeout)
-                client = SocketServerClient(self._hostname, str(address), new_client)
+                client = SocketServerClient(self._hostname, str(address), new_client, self._ping_interval)
                 self._add_client(client)
         except socket.timeout:
             pass
+        except OSError:
+            # Socket was shut down
+            pass
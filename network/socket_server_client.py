@@ -1,88 +1,202 @@
 import json
+import logging
 import socket
-from typing import Optional
+import threading
+from collections import deque
+from typing import Optional, Union
 
 from jsonschema import ValidationError
 
+from json_validator import Validator
 from network.network_connector import req_validation_scheme_name
+from network.connection_monitor import ConnectionMonitor
 from network.request import Request
+from network.request_codec import RequestCodec, CodecNegotiator, RequestDecodeException, JSON_CODEC, \
+    encode_binary_message, decode_binary_message
 from network.network_server import NetworkServerClient
+from network.socket_message_buffer import SocketMessageBuffer, SOCKET_MESSAGE_DELIMITER, encode_binary_socket_message
 
 
 _socket_timeout = 1
-_socket_receive_len = 3000
+_socket_receive_len = 65536
 _socket_request_scheme = "socket_request_structure"
 
+# Length of the parts split requests are divided into, sockets have no practical limit on the message size
+SOCKET_SPLIT_PART_SIZE = 8192
+
+# Control messages used to check whether a connection is still alive, answered directly and never published
+SOCKET_PING_MESSAGE = "PING"
+SOCKET_PONG_MESSAGE = "PONG"
+
+
+def encode_socket_request(req: Request, codec: RequestCodec = JSON_CODEC) -> bytes:
+    """Formats a request to be sent over a socket using the given codec, including the framing of the message"""
+    req_obj = {"path": req.get_path(), "body": req.get_body()}
+    if codec is JSON_CODEC:
+        return json.dumps(req_obj).encode() + SOCKET_MESSAGE_DELIMITER
+    return encode_binary_socket_message(encode_binary_message(req_obj, codec))
+
+
+def is_socket_control_message(message: Union[str, bytes]) -> bool:
+    """Checks whether a received message is used to manage the connection rather than being a request"""
+    if not isinstance(message, str):
+        return False
+    return message in (SOCKET_PING_MESSAGE, SOCKET_PONG_MESSAGE) or CodecNegotiator.is_control_message(message)
+
+
+def answer_socket_control_message(message: str, negotiator: CodecNegotiator) -> Optional[str]:
+    """Handles a received control message and returns the message to answer it with, if any"""
+    if message == SOCKET_PING_MESSAGE:
+        return SOCKET_PONG_MESSAGE
+    if message == SOCKET_PONG_MESSAGE:
+        return None
+    return negotiator.handle_control_message(message)
+
+
+def parse_socket_message(message: Union[str, bytes], validator: Validator,
+                         logger: logging.Logger) -> Optional[Request]:
+    """Creates a request from a single message received over a socket, returns None if that is not possible"""
+    if isinstance(message, bytes):
+        try:
+            buf_json = decode_binary_message(message)
+        except RequestDecodeException as err:
+            logger.info(f"Could not decode binary message: {err}")
+            return None
+    else:
+        try:
+            buf_json = json.loads(message)
+        except json.decoder.JSONDecodeError:
+            logger.info(f"Could not decode JSON: '{message}'")
+            return None
+
+    try:
+        return decode_socket_request(buf_json, validator)
+    except ValidationError:
+        logger.info(f"Received JSON is no valid Socket Request: '{message}'")
+        return None
+
+
+def decode_socket_request(buf_json: dict, validator: Validator) -> Request:
+    """
+    Creates a request from a json object received over a socket
+    :param buf_json: The received json object
+    :param validator: Validator to check the object with
+    :return: The request
+    :raises ValidationError: If the object is no valid socket request
+    """
+    validator.validate(buf_json, _socket_request_scheme)
+    req_body = buf_json['body']
+    validator.validate(req_body, req_validation_scheme_name)
+
+    return Request(buf_json["path"],
+                   req_body["session_id"],
+                   req_body["sender"],
+                   req_body["receiver"],
+                   req_body["payload"],
+                   connection_type=f"Socket")
+
 
 class SocketServerClient(NetworkServerClient):
 
     _socket_client: socket.socket
-
-    def __init__(self, host_name: str, address: str, client: socket.socket):
+    _message_buffer: SocketMessageBuffer
+    _received_requests: deque
+    _monitor: ConnectionMonitor
+    _codec_negotiator: CodecNegotiator
+    _send_lock: threading.Lock
+
+    def __init__(self, host_name: str, address: str, client: socket.socket, ping_interval: Optional[float] = None):
+        """
+        Constructor for the SocketServerClient
+        :param host_name: Name of the host the client is connected to
+        :param address: Address of the connected client
+        :param client: The connected socket
+        :param ping_interval: Seconds without received data after which the peer is pinged. No pings are sent
+        if 'None', the connection is then only considered lost when the socket is closed or breaks.
+        """
         super().__init__(host_name, address)
         self._socket_client = client
+        self._message_buffer = SocketMessageBuffer()
+        self._received_requests = deque()
+        self._monitor = ConnectionMonitor(ping_interval)
+        self._codec_negotiator = CodecNegotiator()
+        self._send_lock = threading.Lock()
         self._thread_manager.start_threads()
 
     def __del__(self):
         super().__del__()
         self._socket_client.close()
 
+    def _connection_lost(self):
+        self._monitor.report_closed()
+        # Nothing can be received anymore, there is no need to keep calling recv()
+        self._thread_manager.get_thread("receive_thread").stop()
+
     def _receive(self) -> Optional[Request]:
+        # A single read may have completed several requests, those are handed out first
+        if self._received_requests:
+            return self._received_requests.popleft()
+
         try:
-            buf_rec_data = self._socket_client.recv(_socket_receive_len).decode()
+            buf_rec_data = self._socket_client.recv(_socket_receive_len)
         except socket.timeout:
+            if self._monitor.ping_due():
+                self._send_raw(SOCKET_PING_MESSAGE)
             return None
-        except (ConnectionResetError, BrokenPipeError):
+        except OSError:
+            self._connection_lost()
             return None
 
         if not buf_rec_data:
+            self._connection_lost()
             return None
 
-        try:
-            buf_json = json.loads(buf_rec_data)
-        except json.decoder.JSONDecodeError:
-            self._logger.info(f"Could not decode JSON: '{buf_rec_data}'")
-            return None
+        self._monitor.report_activity()
 
-        try:
-            self._validator.validate(buf_json, _socket_request_scheme)
-        except ValidationError:
-            self._logger.info(f"Received JSON is no valid Socket Request: '{buf_rec_data}'")
-            return None
+        for message in self._message_buffer.add_data(buf_rec_data):
+            if is_socket_control_message(message):
+                answer = answer_socket_control_message(message, self._codec_negotiator)
+                if answer:
+                    self._send_raw(answer)
+                continue
+            buf_req = parse_socket_message(message, self._validator, self._logger)
+            if buf_req:
+                self._received_requests.append(buf_req)
 
-        req_body = buf_json['body']
+        if self._received_requests:
+            return self._received_requests.popleft()
+        return None
 
+    def _send_raw(self, message: str):
         try:
-            self._validator.validate(req_body, req_validation_scheme_name)
-        except ValidationError:
-            self._logger.info(f"Received JSON is no valid Request: '{req_body}'")
-            return None
-
-        buf_req = Request(buf_json["path"],
-                          req_body["session_id"],
-                          req_body["sender"],
-                          req_body["receiver"],
-                          req_body["payload"],
-                          connection_type=f"Socket")
-
-        return buf_req
-
-    @staticmethod
-    def _format_request(req: Request) -> str:
-        req_obj = {"path": req.get_path(), "body": req.get_body()}
-        req_str = json.dumps(req_obj)
-        return req_str
+            with self._send_lock:
+                self._socket_client.sendall(message.encode() + SOCKET_MESSAGE_DELIMITER)
+        except OSError:
+            self._monitor.report_closed()
 
     def _send(self, req: Request):
         try:
-            req_str = self._format_request(req)
-            self._socket_client.sendall(req_str.encode())
-        except (ConnectionResetError, BrokenPipeError):
-            return None
+            with self._send_lock:
+                self._socket_client.sendall(encode_socket_request(req, self._codec_negotiator.get_codec()))
+        except OSError:
+            self._monitor.report_closed()
+
+    def offer_codecs(self, codec_names: list[str]):
+        """
+        Asks the peer to switch to one of the codecs for sending requests. Requests are sent as json until the
+        peer accepts, and stay json if it does not understand the offer.
+        :param codec_names: Names of the codecs to offer, the preferred one first
+        """
+        self._send_raw(CodecNegotiator.create_offer(codec_names))
+
+    def get_codec(self) -> RequestCodec:
+        return self._codec_negotiator.get_codec()
+
+    def _stop_receiving(self):
+        try:
+            self._socket_client.shutdown(socket.SHUT_RD)
+        except OSError:
+            pass
 
     def is_connected(self) -> bool:
-        try:
-            self._socket_client.send(".".encode())
-            return True
-        except (ConnectionResetError, BrokenPipeError):
-            return False
+        return self._monitor.is_alive()
@@ -1,18 +1,75 @@
 import json
 import logging
+import time
+from collections import OrderedDict
 from typing import Optional
 
 from network.request import Request
 
+# Time in seconds an incomplete split request is kept after its first part was received
+_default_session_ttl = 30
+
+# Maximum number of payload bytes buffered for all incomplete split requests together
+_default_max_buffered_bytes = 1024 * 1024
+
+# Set in the payload of parts the sender wants to have acknowledged
+SPLIT_ACK_REQUEST_KEY = "ack_requested"
+# Contains the index of the acknowledged part in the payload of acknowledgements
+SPLIT_ACK_KEY = "split_ack"
+# Set to False in the first part by senders that do not replace quotes with '$*$'
+SPLIT_ESCAPED_KEY = "escaped"
+
+
+class _SplitSession:
+    """Parts of a single split request received so far"""
+
+    start_req: Request
+    part_count: Optional[int]
+    parts: dict[int, str]
+    buffered_bytes: int
+    created: float
+
+    def __init__(self, start_req: Request, created: float):
+        self.start_req = start_req
+        self.part_count = None
+        self.parts = {}
+        self.buffered_bytes = 0
+        self.created = created
+
+    def is_complete(self) -> bool:
+        return self.part_count is not None and len(self.parts) == self.part_count
+
 
 class SplitRequestHandler:
+    """
+    Reassembles requests that were split into several parts.
+
+    Parts may arrive in any order, the request is completed by whichever part arrives last. Parts that ask for it
+    are acknowledged, as long as their request is not complete yet. Incomplete requests are dropped after a timeout,
+    and the oldest ones are dropped early if the parts of all incomplete requests together exceed the byte budget.
+    """
+
     _logger: logging.Logger
-    _part_data: dict
+    _sessions: OrderedDict
+    _session_ttl: float
+    _max_buffered_bytes: int
+    _buffered_bytes: int
+    _metrics: dict[str, int]
 
-    def __init__(self):
+    def __init__(self, session_ttl: float = _default_session_ttl,
+                 max_buffered_bytes: int = _default_max_buffered_bytes):
         super().__init__()
         self._logger = logging.getLogger(self.__class__.__name__)
-        self._part_data = {}
+        # Sessions in the order they were created, so the oldest ones can be evicted first
+        self._sessions = OrderedDict()
+        self._session_ttl = session_ttl
+        self._max_buffered_bytes = max_buffered_bytes
+        self._buffered_bytes = 0
+        self._metrics = {"completed": 0,
+                         "evicted_timeout": 0,
+                         "evicted_budget": 0,
+                         "dropped_parts": 0,
+                         "invalid_payloads": 0}
 
     def handle(self, req: Request) -> Optional[Request]:
         req_payload = req.get_payload()
@@ -21,51 +78,126 @@ class SplitRequestHandler:
         else:
             return req
 
+    def get_metrics(self) -> dict[str, int]:
+        """Returns counters about the handled split requests along with the current buffer usage"""
+        metrics = dict(self._metrics)
+        metrics["pending"] = len(self._sessions)
+        metrics["buffered_bytes"] = self._buffered_bytes
+        return metrics
+
+    def evict_expired(self):
+        """Drops all incomplete split requests that timed out"""
+        deadline = time.monotonic() - self._session_ttl
+        while self._sessions:
+            session_key, session = next(iter(self._sessions.items()))
+            if session.created > deadline:
+                return
+            self._logger.info(f"Split request {session_key[1]} from '{session_key[0]}' timed out incomplete")
+            self._remove_session(session_key)
+            self._metrics["evicted_timeout"] += 1
+
+    def _remove_session(self, session_key: tuple):
+        session: _SplitSession = self._sessions.pop(session_key)
+        self._buffered_bytes -= session.buffered_bytes
+
+    def _drop_part(self, session: _SplitSession, index: int):
+        part_len = len(session.parts.pop(index))
+        session.buffered_bytes -= part_len
+        self._buffered_bytes -= part_len
+        self._metrics["dropped_parts"] += 1
+
+    def _make_room(self, part_len: int) -> bool:
+        """Evicts the oldest incomplete requests until the part fits into the budget, returns whether it fits"""
+        if part_len > self._max_buffered_bytes:
+            return False
+        while self._buffered_bytes + part_len > self._max_buffered_bytes:
+            session_key = next(iter(self._sessions))
+            self._logger.warning(f"Split request {session_key[1]} from '{session_key[0]}' exceeds the buffer, "
+                                 f"dropping it")
+            self._remove_session(session_key)
+            self._metrics["evicted_budget"] += 1
+        return True
+
     def _handle_split_request(self, received_request: Request) -> Optional[Request]:
+        self.evict_expired()
+
         req_payload = received_request.get_payload()
-        id_str = str(received_request.get_session_id())
+        session_key = (received_request.get_sender(), received_request.get_session_id())
         p_index = req_payload["package_index"]
         split_payload = req_payload["split_payload"]
+
+        if not isinstance(p_index, int) or p_index < 0 or not isinstance(split_payload, str):
+            self._logger.error("Received split request part with illegal index or payload")
+            self._metrics["dropped_parts"] += 1
+            return None
+
+        session: Optional[_SplitSession] = self._sessions.get(session_key)
+        if session is None:
+            session = _SplitSession(received_request, time.monotonic())
+            self._sessions[session_key] = session
+
         if p_index == 0:
-            if "last_index" in req_payload:
-                l_index = req_payload["last_index"]
-                buf_json = {"start_req": received_request, "last_index": l_index, "payload_bits": []}
-                for i in range(l_index + 1):
-                    buf_json["payload_bits"].append(None)
-                buf_json["payload_bits"][0] = split_payload
-                self._part_data[id_str] = buf_json
-            else:
+            if "last_index" not in req_payload or not isinstance(req_payload["last_index"], int):
                 self._logger.error("Received first block of split request without last_index")
-        else:
-            if id_str in self._part_data:
-                req_data = self._part_data[id_str]
-                req_data["payload_bits"][p_index] = split_payload
-                if p_index >= req_data["last_index"] - 1:
-                    # TODO: Split requests should be recognized whether the last package is received last or not
-                    end_data = ""
-                    for str_data in req_data["payload_bits"]:
-                        if str_data is None:
-                            self._logger.error("Detected missing data block in split request")
-                            break
-                        end_data += str_data
-                    try:
-                        end_data = end_data.replace("$*$", '"')
-                        json_data = json.loads(end_data)
-                        first_req: Request = req_data["start_req"]
-
-                        out_req = Request(first_req.get_path(),
-                                          first_req.get_session_id(),
-                                          first_req.get_sender(),
-                                          first_req.get_receiver(),
-                                          json_data)
-
-                        out_req.set_callback_method(first_req.get_callback())
-                        del self._part_data[id_str]
-                        return out_req
-
-                    except json.decoder.JSONDecodeError:
-                        self._logger.error("Received illegal payload")
-
-            else:
-                self._logger.error("Received a followup-block with no entry in storage")
-        return None
+                self._remove_session(session_key)
+                self._metrics["dropped_parts"] += 1
+                return None
+            # 'last_index' holds the number of parts, older senders send 0 for requests consisting of a single part
+            session.part_count = max(req_payload["last_index"], 1)
+            session.start_req = received_request
+            for index in [index for index in session.parts if index >= session.part_count]:
+                self._logger.warning(f"Dropping out of range part {index} of split request")
+                self._drop_part(session, index)
+
+        if p_index in session.parts or (session.part_count is not None and p_index >= session.part_count):
+            self._logger.warning(f"Dropping duplicate or out of range part {p_index} of split request")
+            self._metrics["dropped_parts"] += 1
+            return self._complete_session(session_key, session)
+
+        part_len = len(split_payload)
+        if not self._make_room(part_len):
+            self._logger.error(f"Part {p_index} of split request is bigger than the whole buffer, dropping it")
+            self._metrics["dropped_parts"] += 1
+            if session_key in self._sessions:
+                self._remove_session(session_key)
+            return None
+        if session_key not in self._sessions:
+            # Evicted to make room for its own part
+            return None
+
+        session.parts[p_index] = split_payload
+        session.buffered_bytes += part_len
+        self._buffered_bytes += part_len
+
+        out_req = self._complete_session(session_key, session)
+        if out_req is None and req_payload.get(SPLIT_ACK_REQUEST_KEY) and received_request.get_callback():
+            received_request.respond({"ack": True, SPLIT_ACK_KEY: p_index})
+        return out_req
+
+    def _complete_session(self, session_key: tuple, session: _SplitSession) -> Optional[Request]:
+        """Assembles the request if all of its parts were received"""
+        if not session.is_complete():
+            return None
+        self._remove_session(session_key)
+
+        end_data = "".join([session.parts[i] for i in range(session.part_count)])
+        if session.start_req.get_payload().get(SPLIT_ESCAPED_KEY, True):
+            # Older senders replace all quotes to be able to send the payload as a string
+            end_data = end_data.replace("$*$", '"')
+        try:
+            json_data = json.loads(end_data)
+        except json.decoder.JSONDecodeError:
+            self._logger.error("Received illegal payload")
+            self._metrics["invalid_payloads"] += 1
+            return None
+
+        first_req = session.start_req
+        out_req = Request(first_req.get_path(),
+                          first_req.get_session_id(),
+                          first_req.get_sender(),
+                          first_req.get_receiver(),
+                          json_data)
+
+        out_req.set_callback_method(first_req.get_callback())
+        self._metrics["completed"] += 1
+        return out_req
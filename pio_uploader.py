@@ -22,6 +22,47 @@ _ram_usage_code = 14
 
 PioCallbackFunction = Optional[Callable[[int, str], None]]
 
+# Patterns for the lines of the 'pio run' output that are reported, stored by the keyword they start with, along with
+# whether they only match at the start of a line. The name of the outermost group names the kind of line.
+_line_patterns: dict[str, tuple[re.Pattern, bool]] = {
+    "Linking": (re.compile(r"(?P<link>Linking .pio/build/[a-zA-Z0-9]+?/firmware.elf)"), False),
+    "A fatal error occurred": (re.compile(r"(?P<connecting_error>A fatal error occurred: \.+? "
+                                          r"Timed out waiting for packet header)"), False),
+    "Serial port": (re.compile(r"(?P<connecting>Serial port .+?)"), False),
+    "Compiling": (re.compile(r"Compiling .pio/build/\w+?/(?:(?P<compile_src>src/.+?.cpp.o)|"
+                             r"(?P<compile_framework>FrameworkArduino/.+?.cpp.o)|"
+                             r"(?P<compile_lib>lib[0-9]+/.+?.o))"), False),
+    "Writing at": (re.compile(r"(?P<writing>Writing at (?P<writing_address>0x[0-9a-f]+)\.+? "
+                              r"\((?P<writing_percentage>[0-9]+?) %\))"), True),
+    "RAM:": (re.compile(r"(?P<ram>RAM:.+?(?P<ram_usage>[0-9\.]+?)%)"), True),
+    "Flash:": (re.compile(r"(?P<flash>Flash:.+?(?P<flash_usage>[0-9\.]+?)%)"), True)
+}
+
+# Finds the keywords of all patterns in a single pass
+_keyword_pattern = re.compile("|".join(re.escape(keyword) for keyword in _line_patterns))
+
+
+def _classify_line(line: str) -> (Optional[str], Optional[re.Match]):
+    """
+    Finds the pattern matching a line of the 'pio run' output.
+
+    Patterns are only tried where their keyword occurs, if several patterns match, the one matching first in the line
+    is used.
+    :param line: Line to classify
+    :return: Kind of the line and the match of its pattern, None and None if no pattern matches
+    """
+    # Most lines contain none of the keywords, plain substring checks reject them faster than any regex
+    if not any(keyword in line for keyword in _line_patterns):
+        return None, None
+    for keyword_match in _keyword_pattern.finditer(line):
+        pattern, at_line_start = _line_patterns[keyword_match.group()]
+        if at_line_start and keyword_match.start() != 0:
+            continue
+        line_match = pattern.match(line, keyword_match.start())
+        if line_match:
+            return line_match.lastgroup, line_match
+    return None, None
+
 
 class PioNoProjectFoundException(Exception):
     def __init__(self, path):
@@ -55,59 +96,43 @@ class PioUploader:
             self._output_callback(code, message)
 
     def _analyze_line(self, line: str):
-        # Patterns
-        link_pattern = "Linking .pio/build/[a-zA-Z0-9]+?/firmware.elf"
-        ram_pattern = "RAM:.+?([0-9\\.]+?)%"
-        flash_pattern = "Flash:.+?([0-9\\.]+?)%"
-        connecting_pattern = "Serial port .+?"
-        connecting_error_pattern = r"A fatal error occurred: \.+? Timed out waiting for packet header"
-        writing_pattern = r"Writing at (0x[0-9a-f]+)\.+? \(([0-9]+?) %\)"
-        compile_src_pattern = r"Compiling .pio/build/\w+?/src/.+?.cpp.o"
-        compile_framework_pattern = r"Compiling .pio/build/\w+?/FrameworkArduino/.+?.cpp.o"
-        compile_lib_pattern = r"Compiling .pio/build/\w+?/lib[0-9]+/.+?.o"
-
-        if re.findall(link_pattern, line):
+        kind, line_match = _classify_line(line)
+
+        if kind == "link":
             self._callback(_linking_code, "Linking...")
 
-        elif re.findall(connecting_error_pattern, line):
+        elif kind == "connecting_error":
             self._callback(_connecting_error_code, "Error connecting to Chip.")
 
-        elif re.findall(connecting_pattern, line):
+        elif kind == "connecting":
             self._callback(_connecting_ok_code, "Connecting to Chip...")
 
-        elif re.findall(compile_src_pattern, line):
+        elif kind == "compile_src":
             if self._compile_src_unsent:
                 self._callback(_compiling_src_code, "Compiling Source")
                 self._compile_src_unsent = False
 
-        elif re.findall(compile_framework_pattern, line):
+        elif kind == "compile_framework":
             if self._compile_framework_unsent:
                 self._callback(_compiling_framework_code, "Compiling Framework")
                 self._compile_framework_unsent = False
 
-        elif re.findall(compile_lib_pattern, line):
+        elif kind == "compile_lib":
             if self._compile_lib_unsent:
                 self._callback(_compiling_lib_code, "Compiling Libraries")
                 self._compile_lib_unsent = False
 
-        else:
-
-            writing_group = re.match(writing_pattern, line)
-            if writing_group:
-                writing_address = int(writing_group.groups()[0], 16)
-                percentage = writing_group.groups()[1]
-                if writing_address >= 65536:
-                    self._callback(_writing_fw_code, f"Writing Firmware: {percentage}%")
+        elif kind == "writing":
+            writing_address = int(line_match.group("writing_address"), 16)
+            percentage = line_match.group("writing_percentage")
+            if writing_address >= 65536:
+                self._callback(_writing_fw_code, f"Writing Firmware: {percentage}%")
 
-            ram_groups = re.match(ram_pattern, line)
-            if ram_groups:
-                ram = ram_groups.groups()[0]
-                self._callback(_ram_usage_code, f"RAM usage: {ram}%")
+        elif kind == "ram":
+            self._callback(_ram_usage_code, f"RAM usage: {line_match.group('ram_usage')}%")
 
-            flash_groups = re.match(flash_pattern, line)
-            if flash_groups:
-                flash = flash_groups.groups()[0]
-                self._callback(_sw_upload_code, f"Flash usage: {flash}%")
+        elif kind == "flash":
+            self._callback(_sw_upload_code, f"Flash usage: {line_match.group('flash_usage')}%")
 
     def upload_software(self, port: str):
 
@@ -1,4 +1,6 @@
 """Module for the publisher/subscriber pattern metaclasses"""
+import threading
+import weakref
 from abc import abstractmethod, ABCMeta
 from network.request import Request
 
@@ -11,22 +13,37 @@ class Subscriber(metaclass=ABCMeta):
 
 
 class Publisher(metaclass=ABCMeta):
+    """Publisher only keeping weak references to its subscribers.
+    Subscribers that are not referenced anywhere else are removed automatically."""
 
-    __subscriber_clients: list
+    # Replaced as a whole on every change, so publishing can iterate it without holding the lock
+    __subscriber_clients: tuple
+    __subscriber_lock: threading.RLock
 
     def __init__(self):
-        self.__subscriber_clients = []
+        self.__subscriber_clients = ()
+        self.__subscriber_lock = threading.RLock()
+
+    def __remove_dead_reference(self, ref: weakref.ref):
+        with self.__subscriber_lock:
+            self.__subscriber_clients = tuple(x for x in self.__subscriber_clients if x is not ref)
+
+    def __get_subscribers(self) -> list[Subscriber]:
+        buf_subscribers = [ref() for ref in self.__subscriber_clients]
+        return [x for x in buf_subscribers if x is not None]
 
     def subscribe(self, client: Subscriber):
-        if client not in self.__subscriber_clients:
-            self.__subscriber_clients.append(client)
+        with self.__subscriber_lock:
+            if client not in self.__get_subscribers():
+                self.__subscriber_clients += (weakref.ref(client, self.__remove_dead_reference),)
 
     def unsubscribe(self, client: Subscriber):
-        self.__subscriber_clients.remove(client)
+        with self.__subscriber_lock:
+            self.__subscriber_clients = tuple(x for x in self.__subscriber_clients if x() is not client)
 
     def _publish(self, req: Request):
-        for subscriber in self.__subscriber_clients:
+        for subscriber in self.__get_subscribers():
             subscriber.receive(req)
 
     def get_client_number(self) -> int:
-        return len(self.__subscriber_clients)
+        return len(self.__get_subscribers())
@@ -1,10 +1,15 @@
 from typing import Optional
 import os
+import shutil
+import time
 from datetime import datetime, timedelta
 
 
 _repo_lockfile_path = "repo.lock"
 
+# Time in seconds between two checks whether a locked repository was released
+_lock_poll_interval = 0.01
+
 
 class RepositoryAccessTimeout(Exception):
     def __init__(self, timeout: int):
@@ -35,27 +40,49 @@ class RepoLocker:
     def has_lock(self):
         return self._has_repo_locked
 
-    def _write_repository_lock(self):
+    def _write_repository_lock(self) -> bool:
+        """Creates the lock file if it does not exist yet, returns whether the repository is locked by this locker"""
         if not self._has_repo_locked:
-            with open(os.path.join(self._repo_path, _repo_lockfile_path), 'w') as f:
-                f.write('This is a lock file created by the chip flasher.\n'
-                        'If you have any problems with the chip flasher module, '
-                        'shut down all sunning instances and delete this file.')
+            try:
+                # Exclusive creation, so only one of several lockers waiting for the same repository gets the lock
+                with open(os.path.join(self._repo_path, _repo_lockfile_path), 'x') as f:
+                    f.write('This is a lock file created by the chip flasher.\n'
+                            'If you have any problems with the chip flasher module, '
+                            'shut down all sunning instances and delete this file.')
+            except FileExistsError:
+                return False
             self._has_repo_locked = True
+        return True
 
     def _release_repository_lock(self):
         if self._has_repo_locked:
             self._has_repo_locked = False
             os.remove(os.path.join(self._repo_path, _repo_lockfile_path))
 
-    def _wait_for_repository(self):
-        """Waits for the cloned repository to be available (not used by any other process)"""
-        start_time = datetime.now()
+    def _wait_for_repository(self, deadline: Optional[datetime]):
+        """Waits for the cloned repository to be available (not used by any other process) until the deadline"""
         while os.path.isfile(os.path.join(self._repo_path, _repo_lockfile_path)):
-            if self._max_delay is not None:
-                if start_time + timedelta(seconds=self._max_delay) < datetime.now():
-                    raise RepositoryAccessTimeout(self._max_delay)
+            if deadline is not None and deadline < datetime.now():
+                raise RepositoryAccessTimeout(self._max_delay)
+            time.sleep(_lock_poll_interval)
 
     def lock_repository(self):
-        self._wait_for_repository()
-        self._write_repository_lock()
+        # Losing the race for the lock file does not extend the time waited in total
+        deadline = None
+        if self._max_delay is not None:
+            deadline = datetime.now() + timedelta(seconds=self._max_delay)
+        self._wait_for_repository(deadline)
+        while not self._write_repository_lock():
+            self._wait_for_repository(deadline)
+
+    def clear_repository(self):
+        """Deletes everything in the locked repository folder except the lock file"""
+        if not self._has_repo_locked:
+            return
+        for entry in os.scandir(self._repo_path):
+            if entry.name == _repo_lockfile_path:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
@@ -0,0 +1,193 @@
+"""Module to contain the RepositoryCache, providing worktrees of a shared mirror of a remote repository"""
+import contextlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+from typing import Optional, Iterator
+
+from repo_locker import RepoLocker
+from repository_manager import RepositoryCloneException, RepositoryFetchException, RepositoryCheckoutException
+
+# Minimum time in seconds between two fetches from the remote repository
+DEFAULT_FETCH_INTERVAL = 60
+
+# File in the mirror whose modification time is the time of the last fetch
+_fetch_marker_file = "last_fetch"
+
+
+def _get_worktree_name(branch: str) -> str:
+    """Returns a folder name for the worktree of a branch"""
+    return re.sub(r"[^a-zA-Z0-9._-]", "_", branch)
+
+
+class RepositoryCache:
+    """
+    Keeps a bare mirror of a remote repository along with a worktree for every branch checked out from it.
+
+    Worktrees of different branches can be used in parallel, and files created in a worktree, like build outputs,
+    are kept until the branch is checked out the next time. The mirror is only locked while it is fetched or a
+    worktree is created, every worktree is locked while it is used.
+    """
+
+    _base_path: str
+    _repo_name: str
+    _remote_url: str
+    _mirror_path: str
+    _worktree_base_path: str
+    _fetch_interval: float
+    _max_delay: Optional[int]
+    _logger: logging.Logger
+
+    def __init__(self, base_path: str, repository_name: str, remote_url: str,
+                 fetch_interval: float = DEFAULT_FETCH_INTERVAL, max_delay: Optional[int] = None):
+        """
+        Constructor for the RepositoryCache
+
+        :param base_path: Path the mirror and the worktrees are created in
+        :param repository_name: Name of the repository, used for the folder names
+        :param remote_url: The url the repository is mirrored from
+        :param fetch_interval: Minimum time in seconds between two fetches from the remote repository
+        :param max_delay: Maximum time in seconds to wait for the mirror or a worktree used by another process
+        """
+        self._base_path = os.path.abspath(base_path)
+        self._repo_name = repository_name
+        self._remote_url = remote_url
+        self._mirror_path = os.path.join(self._base_path, f"{repository_name}.git")
+        self._worktree_base_path = os.path.join(self._base_path, f"{repository_name}_worktrees")
+        self._fetch_interval = fetch_interval
+        self._max_delay = max_delay
+        self._logger = logging.getLogger("RepositoryCache")
+
+    @staticmethod
+    def _exec_git_command(path: str, *args: str) -> bool:
+        """
+        Executes a git command in the selected folder.
+
+        :param path: The folder to execute the command in
+        :param args: Arguments passed to git
+        :return: True if return code of command is 0
+        """
+        return subprocess.run(["git", *args], cwd=path, stdout=subprocess.DEVNULL,
+                              stderr=subprocess.DEVNULL).returncode == 0
+
+    @staticmethod
+    def _read_git_output(path: str, *args: str) -> Optional[str]:
+        """Executes a git command in the selected folder and returns its output, or None if the command failed"""
+        result = subprocess.run(["git", *args], cwd=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode().strip()
+
+    def _lock_mirror(self) -> RepoLocker:
+        os.makedirs(self._base_path, exist_ok=True)
+        return RepoLocker(self._base_path, self._max_delay)
+
+    def _mirror_works(self) -> bool:
+        return os.path.isdir(self._mirror_path) and \
+            self._read_git_output(self._mirror_path, "rev-parse", "--is-bare-repository") == "true"
+
+    def _mark_fetched(self):
+        with open(os.path.join(self._mirror_path, _fetch_marker_file), "w"):
+            pass
+
+    def _get_worktree_paths(self) -> list[str]:
+        if not os.path.isdir(self._worktree_base_path):
+            return []
+        return [entry.path for entry in os.scandir(self._worktree_base_path) if entry.is_dir(follow_symlinks=False)]
+
+    def get_seconds_since_fetch(self) -> Optional[float]:
+        """Returns the time in seconds since the mirror was last fetched, None if it was never fetched"""
+        try:
+            return time.time() - os.path.getmtime(os.path.join(self._mirror_path, _fetch_marker_file))
+        except OSError:
+            return None
+
+    def init_mirror(self, force_reset: bool = False):
+        """
+        Clones the mirror if it does not exist or is broken.
+
+        :param force_reset: Whether the mirror and all worktrees should be deleted and the mirror cloned again
+        :raises RepositoryCloneException: When cloning the mirror fails
+        :raises RepositoryAccessTimeout: When a worktree is used for longer than the maximum delay
+        """
+        with self._lock_mirror(), contextlib.ExitStack() as worktree_locks:
+            if not force_reset and self._mirror_works():
+                return
+            # Worktrees cannot be used without the mirror they were created from. They are only cleared once they are
+            # no longer used, so no build loses its files, and checkouts waiting for them find them cleared.
+            for worktree_path in self._get_worktree_paths():
+                worktree_locks.enter_context(RepoLocker(worktree_path, self._max_delay)).clear_repository()
+            self._logger.info(f"Cloning mirror from '{self._remote_url}'")
+            shutil.rmtree(self._mirror_path, ignore_errors=True)
+            if not self._exec_git_command(self._base_path, "clone", "--mirror", "--quiet", self._remote_url,
+                                          self._mirror_path):
+                self._logger.error(f"Error cloning repository from '{self._remote_url}'")
+                raise RepositoryCloneException
+            self._mark_fetched()
+
+    def fetch(self, force: bool = False) -> bool:
+        """
+        Fetches all branches from the remote repository, if the last fetch is longer ago than the fetch interval.
+
+        :param force: Whether to fetch regardless of the time of the last fetch
+        :return: Whether the mirror was fetched
+        :raises RepositoryFetchException: When fetching fails for any reason
+        """
+        with self._lock_mirror():
+            seconds_since_fetch = self.get_seconds_since_fetch()
+            if not force and seconds_since_fetch is not None and seconds_since_fetch < self._fetch_interval:
+                self._logger.info(f"Skipping fetch, last fetch was {int(seconds_since_fetch)}s ago")
+                return False
+            self._logger.info("Fetching from remote...")
+            if not self._exec_git_command(self._mirror_path, "fetch", "--prune", "--quiet"):
+                self._logger.error("Fetching repository failed.")
+                raise RepositoryFetchException
+            self._mark_fetched()
+            return True
+
+    def get_commit_hash(self, branch: str) -> Optional[str]:
+        """Returns the commit hash a branch, tag or commit resolves to in the mirror, None if it does not exist"""
+        return self._read_git_output(self._mirror_path, "rev-parse", "--verify", "--quiet", f"{branch}^{{commit}}")
+
+    @contextlib.contextmanager
+    def checkout_worktree(self, branch: str) -> Iterator[str]:
+        """
+        Checks out the latest fetched commit of a branch in the worktree of the branch and locks the worktree.
+
+        Usage: 'with cache.checkout_worktree("master") as path:'
+        :param branch: Branch, tag or commit to check out
+        :return: Path of the worktree, locked until the context is left
+        :raises RepositoryCheckoutException: When the branch does not exist or checking it out fails
+        """
+        commit = self.get_commit_hash(branch)
+        if commit is None:
+            self._logger.error(f"'{branch}' does not exist in the mirror.")
+            raise RepositoryCheckoutException(branch)
+
+        worktree_path = os.path.join(self._worktree_base_path, _get_worktree_name(branch))
+        with self._lock_mirror():
+            if not os.path.isfile(os.path.join(worktree_path, ".git")):
+                self._logger.info(f"Creating worktree for '{branch}'")
+                shutil.rmtree(worktree_path, ignore_errors=True)
+                self._exec_git_command(self._mirror_path, "worktree", "prune")
+                if not self._exec_git_command(self._mirror_path, "worktree", "add", "--detach", "--force",
+                                              worktree_path, commit):
+                    self._logger.error(f"Failed to create worktree for '{branch}'.")
+                    raise RepositoryCheckoutException(branch)
+
+        with RepoLocker(worktree_path, self._max_delay):
+            # The mirror may have been reset while waiting for the worktree, which clears the worktree
+            if not os.path.isfile(os.path.join(worktree_path, ".git")):
+                self._logger.error(f"Worktree of '{branch}' was removed by a reset of the mirror.")
+                raise RepositoryCheckoutException(branch)
+            if self._read_git_output(worktree_path, "rev-parse", "HEAD") == commit:
+                self._logger.info(f"Worktree of '{branch}' is already at {commit}")
+            elif not self._exec_git_command(worktree_path, "checkout", "--detach", "--force", "--quiet", commit):
+                self._logger.error(f"Failed to check out '{branch}'.")
+                raise RepositoryCheckoutException(branch)
+            else:
+                self._logger.info(f"Checked out {commit} for '{branch}'")
+            yield worktree_path
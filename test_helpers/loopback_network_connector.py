@@ -0,0 +1,31 @@
+from network.network_connector import NetworkConnector
+from network.request import Request
+import threading
+
+RESPONDER_NAME = "loopback_responder"
+
+
+class LoopbackConnector(NetworkConnector):
+    """Connector answering every request it sends by itself, optionally with a delay"""
+
+    _response_count: int
+    _response_delay: float
+
+    def __init__(self, hostname: str, response_count: int = 1, response_delay: float = 0):
+        super().__init__(hostname)
+        self._response_count = response_count
+        self._response_delay = response_delay
+
+    def _respond(self, req: Request):
+        for i in range(self._response_count):
+            self.receive(Request(req.get_path(),
+                                 req.get_session_id(),
+                                 f"{RESPONDER_NAME}_{i}",
+                                 req.get_sender(),
+                                 req.get_payload()))
+
+    def _send_data(self, req: Request):
+        if self._response_delay:
+            threading.Timer(self._response_delay, self._respond, [req]).start()
+        else:
+            self._respond(req)
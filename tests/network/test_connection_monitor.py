@@ -0,0 +1,33 @@
+import time
+
+from network.connection_monitor import ConnectionMonitor
+
+PING_INTERVAL = 0.1
+
+
+def test_connection_monitor_without_ping():
+    monitor = ConnectionMonitor()
+    assert monitor.is_alive()
+    assert not monitor.ping_due()
+    monitor.report_closed()
+    assert monitor.is_closed()
+    assert not monitor.is_alive()
+
+
+def test_connection_monitor_ping():
+    monitor = ConnectionMonitor(PING_INTERVAL)
+    assert not monitor.ping_due()
+    time.sleep(PING_INTERVAL)
+    assert monitor.ping_due()
+    # Only one ping per interval
+    assert not monitor.ping_due()
+    assert monitor.is_alive()
+
+
+def test_connection_monitor_timeout():
+    monitor = ConnectionMonitor(PING_INTERVAL)
+    time.sleep(PING_INTERVAL * 3)
+    assert not monitor.is_alive()
+    monitor.report_activity()
+    assert monitor.is_alive()
+    assert not monitor.is_closed()
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from network.mqtt_message_filter import MQTTMessageFilter
+from network.request import Request
+
+TEST_HOST = "pytest_host"
+TEST_RECEIVER = "<pytest>"
+TEST_SENDER = "pytest_sender"
+TEST_PATH = "smarthome/test"
+
+
+def raw_body(sender, receiver, payload=None, separators=None) -> bytes:
+    return json.dumps({"session_id": 1, "sender": sender, "receiver": receiver, "payload": payload or {}},
+                      separators=separators).encode()
+
+
+@pytest.fixture
+def message_filter():
+    message_filter = MQTTMessageFilter(TEST_HOST, [TEST_RECEIVER], accept_broadcasts=False)
+    yield message_filter
+
+
+def test_mqtt_message_filter_header(message_filter: MQTTMessageFilter):
+    assert message_filter.check_header(raw_body(TEST_SENDER, TEST_HOST))
+    assert message_filter.check_header(raw_body(TEST_SENDER, TEST_RECEIVER, separators=(",", ":")))
+    assert not message_filter.check_header(raw_body(TEST_SENDER, "other_host"))
+    assert not message_filter.check_header(raw_body(TEST_SENDER, None))
+    assert not message_filter.check_header(raw_body(TEST_HOST, TEST_RECEIVER))
+
+
+def test_mqtt_message_filter_header_undecided(message_filter: MQTTMessageFilter):
+    # Keys appearing in the payload as well can only be checked after decoding
+    assert message_filter.check_header(raw_body(TEST_SENDER, "other_host", {"receiver": TEST_HOST}))
+    assert message_filter.check_header(raw_body(TEST_SENDER, 'other "host"'))
+    assert message_filter.check_header(str({"sender": TEST_SENDER, "receiver": "other_host"}).encode())
+
+
+def test_mqtt_message_filter_broadcasts():
+    message_filter = MQTTMessageFilter(TEST_HOST)
+    assert message_filter.check_header(raw_body(TEST_SENDER, None))
+    assert message_filter.accepts(Request(TEST_PATH, 1, TEST_SENDER, None, {}))
+    assert not message_filter.check_header(raw_body(TEST_SENDER, TEST_RECEIVER))
+
+
+def test_mqtt_message_filter_accepts(message_filter: MQTTMessageFilter):
+    assert message_filter.accepts(Request(TEST_PATH, 1, TEST_SENDER, TEST_HOST, {}))
+    assert message_filter.accepts(Request(TEST_PATH, 1, TEST_SENDER, TEST_RECEIVER, {}))
+    assert not message_filter.accepts(Request(TEST_PATH, 1, TEST_SENDER, "other_host", {}))
+    assert not message_filter.accepts(Request(TEST_PATH, 1, TEST_SENDER, None, {}))
+    assert not message_filter.accepts(Request(TEST_PATH, 1, TEST_HOST, TEST_RECEIVER, {}))
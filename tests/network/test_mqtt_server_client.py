@@ -0,0 +1,149 @@
+import json
+import threading
+
+import pytest
+
+from network.mqtt_message_filter import MQTTMessageFilter
+from network.mqtt_server_client import MQTTServerClient
+from network.request import Request
+from pubsub import Subscriber
+
+TEST_HOST = "pytest_host"
+TEST_PATH = "smarthome/test"
+TEST_SENDER = "pytest_sender"
+MAX_PENDING = 5
+RECEIVE_TIMEOUT = 2
+
+
+class FakeMessage:
+    topic: str
+    payload: bytes
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+class FakeMQTTClient:
+    """Stands in for a connected paho client, messages are received by calling on_message directly"""
+
+    def __init__(self):
+        self.on_message = None
+        self.on_connect = None
+        self.on_disconnect = None
+        self.published = []
+
+    def publish(self, topic: str, payload: str):
+        self.published.append((topic, payload))
+
+    def disconnect(self):
+        pass
+
+    def is_connected(self) -> bool:
+        return True
+
+    def receive(self, payload: bytes, topic: str = TEST_PATH):
+        self.on_message(self, None, FakeMessage(topic, payload))
+
+
+class CollectingSubscriber(Subscriber):
+    def __init__(self):
+        self.requests = []
+        self.received = threading.Event()
+
+    def receive(self, req: Request):
+        self.requests.append(req)
+        self.received.set()
+
+
+def request_payload(session_id: int, payload: dict) -> bytes:
+    return json.dumps({"session_id": session_id, "sender": TEST_SENDER, "receiver": None,
+                       "payload": payload}).encode()
+
+
+@pytest.fixture
+def mqtt_client():
+    client = FakeMQTTClient()
+    yield client
+
+
+@pytest.fixture
+def subscriber():
+    subscriber = CollectingSubscriber()
+    yield subscriber
+
+
+@pytest.fixture
+def server_client(mqtt_client, subscriber):
+    server_client = MQTTServerClient(TEST_HOST, "pytest_broker", mqtt_client, max_pending_messages=MAX_PENDING)
+    server_client.subscribe(subscriber)
+    yield server_client
+    server_client.__del__()
+
+
+def test_mqtt_server_client_receive(server_client: MQTTServerClient, mqtt_client: FakeMQTTClient,
+                                    subscriber: CollectingSubscriber):
+    mqtt_client.receive(request_payload(1, {"lorem": "ipsum"}))
+    assert subscriber.received.wait(RECEIVE_TIMEOUT)
+    req = subscriber.requests[0]
+    assert req.get_path() == TEST_PATH
+    assert req.get_session_id() == 1
+    assert req.get_sender() == TEST_SENDER
+    assert req.get_payload() == {"lorem": "ipsum"}
+
+    req.respond({"ack": True})
+    assert mqtt_client.published[0][0] == TEST_PATH
+    assert json.loads(mqtt_client.published[0][1])["receiver"] == TEST_SENDER
+
+
+def test_mqtt_server_client_legacy_payload(server_client: MQTTServerClient, mqtt_client: FakeMQTTClient,
+                                          subscriber: CollectingSubscriber):
+    legacy_body = {"session_id": 1, "sender": TEST_SENDER, "receiver": None, "payload": {"lorem": "ipsum"}}
+    mqtt_client.receive(str(legacy_body).encode())
+    assert subscriber.received.wait(RECEIVE_TIMEOUT)
+    assert subscriber.requests[0].get_payload() == {"lorem": "ipsum"}
+    assert subscriber.requests[0].get_receiver() is None
+
+
+def test_mqtt_server_client_invalid(server_client: MQTTServerClient, mqtt_client: FakeMQTTClient,
+                                   subscriber: CollectingSubscriber):
+    mqtt_client.receive(b"no json")
+    mqtt_client.receive(json.dumps({"session_id": 1, "payload": {}}).encode())
+    mqtt_client.receive(request_payload(2, {}))
+    assert subscriber.received.wait(RECEIVE_TIMEOUT)
+    assert [req.get_session_id() for req in subscriber.requests] == [2]
+    assert server_client.get_ingest_metrics()["invalid"] == 2
+
+
+def test_mqtt_server_client_overflow(mqtt_client: FakeMQTTClient, subscriber: CollectingSubscriber):
+    server_client = MQTTServerClient(TEST_HOST, "pytest_broker", mqtt_client, max_pending_messages=MAX_PENDING)
+    server_client.subscribe(subscriber)
+    # Keeps the receive thread from taking messages, so all of them stay pending
+    with server_client._pending_condition:
+        for session_id in range(MAX_PENDING * 2):
+            mqtt_client.receive(request_payload(session_id, {}))
+        metrics = server_client.get_ingest_metrics()
+    assert metrics["received"] == MAX_PENDING * 2
+    assert metrics["dropped_overflow"] == MAX_PENDING
+    assert metrics["pending"] == MAX_PENDING
+    server_client.__del__()
+
+
+def test_mqtt_server_client_filter(mqtt_client: FakeMQTTClient, subscriber: CollectingSubscriber):
+    server_client = MQTTServerClient(TEST_HOST, "pytest_broker", mqtt_client,
+                                     message_filter=MQTTMessageFilter(TEST_HOST, accept_broadcasts=False))
+    server_client.subscribe(subscriber)
+
+    def addressed_payload(session_id: int, receiver, payload: dict) -> bytes:
+        return json.dumps({"session_id": session_id, "sender": TEST_SENDER, "receiver": receiver,
+                           "payload": payload}).encode()
+
+    mqtt_client.receive(addressed_payload(1, "other_host", {}))
+    mqtt_client.receive(addressed_payload(2, None, {}))
+    # Only dropped after decoding, the header check cannot tell which receiver is the right one
+    mqtt_client.receive(addressed_payload(3, "other_host", {"receiver": TEST_HOST}))
+    mqtt_client.receive(addressed_payload(4, TEST_HOST, {}))
+    assert subscriber.received.wait(RECEIVE_TIMEOUT)
+    assert [req.get_session_id() for req in subscriber.requests] == [4]
+    assert server_client.get_ingest_metrics()["dropped_foreign"] == 3
+    server_client.__del__()
@@ -0,0 +1,46 @@
+import pytest
+
+from test_helpers.loopback_network_connector import LoopbackConnector
+
+TEST_PATH = "smarthome/test"
+TEST_SENDER_NAME = "pytest_sender"
+TEST_RESPONDER_NAME = "pytest_responder"
+TEST_PAYLOAD = {"lorem": "ipsum"}
+
+
+@pytest.fixture
+def connector():
+    connector = LoopbackConnector(TEST_SENDER_NAME)
+    yield connector
+    connector.__del__()
+
+
+def test_network_connector_immediate_response(connector: LoopbackConnector):
+    response = connector.send_request(TEST_PATH, TEST_RESPONDER_NAME, TEST_PAYLOAD, timeout=1)
+    assert response is not None
+    assert response.get_payload() == TEST_PAYLOAD
+    assert connector.get_pending_request_count() == 0
+
+
+def test_network_connector_delayed_response():
+    connector = LoopbackConnector(TEST_SENDER_NAME, response_delay=0.1)
+    response = connector.send_request(TEST_PATH, TEST_RESPONDER_NAME, TEST_PAYLOAD, timeout=2)
+    assert response is not None
+    assert response.get_payload() == TEST_PAYLOAD
+
+
+def test_network_connector_timeout():
+    connector = LoopbackConnector(TEST_SENDER_NAME, response_count=0)
+    response = connector.send_request(TEST_PATH, TEST_RESPONDER_NAME, TEST_PAYLOAD, timeout=1)
+    assert response is None
+    assert connector.get_pending_request_count() == 0
+
+
+def test_network_connector_broadcast():
+    connector = LoopbackConnector(TEST_SENDER_NAME, response_count=3, response_delay=0.1)
+    responses = connector.send_broadcast(TEST_PATH, TEST_PAYLOAD, timeout=1)
+    assert len(responses) == 3
+
+    responses = connector.send_broadcast(TEST_PATH, TEST_PAYLOAD, timeout=1, max_responses=2)
+    assert len(responses) == 2
+
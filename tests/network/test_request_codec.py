@@ -0,0 +1,61 @@
+import pytest
+
+from network.request_codec import MsgPackRequestCodec, CodecNegotiator, RequestDecodeException, JSON_CODEC, \
+    MSGPACK_CODEC, encode_binary_message, decode_binary_message
+
+
+@pytest.fixture
+def codec():
+    codec = MsgPackRequestCodec()
+    yield codec
+
+
+def test_request_codec_msgpack_roundtrip(codec: MsgPackRequestCodec):
+    obj = {"session_id": 4711,
+           "sender": "test_client",
+           "receiver": None,
+           "payload": {"flags": [True, False],
+                       "numbers": [0, 127, 128, -1, -33, 70000, -70000, 2 ** 40, 0.5],
+                       "text": "äöü" * 20,
+                       "many": list(range(20)),
+                       "long": "x" * 70000}}
+    assert codec.decode(codec.encode(obj)) == obj
+
+
+def test_request_codec_msgpack_format(codec: MsgPackRequestCodec):
+    # Has to stay compatible with other MessagePack implementations
+    assert codec.encode({"a": 1, "b": [None, True]}) == b"\x82\xa1a\x01\xa1b\x92\xc0\xc3"
+
+
+def test_request_codec_msgpack_invalid(codec: MsgPackRequestCodec):
+    with pytest.raises(RequestDecodeException):
+        codec.decode(b"\x82\xa1a")
+    with pytest.raises(RequestDecodeException):
+        codec.decode(b"\x01\x01")
+
+
+def test_request_codec_binary_message():
+    obj = {"path": "smarthome/test", "body": {"payload": {}}}
+    assert decode_binary_message(encode_binary_message(obj, MSGPACK_CODEC)) == obj
+    assert decode_binary_message(encode_binary_message(obj, JSON_CODEC)) == obj
+    with pytest.raises(RequestDecodeException):
+        decode_binary_message(b"\xff{}")
+
+
+def test_request_codec_negotiation():
+    offering = CodecNegotiator()
+    accepting = CodecNegotiator()
+    answer = accepting.handle_control_message(CodecNegotiator.create_offer(["cbor", "msgpack"]))
+    assert accepting.get_codec() is MSGPACK_CODEC
+    assert offering.get_codec() is JSON_CODEC
+    assert offering.handle_control_message(answer) is None
+    assert offering.get_codec() is MSGPACK_CODEC
+
+
+def test_request_codec_negotiation_fallback():
+    accepting = CodecNegotiator()
+    answer = accepting.handle_control_message(CodecNegotiator.create_offer(["cbor"]))
+    assert accepting.get_codec() is JSON_CODEC
+    offering = CodecNegotiator()
+    offering.handle_control_message(answer)
+    assert offering.get_codec() is JSON_CODEC
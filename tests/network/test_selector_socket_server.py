@@ -0,0 +1,120 @@
+import pytest
+import time
+
+from network.selector_socket_server import SelectorSocketServer
+from network.socket_connector import SocketConnector
+from network.echo_client import TestEchoClient
+from tests.network.connector_tests import send_test, send_split_test, broadcast_test,\
+    broadcast_single_response_test, test_payload_small, test_payload_big
+
+
+SERVER_PORT = 5781
+SERVER_IP = "localhost"
+
+SERVER_NAME = "pytest_selector_server"
+CLIENT_NAME = "pytest_selector_client"
+
+
+def dummy_fixture_usage():
+    """Used to artificially 'use' fixtures to prevent them from being auto-removed"""
+    s = test_payload_small()
+    b = test_payload_big()
+
+
+@pytest.fixture
+def server():
+    server = SelectorSocketServer(SERVER_NAME,
+                                  SERVER_PORT)
+    yield server
+    server.__del__()
+
+
+@pytest.fixture
+def client(server):
+    client = SocketConnector(CLIENT_NAME,
+                             SERVER_IP,
+                             SERVER_PORT)
+    yield client
+    client.__del__()
+
+
+@pytest.fixture
+def echo_client(client):
+    echo_client = TestEchoClient(client)
+    return echo_client
+
+
+@pytest.fixture
+def echo_server(server):
+    echo_server = TestEchoClient(server)
+    return echo_server
+
+
+@pytest.mark.network
+def test_selector_server_send(server: SelectorSocketServer, test_payload_big: dict, echo_client: TestEchoClient):
+    send_test(server, CLIENT_NAME, test_payload_big)
+
+
+@pytest.mark.network
+def test_selector_server_send_split_long(server: SelectorSocketServer, test_payload_big: dict,
+                                         echo_client: TestEchoClient):
+    send_split_test(server, CLIENT_NAME, test_payload_big)
+
+
+@pytest.mark.network
+def test_selector_server_send_broadcast(server: SelectorSocketServer, test_payload_small: dict,
+                                        echo_client: TestEchoClient):
+    broadcast_test(server, test_payload_small)
+
+
+@pytest.mark.network
+def test_selector_client_send(echo_server: TestEchoClient, test_payload_big: dict, client: SocketConnector):
+    send_test(client, SERVER_NAME, test_payload_big)
+
+
+@pytest.mark.network
+def test_selector_client_send_split_long(echo_server: TestEchoClient, test_payload_big: dict,
+                                         client: SocketConnector):
+    send_split_test(client, SERVER_NAME, test_payload_big)
+
+
+@pytest.mark.network
+def test_selector_client_send_broadcast_single_resp(echo_server: TestEchoClient, test_payload_small: dict,
+                                                    client: SocketConnector):
+    broadcast_single_response_test(client, test_payload_small)
+
+
+@pytest.mark.network
+def test_selector_server_client_count(server: SelectorSocketServer):
+    assert server.get_client_count() == 0
+    buf_client = SocketConnector(CLIENT_NAME,
+                                 SERVER_IP,
+                                 SERVER_PORT)
+    time.sleep(0.1)
+    assert server.get_client_count() == 1
+    buf_client.__del__()
+    time.sleep(1.5)
+    assert server.get_client_count() == 0
+
+
+@pytest.mark.network
+def test_selector_server_msgpack(server: SelectorSocketServer, test_payload_big: dict):
+    msgpack_client = SocketConnector(CLIENT_NAME,
+                                     SERVER_IP,
+                                     SERVER_PORT,
+                                     codecs=["msgpack"])
+    echo_client = TestEchoClient(msgpack_client)
+    echo_server = TestEchoClient(server)
+    time.sleep(0.1)
+    send_test(server, CLIENT_NAME, test_payload_big)
+    send_test(msgpack_client, SERVER_NAME, test_payload_big)
+    msgpack_client.__del__()
+
+
+@pytest.mark.network
+def test_selector_server_send_split_pipelined(server: SelectorSocketServer, test_payload_big: dict,
+                                              echo_client: TestEchoClient):
+    start = time.time()
+    send_split_test(server, CLIENT_NAME, test_payload_big, part_max_len=10)
+    # Parts are only delayed when the receiver does not acknowledge them
+    assert time.time() - start < 1
@@ -0,0 +1,74 @@
+import pytest
+
+from network.socket_message_buffer import SocketMessageBuffer, encode_binary_socket_message
+
+TEST_MESSAGE = '{"path": "smarthome/test", "body": {}}'
+MAX_MESSAGE_LEN = 100
+
+
+@pytest.fixture
+def buffer():
+    buffer = SocketMessageBuffer(MAX_MESSAGE_LEN)
+    yield buffer
+
+
+def test_socket_message_buffer_single(buffer: SocketMessageBuffer):
+    assert buffer.add_data(f"{TEST_MESSAGE}\n".encode()) == [TEST_MESSAGE]
+    assert buffer.get_buffered_len() == 0
+
+
+def test_socket_message_buffer_chunked(buffer: SocketMessageBuffer):
+    data = f"{TEST_MESSAGE}\n".encode()
+    messages = []
+    for i in range(len(data)):
+        messages += buffer.add_data(data[i:i + 1])
+    assert messages == [TEST_MESSAGE]
+
+
+def test_socket_message_buffer_pipelined(buffer: SocketMessageBuffer):
+    data = f"{TEST_MESSAGE}\n\n{TEST_MESSAGE}\n{TEST_MESSAGE[:10]}".encode()
+    assert buffer.add_data(data) == [TEST_MESSAGE, TEST_MESSAGE]
+    assert buffer.get_buffered_len() == 10
+    assert buffer.add_data(f"{TEST_MESSAGE[10:]}\n".encode()) == [TEST_MESSAGE]
+
+
+def test_socket_message_buffer_multibyte(buffer: SocketMessageBuffer):
+    data = "{\"lorem\": \"äöü\"}\n".encode()
+    messages = []
+    for i in range(len(data)):
+        messages += buffer.add_data(data[i:i + 1])
+    assert messages == ["{\"lorem\": \"äöü\"}"]
+
+
+def test_socket_message_buffer_oversized(buffer: SocketMessageBuffer):
+    assert buffer.add_data(b"x" * (MAX_MESSAGE_LEN + 1)) == []
+    assert buffer.get_buffered_len() == 0
+    # The rest of the oversized message is dropped as well
+    assert buffer.add_data(f"xxx\n{TEST_MESSAGE}\n".encode()) == [TEST_MESSAGE]
+
+
+def test_socket_message_buffer_binary(buffer: SocketMessageBuffer):
+    binary_message = b"\x81\xa1\n\x00"
+    data = encode_binary_socket_message(binary_message) + f"{TEST_MESSAGE}\n".encode()
+    messages = []
+    for i in range(len(data)):
+        messages += buffer.add_data(data[i:i + 1])
+    assert messages == [binary_message, TEST_MESSAGE]
+
+
+def test_socket_message_buffer_binary_oversized(buffer: SocketMessageBuffer):
+    assert buffer.add_data(encode_binary_socket_message(b"x" * (MAX_MESSAGE_LEN + 1))) == []
+    # Everything up to the next delimiter is dropped
+    assert buffer.add_data(f"xxx\n{TEST_MESSAGE}\n".encode()) == [TEST_MESSAGE]
+
+
+def test_socket_message_buffer_text_only():
+    buffer = SocketMessageBuffer(MAX_MESSAGE_LEN, binary_framing=False)
+    # Boot noise looking like the header of a binary message only costs the line it is part of
+    assert buffer.add_data(f"\x00\x00\x00\x00{{noise\n{TEST_MESSAGE}\n".encode()) == ["\x00\x00\x00\x00{noise",
+                                                                                       TEST_MESSAGE]
+    assert buffer.get_buffered_len() == 0
+
+    buffer.set_binary_framing(True)
+    binary_message = b"\x81\xa1\n\x00"
+    assert buffer.add_data(encode_binary_socket_message(binary_message)) == [binary_message]
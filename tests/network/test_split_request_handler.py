@@ -0,0 +1,128 @@
+import json
+import time
+
+import pytest
+
+from network.request import Request
+from network.split_request_handler import SplitRequestHandler
+
+TEST_PATH = "smarthome/test"
+TEST_SENDER = "pytest_sender"
+TEST_PAYLOAD = {"lorem": "ipsum dolor sit amet", "list": [1, 2, 3]}
+PART_LEN = 10
+SESSION_TTL = 0.1
+MAX_BUFFERED_BYTES = 100
+
+
+def split_request(payload: dict, session_id: int, sender: str = TEST_SENDER) -> list[Request]:
+    payload_str = json.dumps(payload).replace('"', "$*$")
+    parts = [payload_str[i:i + PART_LEN] for i in range(0, len(payload_str), PART_LEN)]
+    out_reqs = []
+    for index, part in enumerate(parts):
+        part_payload = {"package_index": index, "split_payload": part}
+        if index == 0:
+            part_payload["last_index"] = len(parts)
+        out_reqs.append(Request(TEST_PATH, session_id, sender, None, part_payload))
+    return out_reqs
+
+
+@pytest.fixture
+def handler():
+    handler = SplitRequestHandler(SESSION_TTL, MAX_BUFFERED_BYTES)
+    yield handler
+
+
+def test_split_request_handler_unsplit(handler: SplitRequestHandler):
+    req = Request(TEST_PATH, 1, TEST_SENDER, None, TEST_PAYLOAD)
+    assert handler.handle(req) is req
+
+
+def test_split_request_handler_in_order(handler: SplitRequestHandler):
+    parts = split_request(TEST_PAYLOAD, 1)
+    results = [handler.handle(part) for part in parts]
+    assert results[:-1] == [None] * (len(parts) - 1)
+    assert results[-1].get_payload() == TEST_PAYLOAD
+    assert results[-1].get_session_id() == 1
+    assert handler.get_metrics()["completed"] == 1
+    assert handler.get_metrics()["buffered_bytes"] == 0
+
+
+def test_split_request_handler_out_of_order(handler: SplitRequestHandler):
+    parts = split_request(TEST_PAYLOAD, 1)
+    reordered = parts[1:] + parts[:1]
+    reordered[0], reordered[1] = reordered[1], reordered[0]
+    results = [handler.handle(part) for part in reordered]
+    assert results[:-1] == [None] * (len(parts) - 1)
+    assert results[-1].get_payload() == TEST_PAYLOAD
+
+
+def test_split_request_handler_single_part(handler: SplitRequestHandler):
+    parts = split_request({}, 1)
+    assert len(parts) == 1
+    assert handler.handle(parts[0]).get_payload() == {}
+    assert handler.get_metrics()["pending"] == 0
+    assert handler.get_metrics()["buffered_bytes"] == 0
+
+
+def test_split_request_handler_single_part_last_index_zero(handler: SplitRequestHandler):
+    part = split_request(TEST_PAYLOAD, 1)[0]
+    part.get_payload()["split_payload"] = json.dumps(TEST_PAYLOAD).replace('"', "$*$")
+    part.get_payload()["last_index"] = 0
+    assert handler.handle(part).get_payload() == TEST_PAYLOAD
+    assert handler.get_metrics()["pending"] == 0
+    assert handler.get_metrics()["buffered_bytes"] == 0
+
+
+def test_split_request_handler_interleaved():
+    handler = SplitRequestHandler(SESSION_TTL)
+    parts_1 = split_request(TEST_PAYLOAD, 1)
+    parts_2 = split_request(TEST_PAYLOAD, 1, sender="other_sender")
+    results = []
+    for part_1, part_2 in zip(parts_1, parts_2):
+        results += [handler.handle(part_1), handler.handle(part_2)]
+    completed = [req for req in results if req is not None]
+    assert [req.get_sender() for req in completed] == [TEST_SENDER, "other_sender"]
+
+
+def test_split_request_handler_timeout(handler: SplitRequestHandler):
+    parts = split_request(TEST_PAYLOAD, 1)
+    handler.handle(parts[0])
+    time.sleep(SESSION_TTL * 1.5)
+    handler.evict_expired()
+    metrics = handler.get_metrics()
+    assert metrics["evicted_timeout"] == 1
+    assert metrics["pending"] == 0
+    assert metrics["buffered_bytes"] == 0
+
+
+def test_split_request_handler_budget(handler: SplitRequestHandler):
+    for session_id in range(1, 20):
+        handler.handle(split_request(TEST_PAYLOAD, session_id)[0])
+    metrics = handler.get_metrics()
+    assert metrics["buffered_bytes"] <= MAX_BUFFERED_BYTES
+    assert metrics["evicted_budget"] == 19 - MAX_BUFFERED_BYTES // PART_LEN
+
+    # The newest requests are kept and can still be completed
+    for part in split_request(TEST_PAYLOAD, 19)[1:]:
+        result = handler.handle(part)
+    assert result.get_payload() == TEST_PAYLOAD
+
+
+def test_split_request_handler_ack(handler: SplitRequestHandler):
+    acks = []
+    parts = split_request(TEST_PAYLOAD, 1)
+    for part in parts:
+        part.get_payload()["ack_requested"] = True
+        part.set_callback_method(lambda req, payload, path: acks.append(payload))
+        result = handler.handle(part)
+    # The last part is answered by the receiver of the complete request
+    assert acks == [{"ack": True, "split_ack": i} for i in range(len(parts) - 1)]
+    assert result.get_payload() == TEST_PAYLOAD
+
+
+def test_split_request_handler_unescaped(handler: SplitRequestHandler):
+    payload = {"text": "$*$"}
+    payload_str = json.dumps(payload)
+    part = Request(TEST_PATH, 1, TEST_SENDER, None, {"package_index": 0, "split_payload": payload_str,
+                                                     "last_index": 1, "escaped": False})
+    assert handler.handle(part).get_payload() == payload
@@ -0,0 +1,186 @@
+import datetime
+import http.client
+import json
+import threading
+
+import pytest
+
+import api
+from bridge_registry import BridgeRegistry
+from characteristic_stream import CharacteristicStream
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+from smarthomeclient import SmarthomeClient
+
+GADGET_NAME = "test_gadget"
+CLIENT_NAME = "test_client"
+
+
+class DummyBridge:
+    """Provides the methods of the bridge used by the api, backed by a real registry"""
+
+    registry: BridgeRegistry
+    stream: CharacteristicStream
+
+    def __init__(self):
+        self.registry = BridgeRegistry()
+        self.stream = CharacteristicStream()
+
+    def add_streaming_message(self, sender: str, code: int, msg: str):
+        pass
+
+    def get_registry_version(self) -> int:
+        return self.registry.get_version()
+
+    def get_all_gadgets(self) -> [Gadget]:
+        return self.registry.get_all_gadgets()
+
+    def get_characteristic_stream(self) -> CharacteristicStream:
+        return self.stream
+
+    def get_all_clients(self) -> [SmarthomeClient]:
+        return self.registry.get_all_clients()
+
+    @staticmethod
+    def get_all_connectors() -> list:
+        return []
+
+    @staticmethod
+    def get_bridge_name() -> str:
+        return "test_bridge"
+
+    @staticmethod
+    def get_time_launched() -> datetime.datetime:
+        return datetime.datetime(2021, 1, 1)
+
+    def __getattr__(self, item):
+        # Version getters of the host system
+        return lambda: None
+
+
+@pytest.fixture
+def bridge():
+    bridge = DummyBridge()
+    bridge.registry.add_gadget(Gadget(GADGET_NAME,
+                                      GadgetIdentifier(1),
+                                      CLIENT_NAME,
+                                      1337,
+                                      [Characteristic(CharacteristicIdentifier.status, 0, 1, 1, 0)]))
+    yield bridge
+
+
+@pytest.fixture
+def client(bridge: DummyBridge):
+    app = api.create_app(bridge)
+    yield app.test_client()
+
+
+def test_api_gadgets_etag(bridge: DummyBridge, client):
+    response = client.get("/gadgets")
+    assert response.status_code == 200
+    assert response.json["gadget_count"] == 1
+    etag = response.headers["ETag"]
+
+    response = client.get("/gadgets", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    bridge.registry.get_gadget(GADGET_NAME).update_characteristic(CharacteristicIdentifier.status, 1)
+    bridge.registry.mark_gadget_changed(GADGET_NAME)
+
+    response = client.get("/gadgets", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json["gadgets"][0]["characteristics"][0]["value"] == 1
+
+
+def test_api_gadgets_cached(bridge: DummyBridge, client, monkeypatch):
+    first_response = client.get("/gadgets")
+
+    def fail_serialization(self):
+        raise AssertionError("Gadget was serialized although nothing changed")
+
+    monkeypatch.setattr(Gadget, "serialized", fail_serialization)
+    response = client.get("/gadgets")
+    assert response.status_code == 200
+    assert response.data == first_response.data
+
+
+def test_api_clients_and_info(bridge: DummyBridge, client):
+    assert client.get("/clients").json["client_count"] == 0
+    info_etag = client.get("/info").headers["ETag"]
+
+    bridge.registry.add_client(SmarthomeClient(CLIENT_NAME, 1337))
+
+    assert client.get("/clients").json["client_count"] == 1
+    response = client.get("/info", headers={"If-None-Match": info_etag})
+    assert response.status_code == 200
+    assert response.json["client_count"] == 1
+
+
+def test_api_response_validation_rate(bridge: DummyBridge):
+    invalid_body = {"status": 5}
+
+    app = api.create_app(bridge, response_validation_rate=1)
+    with app.test_request_context():
+        assert api.generate_valid_response(invalid_body, "default_message.json").status_code == 500
+        assert api.generate_valid_response({"status": "ok"}, "default_message.json").status_code == 200
+        assert api.generate_valid_response({"status": "ok"}, "nonexistent_schema.json").status_code == 500
+
+    app = api.create_app(bridge, response_validation_rate=0)
+    with app.test_request_context():
+        assert api.generate_valid_response(invalid_body, "default_message.json").status_code == 200
+
+
+def test_api_gadget_stream(bridge: DummyBridge, client):
+    response = client.get("/gadgets/stream", buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert bridge.stream.get_subscription_count() == 1
+
+    bridge.stream.publish(GADGET_NAME, CharacteristicIdentifier.status, 1)
+    bridge.stream.publish(GADGET_NAME, CharacteristicIdentifier.status, 0)
+    events = iter(response.response)
+    assert next(events) == b"retry: 1000\n\n"
+    assert next(events) == b'event: characteristic\ndata: [{"name": "test_gadget", "characteristic": 1, "value": 0}]\n\n'
+
+    bridge.stream.publish_resync()
+    assert next(events) == b"event: resync\ndata: {}\n\n"
+
+    response.close()
+    assert bridge.stream.get_subscription_count() == 0
+
+
+def test_api_stream_limit(bridge: DummyBridge):
+    worker_count = 4
+    server = api.create_server(bridge, 0, worker_count)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+
+    connections = []
+    try:
+        statuses = []
+        for _ in range(worker_count):
+            connection = http.client.HTTPConnection("127.0.0.1", server.get_port(), timeout=2)
+            connection.request("GET", "/gadgets/stream")
+            response = connection.getresponse()
+            statuses.append(response.status)
+            if response.status == 200:
+                assert response.readline() == b"retry: 1000\n"
+            connections.append(connection)
+        assert statuses == [200, 200, 503, 503]
+
+        # The streams leave workers for regular requests
+        connection = http.client.HTTPConnection("127.0.0.1", server.get_port(), timeout=2)
+        connection.request("GET", "/gadgets")
+        response = connection.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())["gadget_count"] == 1
+        connections.append(connection)
+    finally:
+        # Open streams would keep the server from stopping
+        bridge.stream.close()
+        for connection in connections:
+            connection.close()
+        server.stop()
+        server_thread.join()
@@ -0,0 +1,57 @@
+import http.client
+import threading
+import time
+
+import pytest
+
+from api_server import PooledWSGIServer
+
+SLOW_REQUEST_DURATION = 0.5
+
+
+def app(environ, start_response):
+    if environ["PATH_INFO"] == "/slow":
+        time.sleep(SLOW_REQUEST_DURATION)
+    body = environ["PATH_INFO"].encode()
+    start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+@pytest.fixture
+def server():
+    server = PooledWSGIServer("127.0.0.1", 0, app, worker_count=2)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+    yield server
+    server.stop()
+    server_thread.join()
+
+
+def test_api_server_keep_alive(server: PooledWSGIServer):
+    connection = http.client.HTTPConnection("127.0.0.1", server.get_port(), timeout=2)
+    connection.request("GET", "/first")
+    assert connection.getresponse().read() == b"/first"
+    connection_socket = connection.sock
+
+    connection.request("GET", "/second")
+    assert connection.getresponse().read() == b"/second"
+    assert connection.sock is connection_socket
+    connection.close()
+
+
+def test_api_server_graceful_stop(server: PooledWSGIServer):
+    responses = []
+
+    def send_slow_request():
+        connection = http.client.HTTPConnection("127.0.0.1", server.get_port(), timeout=2)
+        connection.request("GET", "/slow")
+        responses.append(connection.getresponse().read())
+        connection.close()
+
+    request_thread = threading.Thread(target=send_slow_request)
+    request_thread.start()
+    time.sleep(SLOW_REQUEST_DURATION / 2)
+
+    server.stop()
+    request_thread.join()
+    assert responses == [b"/slow"]
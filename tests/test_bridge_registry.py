@@ -0,0 +1,199 @@
+import threading
+
+import pytest
+
+from bridge_registry import BridgeRegistry
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier, CharacteristicUpdateStatus
+from smarthomeclient import SmarthomeClient
+
+CLIENT_NAME = "test_client"
+OTHER_CLIENT_NAME = "other_test_client"
+GADGET_NAME = "test_gadget"
+RUNTIME_ID = 1776
+
+
+def create_gadget(name: str, host_client: str = CLIENT_NAME) -> Gadget:
+    return Gadget(name,
+                  GadgetIdentifier(1),
+                  host_client,
+                  RUNTIME_ID,
+                  [Characteristic(CharacteristicIdentifier(1), 0, 1, 1, 1)])
+
+
+@pytest.fixture
+def registry():
+    registry = BridgeRegistry()
+    yield registry
+
+
+def test_bridge_registry_gadgets(registry: BridgeRegistry):
+    gadget = create_gadget(GADGET_NAME)
+    assert registry.add_gadget(gadget)
+    assert not registry.add_gadget(create_gadget(GADGET_NAME))
+    assert registry.get_gadget(GADGET_NAME) is gadget
+    assert registry.get_gadget("unknown") is None
+    assert registry.get_gadget_count() == 1
+
+    assert registry.remove_gadget(GADGET_NAME) is gadget
+    assert registry.remove_gadget(GADGET_NAME) is None
+    assert registry.get_gadget(GADGET_NAME) is None
+    assert registry.get_gadgets_of_client(CLIENT_NAME) == []
+
+
+def test_bridge_registry_gadgets_of_client(registry: BridgeRegistry):
+    for i in range(5):
+        registry.add_gadget(create_gadget(f"{GADGET_NAME}_{i}"))
+    other_gadget = create_gadget(GADGET_NAME, OTHER_CLIENT_NAME)
+    registry.add_gadget(other_gadget)
+
+    assert len(registry.get_gadgets_of_client(CLIENT_NAME)) == 5
+    assert registry.get_gadgets_of_client(OTHER_CLIENT_NAME) == [other_gadget]
+
+    other_gadget.update_gadget_info(GadgetIdentifier(1), CLIENT_NAME, RUNTIME_ID, [])
+    registry.update_gadget_host(GADGET_NAME, OTHER_CLIENT_NAME)
+    assert len(registry.get_gadgets_of_client(CLIENT_NAME)) == 6
+    assert registry.get_gadgets_of_client(OTHER_CLIENT_NAME) == []
+
+
+def test_bridge_registry_snapshots(registry: BridgeRegistry):
+    registry.add_gadget(create_gadget(GADGET_NAME))
+    registry.add_client(SmarthomeClient(CLIENT_NAME, RUNTIME_ID))
+    gadgets = registry.get_all_gadgets()
+    clients = registry.get_all_clients()
+    gadgets.clear()
+    clients.clear()
+    assert registry.get_gadget_count() == 1
+    assert len(registry.get_all_clients()) == 1
+
+
+def test_bridge_registry_clients(registry: BridgeRegistry):
+    client = SmarthomeClient(CLIENT_NAME, RUNTIME_ID)
+    assert registry.add_client(client)
+    assert not registry.add_client(SmarthomeClient(CLIENT_NAME, RUNTIME_ID))
+    assert registry.get_client(CLIENT_NAME) is client
+    assert registry.get_or_add_client(SmarthomeClient(CLIENT_NAME, RUNTIME_ID)) is client
+    assert registry.remove_client(CLIENT_NAME) is client
+    assert registry.get_client(CLIENT_NAME) is None
+
+
+def gadget_data(name: str, max_val: int = 1, value: int = 0) -> dict:
+    return {"name": name,
+            "type": 1,
+            "characteristics": [{"type": 1, "min": 0, "max": max_val, "step": 1, "value": value}]}
+
+
+def test_bridge_registry_sync(registry: BridgeRegistry):
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data("gadget_1"), gadget_data("gadget_2")])
+    assert [gadget.get_name() for gadget in result.added] == ["gadget_1", "gadget_2"]
+    assert registry.get_gadget_count() == 2
+
+    # Unchanged gadget lists are skipped completely
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data("gadget_1"), gadget_data("gadget_2")])
+    assert result.skipped
+
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data("gadget_1", value=1),
+                                                                    gadget_data("gadget_3", max_val=100)])
+    assert not result.skipped
+    assert [gadget.get_name() for gadget in result.added] == ["gadget_3"]
+    assert [gadget.get_name() for gadget in result.removed] == ["gadget_2"]
+    assert result.changed == []
+    assert [(gadget.get_name(), value) for gadget, _, value in result.value_updates] == [("gadget_1", 1)]
+    assert registry.get_gadget("gadget_1").get_characteristic_value(CharacteristicIdentifier(1)) == 1
+
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data("gadget_1", value=1),
+                                                                    gadget_data("gadget_3", max_val=50)])
+    assert result.unchanged_count == 1
+    assert [gadget.get_name() for gadget in result.changed] == ["gadget_3"]
+    assert registry.get_gadget("gadget_3").get_characteristic_options(CharacteristicIdentifier(1)) == (0, 50, 1)
+
+
+def test_bridge_registry_sync_after_change(registry: BridgeRegistry):
+    registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME)])
+    registry.get_gadget(GADGET_NAME).update_characteristic(CharacteristicIdentifier(1), 1)
+    registry.mark_gadget_changed(GADGET_NAME)
+
+    # The client is the authority on its values, even if it sends the same data as before
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME)])
+    assert not result.skipped
+    assert len(result.value_updates) == 1
+    assert registry.get_gadget(GADGET_NAME).get_characteristic_value(CharacteristicIdentifier(1)) == 0
+
+
+def test_bridge_registry_update_characteristic(registry: BridgeRegistry):
+    assert registry.update_characteristic(GADGET_NAME, CharacteristicIdentifier(1), 1) == \
+           (CharacteristicUpdateStatus.general_error, None)
+    registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME)])
+
+    version = registry.get_version()
+    status, gadget = registry.update_characteristic(GADGET_NAME, CharacteristicIdentifier(1), 1)
+    assert status == CharacteristicUpdateStatus.update_successful
+    assert gadget is registry.get_gadget(GADGET_NAME)
+    assert registry.get_version() > version
+
+    # The next sync has to bring the value back to the one of the client
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME)])
+    assert len(result.value_updates) == 1
+
+
+class BlockingGadgetData(dict):
+    """Gadget data blocking the sync reading its characteristics until it is released"""
+
+    def __init__(self, data: dict):
+        super().__init__(data)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __getitem__(self, key):
+        if key == "characteristics":
+            self.entered.set()
+            assert self.release.wait(2)
+        return super().__getitem__(key)
+
+
+def test_bridge_registry_update_during_sync(registry: BridgeRegistry):
+    registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME, max_val=10)])
+    blocking_data = BlockingGadgetData(gadget_data(GADGET_NAME, max_val=10, value=5))
+    sync_thread = threading.Thread(target=registry.sync_client_gadgets,
+                                   args=(CLIENT_NAME, RUNTIME_ID, [blocking_data]))
+    sync_thread.start()
+    assert blocking_data.entered.wait(2)
+
+    update_results = []
+    update_thread = threading.Thread(target=lambda: update_results.append(
+        registry.update_characteristic(GADGET_NAME, CharacteristicIdentifier(1), 7)))
+    update_thread.start()
+    # The update waits for the sync replacing the characteristics instead of changing the replaced ones
+    update_thread.join(0.1)
+    assert update_thread.is_alive()
+
+    blocking_data.release.set()
+    sync_thread.join(2)
+    update_thread.join(2)
+    assert update_results[0][0] == CharacteristicUpdateStatus.update_successful
+    assert registry.get_gadget(GADGET_NAME).get_characteristic_value(CharacteristicIdentifier(1)) == 7
+
+
+def test_bridge_registry_sync_broken_gadget(registry: BridgeRegistry):
+    result = registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [{"name": GADGET_NAME}, gadget_data("gadget_2")])
+    assert [gadget.get_name() for gadget in result.added] == ["gadget_2"]
+    assert registry.get_gadget(GADGET_NAME) is None
+
+
+def test_bridge_registry_version(registry: BridgeRegistry):
+    version = registry.get_version()
+    registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME)])
+    assert registry.get_version() > version
+
+    version = registry.get_version()
+    registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME)])
+    registry.get_gadget(GADGET_NAME)
+    assert registry.get_version() == version
+
+    registry.sync_client_gadgets(CLIENT_NAME, RUNTIME_ID, [gadget_data(GADGET_NAME, value=1)])
+    assert registry.get_version() > version
+
+    version = registry.get_version()
+    registry.add_client(SmarthomeClient(CLIENT_NAME, RUNTIME_ID))
+    registry.mark_client_changed(CLIENT_NAME)
+    assert registry.get_version() == version + 2
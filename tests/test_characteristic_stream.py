@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from characteristic_stream import CharacteristicStream
+from gadgetlib import CharacteristicIdentifier
+
+GADGET_NAME = "test_gadget"
+
+
+@pytest.fixture
+def stream():
+    stream = CharacteristicStream()
+    yield stream
+    stream.close()
+
+
+def test_characteristic_stream_coalescing(stream: CharacteristicStream):
+    subscription = stream.subscribe()
+    stream.publish(GADGET_NAME, CharacteristicIdentifier.status, 1)
+    stream.publish(GADGET_NAME, CharacteristicIdentifier.brightness, 20)
+    stream.publish(GADGET_NAME, CharacteristicIdentifier.status, 0)
+
+    changes = subscription.get_changes(0)
+    assert [x.serialized() for x in changes] == [{"name": GADGET_NAME, "characteristic": 1, "value": 0},
+                                                 {"name": GADGET_NAME, "characteristic": 3, "value": 20}]
+    assert subscription.get_changes(0) == []
+
+
+def test_characteristic_stream_overflow(stream: CharacteristicStream):
+    subscription = stream.subscribe(max_pending=2)
+    for i in range(3):
+        stream.publish(f"gadget_{i}", CharacteristicIdentifier.status, 1)
+    assert subscription.get_changes(0) is None
+
+    stream.publish(GADGET_NAME, CharacteristicIdentifier.status, 1)
+    assert len(subscription.get_changes(0)) == 1
+
+    stream.publish_resync()
+    assert subscription.get_changes(0) is None
+
+
+def test_characteristic_stream_wakeup(stream: CharacteristicStream):
+    subscription = stream.subscribe()
+    received = []
+
+    def wait_for_changes():
+        received.append(subscription.get_changes(5))
+        received.append(time.monotonic())
+
+    wait_thread = threading.Thread(target=wait_for_changes)
+    wait_thread.start()
+    time.sleep(0.1)
+    published = time.monotonic()
+    stream.publish(GADGET_NAME, CharacteristicIdentifier.status, 1)
+    wait_thread.join()
+
+    assert len(received[0]) == 1
+    assert received[1] - published < 0.05
+
+    stream.unsubscribe(subscription)
+    assert stream.get_subscription_count() == 0
+    assert subscription.is_closed()
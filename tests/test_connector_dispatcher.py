@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from connector_dispatcher import ConnectorDispatcher
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+
+GADGET_NAME = "pytest_gadget"
+WORKER_COUNT = 2
+MAX_PENDING = 3
+UPDATE_TIMEOUT = 0.2
+WAIT_TIMEOUT = 2
+
+
+class FakeConnector:
+    """Records the updates it gets, blocks every update while the gate is closed"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.updates = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()
+
+    def get_name(self) -> str:
+        return self.name
+
+    def update_characteristic(self, gadget_name: str, g_type: GadgetIdentifier,
+                              characteristic: CharacteristicIdentifier, value: int):
+        self.entered.set()
+        assert self.gate.wait(WAIT_TIMEOUT)
+        self.updates.append((gadget_name, characteristic, value))
+
+
+class FailingConnector(FakeConnector):
+    def update_characteristic(self, gadget_name: str, g_type: GadgetIdentifier,
+                              characteristic: CharacteristicIdentifier, value: int):
+        raise ValueError("connector is broken")
+
+
+def wait_for(condition) -> bool:
+    end_time = time.time() + WAIT_TIMEOUT
+    while not condition():
+        if time.time() > end_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def dispatcher():
+    dispatcher = ConnectorDispatcher(worker_count=WORKER_COUNT, max_pending=MAX_PENDING, timeout=UPDATE_TIMEOUT)
+    yield dispatcher
+    dispatcher.shutdown()
+
+
+def dispatch(dispatcher: ConnectorDispatcher, connector: FakeConnector, characteristic: int, value: int,
+             gadget_name: str = GADGET_NAME):
+    dispatcher.dispatch(connector, gadget_name, GadgetIdentifier(1), CharacteristicIdentifier(characteristic), value)
+
+
+def test_connector_dispatcher_slow_connector(dispatcher: ConnectorDispatcher):
+    slow_connector = FakeConnector("slow")
+    slow_connector.gate.clear()
+    fast_connector = FakeConnector("fast")
+
+    dispatch(dispatcher, slow_connector, 1, 10)
+    assert slow_connector.entered.wait(WAIT_TIMEOUT)
+    for value in range(MAX_PENDING):
+        dispatch(dispatcher, fast_connector, 1, value, f"gadget_{value}")
+    assert wait_for(lambda: len(fast_connector.updates) == MAX_PENDING)
+    assert slow_connector.updates == []
+
+    slow_connector.gate.set()
+    assert wait_for(lambda: slow_connector.updates == [(GADGET_NAME, CharacteristicIdentifier(1), 10)])
+
+
+def test_connector_dispatcher_order(dispatcher: ConnectorDispatcher):
+    connector = FakeConnector("ordered")
+    connector.gate.clear()
+    dispatch(dispatcher, connector, 1, 0, "blocking_gadget")
+    assert connector.entered.wait(WAIT_TIMEOUT)
+
+    dispatch(dispatcher, connector, 1, 1)
+    dispatch(dispatcher, connector, 2, 2)
+    # Replaces the pending value and moves behind the update of the other characteristic queued before it
+    dispatch(dispatcher, connector, 1, 3)
+    connector.gate.set()
+
+    assert wait_for(lambda: len(connector.updates) == 3)
+    assert [value for _, _, value in connector.updates] == [0, 2, 3]
+    assert dispatcher.get_metrics()["ordered"]["replaced"] == 1
+
+
+def test_connector_dispatcher_overflow(dispatcher: ConnectorDispatcher):
+    connector = FakeConnector("overflowing")
+    connector.gate.clear()
+    dispatch(dispatcher, connector, 1, 0, "blocking_gadget")
+    assert connector.entered.wait(WAIT_TIMEOUT)
+
+    for characteristic in range(1, MAX_PENDING + 2):
+        dispatch(dispatcher, connector, characteristic, 10)
+    assert dispatcher.get_metrics()["overflowing"]["dropped_overflow"] == 1
+    connector.gate.set()
+
+    assert wait_for(lambda: len(connector.updates) == MAX_PENDING + 1)
+    assert CharacteristicIdentifier(1) not in [characteristic for _, characteristic, _ in connector.updates[1:]]
+
+
+def test_connector_dispatcher_expired(dispatcher: ConnectorDispatcher):
+    connector = FakeConnector("stuck")
+    connector.gate.clear()
+    dispatch(dispatcher, connector, 1, 0, "blocking_gadget")
+    assert connector.entered.wait(WAIT_TIMEOUT)
+    dispatch(dispatcher, connector, 1, 1)
+
+    time.sleep(UPDATE_TIMEOUT * 1.5)
+    connector.gate.set()
+    assert wait_for(lambda: dispatcher.get_metrics()["stuck"]["expired"] == 1)
+    metrics = dispatcher.get_metrics()["stuck"]
+    assert metrics["delivered"] == 1
+    assert metrics["timed_out"] == 1
+    assert connector.updates == [("blocking_gadget", CharacteristicIdentifier(1), 0)]
+
+
+def test_connector_dispatcher_hanging_connectors(dispatcher: ConnectorDispatcher):
+    hanging_connectors = [FakeConnector(f"hanging_{index}") for index in range(WORKER_COUNT)]
+    for connector in hanging_connectors:
+        connector.gate.clear()
+        dispatch(dispatcher, connector, 1, 0)
+        assert connector.entered.wait(WAIT_TIMEOUT)
+
+    # All workers are occupied until the hanging connectors are given up on and their workers are replaced
+    assert wait_for(lambda: all(metrics["stalled"] for metrics in dispatcher.get_metrics().values()))
+    connector = FakeConnector("working")
+    dispatch(dispatcher, connector, 1, 10)
+    assert wait_for(lambda: connector.updates == [(GADGET_NAME, CharacteristicIdentifier(1), 10)])
+
+    # Hanging connectors get no updates until they return
+    dispatch(dispatcher, hanging_connectors[0], 2, 20)
+    for hanging_connector in hanging_connectors:
+        hanging_connector.gate.set()
+    assert wait_for(lambda: len(hanging_connectors[0].updates) == 2)
+    assert dispatcher.get_metrics()["hanging_0"]["timed_out"] == 1
+    assert not dispatcher.get_metrics()["hanging_0"]["stalled"]
+
+
+def test_connector_dispatcher_metrics(dispatcher: ConnectorDispatcher):
+    connector = FakeConnector("measured")
+    failing_connector = FailingConnector("failing")
+    for value in range(3):
+        dispatch(dispatcher, connector, 1, value, f"gadget_{value}")
+    dispatch(dispatcher, failing_connector, 1, 10)
+
+    assert wait_for(lambda: len(connector.updates) == 3)
+    assert wait_for(lambda: dispatcher.get_metrics()["failing"]["failed"] == 1)
+    metrics = dispatcher.get_metrics()["measured"]
+    assert metrics["delivered"] == 3
+    assert metrics["pending"] == 0
+    assert metrics["latency"]["count"] == 3
+    assert sum(metrics["latency"]["buckets"].values()) == 3
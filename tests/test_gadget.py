@@ -0,0 +1,79 @@
+import pytest
+
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier, CharacteristicUpdateStatus
+
+GADGET_NAME = "test_gadget"
+CLIENT_NAME = "test_client"
+RUNTIME_ID = 1337
+
+
+@pytest.fixture
+def gadget():
+    gadget = Gadget(GADGET_NAME,
+                    GadgetIdentifier(1),
+                    CLIENT_NAME,
+                    RUNTIME_ID,
+                    [Characteristic(CharacteristicIdentifier.status, 0, 1, 1, 1),
+                     Characteristic(CharacteristicIdentifier.brightness, 0, 100, 1, 50),
+                     Characteristic(CharacteristicIdentifier.hue, 0, 360, 1, 120)])
+    yield gadget
+
+
+def test_gadget_characteristics(gadget: Gadget):
+    assert gadget.get_characteristic_types() == [CharacteristicIdentifier.status,
+                                                 CharacteristicIdentifier.brightness,
+                                                 CharacteristicIdentifier.hue]
+    assert gadget.update_characteristic(CharacteristicIdentifier.brightness, 70) == \
+           CharacteristicUpdateStatus.update_successful
+    assert gadget.update_characteristic(CharacteristicIdentifier.brightness, 70) == \
+           CharacteristicUpdateStatus.no_update_needed
+    assert gadget.update_characteristic(CharacteristicIdentifier.brightness, 101) == \
+           CharacteristicUpdateStatus.update_failed
+    assert gadget.update_characteristic(CharacteristicIdentifier.humidity, 1) == \
+           CharacteristicUpdateStatus.unknown_characteristic
+    assert gadget.get_characteristic_value(CharacteristicIdentifier.brightness) == 70
+    assert gadget.get_characteristic_options(CharacteristicIdentifier.hue) == (0, 360, 1)
+    assert gadget.get_characteristic_options(CharacteristicIdentifier.humidity) == (None, None, None)
+
+
+def test_gadget_update_info(gadget: Gadget):
+    changes = gadget.update_gadget_info(GadgetIdentifier(1),
+                                        CLIENT_NAME,
+                                        RUNTIME_ID,
+                                        [Characteristic(CharacteristicIdentifier.status, 0, 1, 1, 1),
+                                         Characteristic(CharacteristicIdentifier.brightness, 0, 100, 1, 50),
+                                         Characteristic(CharacteristicIdentifier.hue, 0, 360, 1, 120)])
+    assert changes.is_empty()
+
+    changes = gadget.update_gadget_info(GadgetIdentifier(2),
+                                        "other_client",
+                                        RUNTIME_ID + 1,
+                                        [Characteristic(CharacteristicIdentifier.status, 0, 1, 1, 0),
+                                         Characteristic(CharacteristicIdentifier.hue, 0, 255, 1, 120),
+                                         Characteristic(CharacteristicIdentifier.saturation, 0, 100, 1, 10)])
+    assert changes.type_changed
+    assert changes.added == [CharacteristicIdentifier.saturation]
+    assert changes.removed == [CharacteristicIdentifier.brightness]
+    assert changes.options_changed == [CharacteristicIdentifier.hue]
+    assert changes.value_changed == [CharacteristicIdentifier.status]
+    assert changes.is_structural()
+
+    assert gadget.get_type() == GadgetIdentifier(2)
+    assert gadget.get_host_client() == "other_client"
+    assert gadget.get_characteristic_types() == [CharacteristicIdentifier.status,
+                                                 CharacteristicIdentifier.hue,
+                                                 CharacteristicIdentifier.saturation]
+    assert gadget.serialized()["characteristics"][1] == {"type": 4, "min": 0, "max": 255, "step": 1, "value": 120}
+
+
+def test_gadget_update_info_values_only(gadget: Gadget):
+    changes = gadget.update_gadget_info(GadgetIdentifier(1),
+                                        CLIENT_NAME,
+                                        RUNTIME_ID,
+                                        [Characteristic(CharacteristicIdentifier.status, 0, 1, 1, 0),
+                                         Characteristic(CharacteristicIdentifier.brightness, 0, 100, 1, 50),
+                                         Characteristic(CharacteristicIdentifier.hue, 0, 360, 1, 120)])
+    assert not changes.is_structural()
+    assert changes.value_changed == [CharacteristicIdentifier.status]
+    assert gadget.get_characteristic_value(CharacteristicIdentifier.status) == 0
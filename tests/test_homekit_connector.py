@@ -0,0 +1,251 @@
+import json
+import time
+
+import pytest
+
+from gadget import Gadget, Characteristic
+from gadgetlib import GadgetIdentifier, CharacteristicIdentifier
+from homekit_connector import HomeKitConnector
+
+CONNECTOR_NAME = "pytest_homekit"
+GADGET_NAME = "pytest_gadget"
+MAX_IN_FLIGHT = 2
+ACK_TIMEOUT = 0.2
+WAIT_TIMEOUT = 2
+REGISTRATION_BATCH_SIZE = 2
+REGISTRATION_INTERVAL = 0.3
+
+
+class FakeMessage:
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+
+
+class FakeMQTTClient:
+    """Stands in for a connected paho client, records all published messages"""
+
+    def __init__(self):
+        self.on_message = None
+        self.published = []
+        self.gadget_list = None
+
+    def publish(self, topic: str, payload: str):
+        message = json.loads(payload)
+        if topic == "homebridge/to/get":
+            if self.gadget_list is not None:
+                self.receive("homebridge/from/response", dict(self.gadget_list, request_id=message["request_id"]))
+            return
+        self.published.append((topic, message))
+
+    def disconnect(self):
+        pass
+
+    def receive(self, topic: str, message: dict):
+        self.on_message(self, None, FakeMessage(topic, json.dumps(message).encode()))
+
+
+class DummyBridge:
+    def __init__(self):
+        self.updates = []
+
+    def update_characteristic_from_connector(self, gadget_name: str, characteristic: CharacteristicIdentifier,
+                                             value: int, sender):
+        self.updates.append((gadget_name, characteristic, value, sender))
+
+
+def wait_for(condition) -> bool:
+    end_time = time.time() + WAIT_TIMEOUT
+    while not condition():
+        if time.time() > end_time:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def mqtt_client():
+    client = FakeMQTTClient()
+    yield client
+
+
+@pytest.fixture
+def bridge():
+    bridge = DummyBridge()
+    yield bridge
+
+
+@pytest.fixture
+def connector(bridge, mqtt_client):
+    connector = HomeKitConnector(bridge, CONNECTOR_NAME, "localhost", 1883, max_in_flight=MAX_IN_FLIGHT,
+                                 ack_timeout=ACK_TIMEOUT, mqtt_client=mqtt_client)
+    yield connector
+    connector.__del__()
+
+
+def create_gadget(name: str, g_type: int = 1) -> Gadget:
+    return Gadget(name, GadgetIdentifier(g_type), "pytest_client", 1, [Characteristic(CharacteristicIdentifier(3),
+                                                                                      0, 100, 1, 50)])
+
+
+def gadget_list_entry(service: str) -> dict:
+    return {"services": {"service": service}, "characteristics": {"service": {"On": True}}}
+
+
+def acknowledge_all(mqtt_client: FakeMQTTClient):
+    for _, message in mqtt_client.published:
+        mqtt_client.receive("homebridge/from/response", {"ack": True, "request_id": message["request_id"]})
+
+
+def update(connector: HomeKitConnector, characteristic: int, value: int):
+    connector.update_characteristic(GADGET_NAME, GadgetIdentifier(1), CharacteristicIdentifier(characteristic), value)
+
+
+def test_homekit_connector_update_window(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    for characteristic in range(1, 5):
+        update(connector, characteristic, 10)
+    assert wait_for(lambda: len(mqtt_client.published) == MAX_IN_FLIGHT)
+    time.sleep(ACK_TIMEOUT / 4)
+    assert len(mqtt_client.published) == MAX_IN_FLIGHT
+
+    topic, message = mqtt_client.published[1]
+    assert topic == "homebridge/to/set"
+    assert message["characteristic"] == "rotationSpeed"
+    mqtt_client.receive("homebridge/from/response", {"ack": True, "request_id": message["request_id"]})
+    assert wait_for(lambda: len(mqtt_client.published) == MAX_IN_FLIGHT + 1)
+    assert connector.get_update_metrics()["acknowledged"] == 1
+    assert connector.get_update_metrics()["in_flight"] == MAX_IN_FLIGHT
+
+
+def test_homekit_connector_update_replaced(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    # Fills the window, so the following updates stay queued
+    for characteristic in range(1, MAX_IN_FLIGHT + 1):
+        update(connector, characteristic, 10)
+    assert wait_for(lambda: len(mqtt_client.published) == MAX_IN_FLIGHT)
+    for value in range(5):
+        update(connector, 4, value)
+    assert connector.get_update_metrics()["replaced"] == 4
+
+    mqtt_client.receive("homebridge/from/response", {"ack": True,
+                                                     "request_id": mqtt_client.published[0][1]["request_id"]})
+    assert wait_for(lambda: len(mqtt_client.published) == MAX_IN_FLIGHT + 1)
+    assert mqtt_client.published[-1][1]["characteristic"] == "Hue"
+    assert mqtt_client.published[-1][1]["value"] == 4
+    assert connector.get_update_metrics()["pending"] == 0
+
+
+def test_homekit_connector_ack_without_request_id(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    # Matched to the update if it is the only one in flight
+    update(connector, 1, 10)
+    assert wait_for(lambda: len(mqtt_client.published) == 1)
+    mqtt_client.receive("homebridge/from/response", {"ack": True})
+    assert wait_for(lambda: connector.get_update_metrics()["acknowledged"] == 1)
+
+    # Ignored if it could belong to several updates, which time out instead
+    for characteristic in range(1, MAX_IN_FLIGHT + 1):
+        update(connector, characteristic, 20)
+    assert wait_for(lambda: len(mqtt_client.published) == MAX_IN_FLIGHT + 1)
+    mqtt_client.receive("homebridge/from/response", {"ack": True})
+    assert wait_for(lambda: connector.get_update_metrics()["timed_out"] == MAX_IN_FLIGHT)
+    assert connector.get_update_metrics()["acknowledged"] == 1
+
+
+def test_homekit_connector_ack_timeout(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    for characteristic in range(1, MAX_IN_FLIGHT + 2):
+        update(connector, characteristic, 10)
+    assert wait_for(lambda: len(mqtt_client.published) == MAX_IN_FLIGHT + 1)
+    assert connector.get_update_metrics()["timed_out"] >= MAX_IN_FLIGHT
+
+
+def test_homekit_connector_failed_ack(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    update(connector, 1, 1)
+    assert wait_for(lambda: mqtt_client.published)
+    mqtt_client.receive("homebridge/from/response", {"ack": False, "message": "unknown gadget",
+                                                     "request_id": mqtt_client.published[0][1]["request_id"]})
+    assert wait_for(lambda: connector.get_update_metrics()["failed"] == 1)
+    assert connector.get_update_metrics()["in_flight"] == 0
+
+
+def test_homekit_connector_set_from_homebridge(connector: HomeKitConnector, mqtt_client: FakeMQTTClient,
+                                               bridge: DummyBridge):
+    mqtt_client.receive("homebridge/from/set", {"name": GADGET_NAME, "service_name": GADGET_NAME,
+                                                "characteristic": "Brightness", "value": 47})
+    assert wait_for(lambda: bridge.updates)
+    assert bridge.updates[0] == (GADGET_NAME, CharacteristicIdentifier(3), 47, connector)
+
+
+def test_homekit_connector_register_once(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    connector.register_gadget(create_gadget(GADGET_NAME))
+    assert wait_for(lambda: mqtt_client.published)
+    topic, message = mqtt_client.published[0]
+    assert topic == "homebridge/to/add"
+    assert message["service"] == "Lightbulb"
+    assert message["Brightness"] == {"minValue": 0, "maxValue": 100, "minStep": 1}
+
+    # Homebridge already hosts the gadget, registering it again is not necessary
+    connector.register_gadget(create_gadget(GADGET_NAME))
+    assert wait_for(lambda: connector.get_update_metrics()["skipped_registrations"] == 1)
+    assert len(mqtt_client.published) == 1
+
+
+def test_homekit_connector_reconcile(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    mqtt_client.gadget_list = {"unchanged": gadget_list_entry("Lightbulb"),
+                               "changed": gadget_list_entry("Fan"),
+                               "stale": gadget_list_entry("Lightbulb")}
+    assert connector.reconcile_gadgets([create_gadget("unchanged"), create_gadget("changed"), create_gadget("new")])
+    assert wait_for(lambda: acknowledge_all(mqtt_client) or len(mqtt_client.published) == 3)
+    assert connector.get_update_metrics()["timed_out"] == 0
+    # Gadgets the bridge does not know are kept, their client may not have synced yet
+    assert [(topic, message["name"]) for topic, message in mqtt_client.published] == \
+           [("homebridge/to/remove", "changed"),
+            ("homebridge/to/add", "changed"),
+            ("homebridge/to/add", "new")]
+
+
+def test_homekit_connector_reconcile_before_sync(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    mqtt_client.gadget_list = {"lamp_1": gadget_list_entry("Lightbulb"),
+                               "lamp_2": gadget_list_entry("Lightbulb"),
+                               "fan": gadget_list_entry("Fan")}
+    # No client synced its gadgets yet when the connector is added
+    assert connector.reconcile_gadgets([])
+    time.sleep(ACK_TIMEOUT)
+    assert mqtt_client.published == []
+
+    # The clients sync the gadgets homebridge already hosts, nothing is sent for them
+    for name in ["lamp_1", "lamp_2"]:
+        connector.register_gadget(create_gadget(name))
+    assert wait_for(lambda: connector.get_update_metrics()["skipped_registrations"] == 2)
+    assert mqtt_client.published == []
+
+    # A sync showing that the gadget is gone removes it
+    connector.remove_gadget(create_gadget("fan", 2))
+    assert wait_for(lambda: len(mqtt_client.published) == 1)
+    assert mqtt_client.published[0][0] == "homebridge/to/remove"
+    assert mqtt_client.published[0][1]["name"] == "fan"
+
+
+def test_homekit_connector_reconcile_unreported(connector: HomeKitConnector, mqtt_client: FakeMQTTClient):
+    assert not connector.reconcile_gadgets([create_gadget("lamp_1"), create_gadget("lamp_2")])
+    assert wait_for(lambda: len(mqtt_client.published) == 2)
+    assert {message["name"] for _, message in mqtt_client.published} == {"lamp_1", "lamp_2"}
+
+
+def test_homekit_connector_registration_batches(bridge: DummyBridge, mqtt_client: FakeMQTTClient):
+    connector = HomeKitConnector(bridge, CONNECTOR_NAME, "localhost", 1883, max_in_flight=10,
+                                 registration_batch_size=REGISTRATION_BATCH_SIZE,
+                                 registration_interval=REGISTRATION_INTERVAL, mqtt_client=mqtt_client)
+    for index in range(REGISTRATION_BATCH_SIZE * 2):
+        connector.register_gadget(create_gadget(f"lamp_{index}"))
+    # Updates of gadgets waiting for their registration are held back
+    update(connector, 3, 10)
+    connector.update_characteristic("lamp_3", GadgetIdentifier(1), CharacteristicIdentifier(3), 10)
+
+    assert wait_for(lambda: len(mqtt_client.published) == REGISTRATION_BATCH_SIZE + 1)
+    time.sleep(REGISTRATION_INTERVAL / 2)
+    assert len(mqtt_client.published) == REGISTRATION_BATCH_SIZE + 1
+    assert mqtt_client.published[-1][1]["name"] == GADGET_NAME
+
+    assert wait_for(lambda: len(mqtt_client.published) == REGISTRATION_BATCH_SIZE * 2 + 2)
+    assert [topic for topic, _ in mqtt_client.published[-3:]] == \
+           ["homebridge/to/add", "homebridge/to/add", "homebridge/to/set"]
+    connector.__del__()
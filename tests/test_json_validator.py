@@ -1,4 +1,9 @@
+import json
+import os
+
 import pytest
+from jsonschema import Draft4Validator
+
 from json_validator import Validator, ValidationError, SchemaDoesNotExistException
 
 TEST_REQ_OK = {"sender": "me",
@@ -11,6 +16,11 @@ REQ_SCHEMA_NAME = "request_basic_structure"
 ILLEGAL_SCHEMA_NAME = "yolokopter"
 
 
+def validator_schema(schema_name: str) -> dict:
+    with open(os.path.join("json_schemas", f"{schema_name}.json")) as f:
+        return json.load(f)
+
+
 @pytest.fixture
 def validator():
     validator = Validator()
@@ -40,3 +50,22 @@ def test_json_validator(validator: Validator):
         validation_error = e
 
     assert validation_error is not None
+
+
+def test_json_validator_fast_path(validator: Validator):
+    samples = [TEST_REQ_OK,
+               TEST_REQ_ERR,
+               {**TEST_REQ_OK, "receiver": None},
+               {**TEST_REQ_OK, "session_id": -1},
+               {**TEST_REQ_OK, "session_id": True},
+               {**TEST_REQ_OK, "session_id": "1776"},
+               {**TEST_REQ_OK, "payload": []},
+               {**TEST_REQ_OK, "sender": None}]
+    full_validator = Draft4Validator(validator_schema(REQ_SCHEMA_NAME))
+    for sample in samples:
+        accepted = True
+        try:
+            validator.validate(sample, REQ_SCHEMA_NAME)
+        except ValidationError:
+            accepted = False
+        assert accepted == full_validator.is_valid(sample)
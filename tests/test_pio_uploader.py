@@ -43,3 +43,35 @@ def test_pio_uploader():
         assert False
 
     assert _message_received is True
+
+
+def test_pio_uploader_analyze_output(tmp_path):
+    open(os.path.join(tmp_path, "platformio.ini"), "w").close()
+    messages = []
+    uploader = PioUploader(str(tmp_path), output_callback=lambda code, message: messages.append(message))
+    uploader._compile_src_unsent = True
+    uploader._compile_framework_unsent = True
+    uploader._compile_lib_unsent = True
+
+    for line in ["Processing esp32dev (platform: espressif32; board: esp32dev; framework: arduino)\n",
+                 "HARDWARE: ESP32 240MHz, 320KB RAM, 4MB Flash\n",
+                 "Compiling .pio/build/esp32dev/src/main.cpp.o\n",
+                 "Compiling .pio/build/esp32dev/src/gadget.cpp.o\n",
+                 "Compiling .pio/build/esp32dev/lib0/ArduinoJson/json.cpp.o\n",
+                 "Compiling .pio/build/esp32dev/FrameworkArduino/Esp.cpp.o\n",
+                 "Linking .pio/build/esp32dev/firmware.elf\n",
+                 "RAM:   [=         ]  13.9% (used 45524 bytes from 327680 bytes)\n",
+                 "Flash: [========  ]  78.4% (used 1027458 bytes from 1310720 bytes)\n",
+                 "Serial port /dev/cu.SLAB_USBtoUART\n",
+                 "Writing at 0x00001000... (50 %)\n",
+                 "Writing at 0x00010000... (2 %)\n"]:
+        uploader._analyze_line(line)
+
+    assert messages == ["Compiling Source",
+                        "Compiling Libraries",
+                        "Compiling Framework",
+                        "Linking...",
+                        "RAM usage: 13.9%",
+                        "Flash usage: 78.4%",
+                        "Connecting to Chip...",
+                        "Writing Firmware: 2%"]
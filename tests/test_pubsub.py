@@ -53,3 +53,16 @@ def test_pub_sub(subscriber: DummySubscriber, publisher: DummyPublisher, test_re
     _received_request = None
     publisher.publish(test_req)
     assert _received_request is None
+
+
+def test_pub_sub_releases_dead_subscribers(publisher: DummyPublisher, test_req: Request):
+    global _received_request
+    _received_request = None
+
+    buf_subscriber = DummySubscriber()
+    publisher.subscribe(buf_subscriber)
+    assert publisher.get_client_number() == 1
+    del buf_subscriber
+    assert publisher.get_client_number() == 0
+    publisher.publish(test_req)
+    assert _received_request is None
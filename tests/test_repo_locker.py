@@ -1,5 +1,6 @@
 import pytest
 import os
+import threading
 from datetime import datetime, timedelta
 from repo_locker import RepoLocker, RepositoryAccessTimeout
 
@@ -25,3 +26,19 @@ def test_repo_locker():
             pass
         else:
             assert False
+
+
+def test_repo_locker_lost_races(tmp_path, monkeypatch):
+    lock_file = tmp_path / "repo.lock"
+
+    def lose_race(self) -> bool:
+        # Another locker creates the lock file first and holds it for a short time
+        lock_file.write_text("")
+        threading.Timer(0.05, lock_file.unlink).start()
+        return False
+
+    monkeypatch.setattr(RepoLocker, "_write_repository_lock", lose_race)
+    start = datetime.now()
+    with pytest.raises(RepositoryAccessTimeout):
+        RepoLocker(str(tmp_path), 1).lock_repository()
+    assert start + timedelta(seconds=2) > datetime.now()
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+from repository_cache import RepositoryCache
+from repository_manager import RepositoryCheckoutException
+
+REPO_NAME = "test_repo"
+BRANCH = "master"
+OTHER_BRANCH = "feature/test"
+
+
+def git(path: str, *args: str) -> str:
+    return subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@test", *args], cwd=path, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode().strip()
+
+
+def commit_file(path: str, name: str, content: str) -> str:
+    with open(os.path.join(path, name), "w") as f:
+        f.write(content)
+    git(path, "add", name)
+    git(path, "commit", "-m", f"Change {name}")
+    return git(path, "rev-parse", "HEAD")
+
+
+@pytest.fixture
+def remote(tmp_path):
+    remote_path = str(tmp_path / "remote")
+    os.makedirs(remote_path)
+    git(remote_path, "init", "--quiet", "--initial-branch", BRANCH)
+    commit_file(remote_path, "platformio.ini", "[env]\n")
+    git(remote_path, "branch", OTHER_BRANCH)
+    yield remote_path
+
+
+@pytest.fixture
+def cache(tmp_path, remote: str):
+    cache = RepositoryCache(str(tmp_path / "cache"), REPO_NAME, remote, fetch_interval=60, max_delay=5)
+    cache.init_mirror()
+    yield cache
+
+
+def test_repository_cache_worktrees(cache: RepositoryCache, remote: str):
+    with cache.checkout_worktree(BRANCH) as path:
+        assert os.path.isfile(os.path.join(path, "platformio.ini"))
+        # Simulates a build output, which should be kept for the next checkout of the same commit
+        open(os.path.join(path, "build_output"), "w").close()
+        with cache.checkout_worktree(OTHER_BRANCH) as other_path:
+            assert other_path != path
+
+    with cache.checkout_worktree(BRANCH) as path:
+        assert os.path.isfile(os.path.join(path, "build_output"))
+
+    with pytest.raises(RepositoryCheckoutException):
+        with cache.checkout_worktree("no.branch"):
+            pass
+
+
+def test_repository_cache_fetch_interval(cache: RepositoryCache, remote: str):
+    new_commit = commit_file(remote, "main.cpp", "int main() {}\n")
+
+    assert not cache.fetch()
+    assert cache.get_commit_hash(BRANCH) != new_commit
+
+    assert cache.fetch(force=True)
+    with cache.checkout_worktree(BRANCH) as path:
+        assert git(path, "rev-parse", "HEAD") == new_commit
+        assert os.path.isfile(os.path.join(path, "main.cpp"))
+
+
+def test_repository_cache_parallel(cache: RepositoryCache):
+    errors = []
+
+    def use_worktree(branch: str):
+        try:
+            with cache.checkout_worktree(branch) as path:
+                assert os.path.isfile(os.path.join(path, "platformio.ini"))
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=use_worktree, args=(branch,)) for branch in [BRANCH, OTHER_BRANCH]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_repository_cache_reset_waits_for_worktree(cache: RepositoryCache):
+    with cache.checkout_worktree(BRANCH) as path:
+        build_output = os.path.join(path, "build_output")
+        open(build_output, "w").close()
+        reset_thread = threading.Thread(target=cache.init_mirror, kwargs={"force_reset": True})
+        reset_thread.start()
+        time.sleep(0.3)
+        # The worktree is in use, so the reset has to wait
+        assert reset_thread.is_alive()
+        assert os.path.isfile(build_output)
+    reset_thread.join()
+    assert not os.path.exists(build_output)
+
+    with cache.checkout_worktree(BRANCH) as path:
+        assert os.path.isfile(os.path.join(path, "platformio.ini"))
@@ -1,6 +1,7 @@
 import pytest
 from thread_manager import ThreadManager, ThreadController, ThreadIdAlreadyInUseException
 from typing import Optional
+from queue import Queue
 import time
 
 
@@ -123,3 +124,46 @@ def test_thread_manager_add_remove(manager: ThreadManager):
 
     assert saved_thread.is_running() is False
     assert manager.get_thread_count() == 0
+
+
+def test_thread_manager_blocking_task(manager: ThreadManager):
+    task_queue = Queue()
+    processed = []
+
+    def blocking_method():
+        item = task_queue.get()
+        if item is not None:
+            processed.append(item)
+
+    manager.add_thread(THREAD_ID, blocking_method, wake_method=lambda: task_queue.put(None))
+    manager.start_threads()
+
+    task_queue.put(1776)
+    time.sleep(0.1)
+
+    assert processed == [1776]
+
+    start_time = time.time()
+    manager.remove_thread(THREAD_ID)
+
+    assert time.time() - start_time < 0.5
+    assert manager.get_thread_count() == 0
+
+
+def test_thread_manager_interval(manager: ThreadManager):
+    call_times = []
+
+    def periodic_method():
+        call_times.append(time.time())
+
+    saved_thread = manager.add_thread(THREAD_ID, periodic_method, interval=10)
+    manager.start_threads()
+    time.sleep(0.1)
+
+    assert len(call_times) == 1
+
+    start_time = time.time()
+    manager.remove_thread(THREAD_ID)
+
+    assert time.time() - start_time < 0.5
+    assert saved_thread.is_running() is False
@@ -1,7 +1,10 @@
 import logging
-from threading import Thread
+from threading import Thread, Event, current_thread
 from typing import Callable, Optional
 
+# Maximum time in seconds to wait for a thread to finish when killing it
+_default_join_timeout = 2
+
 
 class ThreadIdAlreadyInUseException(Exception):
     def __init__(self, thread_id):
@@ -9,25 +12,43 @@ class ThreadIdAlreadyInUseException(Exception):
 
 
 class ThreadController:
+    """
+    Runs a method in a loop on its own thread until stopped.
+
+    The method may block (e.g. on a queue), in that case a wake method has to be passed that unblocks it
+    (e.g. by putting a sentinel into the queue). Periodic tasks can set an interval to wait between runs
+    instead of sleeping themselves, stopping the thread interrupts that wait immediately.
+    """
     _thread: Thread
-    _thread_running: bool
+    _stop_event: Event
+    _wake_method: Optional[Callable]
+    _interval: Optional[float]
+    _join_timeout: Optional[float]
     _name: str
+    _logger: logging.Logger
 
-    def __init__(self, thread_method: Callable, name: str):
-        self._thread_running = True
+    def __init__(self, thread_method: Callable, name: str, wake_method: Optional[Callable] = None,
+                 interval: Optional[float] = None, join_timeout: Optional[float] = _default_join_timeout):
+        self._stop_event = Event()
+        self._wake_method = wake_method
+        self._interval = interval
+        self._join_timeout = join_timeout
         self._thread = self._create_thread(thread_method)
         self._thread.name = name
         self._name = name
+        self._logger = logging.getLogger("ThreadController")
 
     def __del__(self):
         self.kill()
 
     def _create_thread(self, thread_method: Callable) -> Thread:
         def buffer_thread_method():
-            while self._thread_running:
+            while not self._stop_event.is_set():
                 thread_method()
+                if self._interval:
+                    self._stop_event.wait(self._interval)
 
-        buffer_thread = Thread(target=buffer_thread_method)
+        buffer_thread = Thread(target=buffer_thread_method, daemon=True)
 
         return buffer_thread
 
@@ -37,14 +58,28 @@ class ThreadController:
     def is_running(self):
         return self._thread.is_alive()
 
+    def is_stopping(self) -> bool:
+        return self._stop_event.is_set()
+
     def start(self):
-        self._thread_running = True
+        self._stop_event.clear()
         self._thread.start()
 
+    def stop(self):
+        """Asks the thread to stop and wakes it up without waiting for it to finish"""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        if self._wake_method is not None and self._thread.is_alive():
+            self._wake_method()
+
     def kill(self):
-        self._thread_running = False
-        if self._thread.is_alive():
-            self._thread.join()
+        """Stops the thread and waits for it to finish"""
+        self.stop()
+        if self._thread.is_alive() and self._thread is not current_thread():
+            self._thread.join(self._join_timeout)
+            if self._thread.is_alive():
+                self._logger.warning(f"Thread '{self._name}' did not stop within {self._join_timeout} seconds")
 
 
 class ThreadManager:
@@ -53,16 +88,21 @@ class ThreadManager:
 
     _threads: dict
     _threads_running: bool
+    _join_timeout: Optional[float]
 
-    def __init__(self):
+    def __init__(self, join_timeout: Optional[float] = _default_join_timeout):
         self._logger = logging.getLogger("ThreadManager")
         self._threads = {}
+        self._join_timeout = join_timeout
 
     def __del__(self):
         self._remove_all_threads()
 
     def _remove_all_threads(self):
         self._threads_running = False
+        # Stop all threads at once before waiting for any of them to finish
+        for thread_id in self._threads:
+            self._threads[thread_id].stop()
         thread_names = [thread_id for thread_id in self._threads]
         for thread_id in thread_names:
             self.remove_thread(thread_id)
@@ -74,10 +114,11 @@ class ThreadManager:
             if not thread.is_running():
                 thread.start()
 
-    def add_thread(self, thread_id: str, thread_method: Callable) -> ThreadController:
+    def add_thread(self, thread_id: str, thread_method: Callable, wake_method: Optional[Callable] = None,
+                   interval: Optional[float] = None) -> ThreadController:
         if thread_id in self._threads:
             raise ThreadIdAlreadyInUseException(thread_id)
-        controller = ThreadController(thread_method, thread_id)
+        controller = ThreadController(thread_method, thread_id, wake_method, interval, self._join_timeout)
         self._threads[thread_id] = controller
         return controller
 